@@ -10,9 +10,18 @@ import time
 from flask import Flask, Blueprint, request
 from datetime import datetime, timezone
 from dotenv import load_dotenv
-from openai import AsyncOpenAI
 from collections import defaultdict
 
+from utils.simple_db import db
+from utils.catalog_enrichment import catalog_enrichment
+from utils.prompt_budget import prompt_budget, catalog_context, trim_history
+from utils.response_cache import response_cache
+from utils.model_router import model_router
+from utils.session_store import session_store
+from utils.conversation_summary import summarizer, format_memory
+from utils.tracing import tracer
+from utils.metrics import metrics, CONTENT_TYPE, WEBHOOK_IN_PROGRESS, WHATSAPP_SEND_SECONDS
+
 # Load environment variables
 load_dotenv()
 
@@ -22,8 +31,8 @@ VERIFY_TOKEN = os.getenv("WHATSAPP_VERIFY_TOKEN") or os.getenv("VERIFY_TOKEN")
 WHATSAPP_ID = os.getenv("WHATSAPP_PHONE_NUMBER_ID") or os.getenv("WHATSAPP_ID")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-# Initialize OpenAI client
-client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+# Shared OpenAI access (one pooled client on a long-lived background loop)
+from utils.llm_gateway import llm_gateway
 
 # Updated phone mappings based on actual interaction data
 PHONE_TO_BUSINESS = {
@@ -32,8 +41,13 @@ PHONE_TO_BUSINESS = {
     # Real implementation would have proper business registration
 }
 
-# Session storage with improved structure
-whatsapp_sessions = {}
+# Sessions live in the shared session store, keyed "whatsapp:<phone>"
+SESSION_PREFIX = "whatsapp:"
+
+# Uploaded product photos: path -> (media id, uploaded at); WhatsApp keeps media for 30 days
+media_cache = {}
+MEDIA_TTL_SECONDS = 7 * 86400
+MAX_PHOTOS_PER_REPLY = 2
 
 # Message deduplication and rate limiting
 message_cache = defaultdict(dict)
@@ -78,6 +92,13 @@ def is_duplicate_or_rate_limited(phone: str, message: str) -> tuple[bool, str]:
             if current_time - timestamp < DUPLICATE_WINDOW_SECONDS
         }
     
+    # Forget phones that have been quiet longer than both windows
+    if len(user_last_message_time) > 1000:
+        cutoff = current_time - max(RATE_LIMIT_SECONDS, DUPLICATE_WINDOW_SECONDS)
+        for quiet_phone in [p for p, t in user_last_message_time.items() if t < cutoff]:
+            user_last_message_time.pop(quiet_phone, None)
+            message_cache.pop(quiet_phone, None)
+    
     # Duplicate message check
     if message in message_cache[phone]:
         time_diff = current_time - message_cache[phone][message]
@@ -106,29 +127,11 @@ def get_business_context(phone: str):
     }
 
 def load_business_data(business_id: str = "mama_jane_electronics"):
-    """Load business data from existing JSON files"""
+    """Load business data through the JSON database (reads only this business's shard)"""
     try:
-        data_dir = "data"
-        business_info = {}
-        products = []
-        
-        # Load businesses
-        businesses_file = os.path.join(data_dir, "businesses.json")
-        if os.path.exists(businesses_file):
-            with open(businesses_file, 'r') as f:
-                businesses = json.load(f)
-                business_info = businesses.get(business_id, {})
-        
-        # Load products  
-        products_file = os.path.join(data_dir, "products.json")
-        if os.path.exists(products_file):
-            with open(products_file, 'r') as f:
-                all_products = json.load(f)
-                products = [p for p in all_products if p.get("business_id") == business_id]
-        
         return {
-            "business": business_info,
-            "products": products
+            "business": db.get_business(business_id) or {},
+            "products": db.get_products_by_business(business_id)
         }
     except Exception as e:
         print(f"Error loading business data: {e}")
@@ -177,8 +180,9 @@ def get_conversation_context(phone: str) -> dict:
     """Get conversation context and state"""
     phone = normalize_phone(phone)
     
-    if phone not in whatsapp_sessions:
-        whatsapp_sessions[phone] = {
+    session = session_store.get(SESSION_PREFIX + phone)
+    if session is None:
+        session = {
             "conversation_history": [],
             "first_interaction": datetime.now().isoformat(),
             "message_count": 0,
@@ -186,7 +190,6 @@ def get_conversation_context(phone: str) -> dict:
             "needs_introduction": True
         }
     
-    session = whatsapp_sessions[phone]
     session["message_count"] = session.get("message_count", 0) + 1
     
     # Check if it's been a while since last interaction (new conversation)
@@ -201,6 +204,7 @@ def get_conversation_context(phone: str) -> dict:
     
     return session
 
+@tracer.traced("whatsapp.process_message")
 async def process_message_with_openai(message: str, phone: str) -> str:
     """Process message using OpenAI with improved context and formatting"""
     try:
@@ -246,8 +250,8 @@ BUSINESS INFO:
 - Location: {business_data['business'].get('location', 'Nairobi, Kenya')}
 - Phone: {business_data['business'].get('phone', '+254762222000')}
 
-AVAILABLE PRODUCTS: {len(business_data['products'])} items
-{json.dumps(business_data['products'][:3], indent=2) if business_data['products'] else "No products currently loaded"}
+AVAILABLE PRODUCTS: {len(business_data['products'])} items (most relevant shown)
+{catalog_context(business_data['products'], message, k=3) if business_data['products'] else "No products currently loaded"}
 
 CONVERSATION RULES:
 1. Keep responses under 200 words for WhatsApp
@@ -258,45 +262,52 @@ CONVERSATION RULES:
 6. Use simple, clear language
 
 USER TYPE: {business_context['role']}
-MESSAGE COUNT: {conversation_context['message_count']}"""
+MESSAGE COUNT: {conversation_context['message_count']}
+{format_memory(conversation_context)}"""
 
         # Build messages for OpenAI API
         messages = [{"role": "system", "content": system_prompt}]
         
-        # Add recent conversation history (last 3 exchanges)
-        recent_history = conversation_context["conversation_history"][-3:]
-        for exchange in recent_history:
-            messages.append({"role": "user", "content": exchange.get("user_message", "")})
-            messages.append({"role": "assistant", "content": exchange.get("ai_response", "")})
+        # Add recent conversation history (last 3 exchanges, within the token budget)
+        messages.extend(trim_history(conversation_context["conversation_history"], max_exchanges=3))
         
         # Add current message
         messages.append({"role": "user", "content": message})
         
-        # Call OpenAI API
-        response = await client.chat.completions.create(
-            model="gpt-4",
-            messages=messages,
-            max_tokens=400,  # Limit response length
-            temperature=0.7
-        )
-        
-        ai_response = response.choices[0].message.content
+        # Repeated generic questions skip the LLM
+        ai_response = response_cache.get(message, business_context["role"], business_context["business_id"])
+        if ai_response is None:
+            prompt_tokens = prompt_budget.log("whatsapp", messages)["total"]
+            tier = model_router.choose("chat", message=message, prompt_tokens=prompt_tokens)
+            started = time.perf_counter()
+            
+            # Call OpenAI API
+            response = await llm_gateway.chat(
+                model=model_router.model(tier),
+                messages=messages,
+                max_tokens=400,  # Limit response length
+                temperature=0.7
+            )
+            model_router.record_response(tier, started, response, prompt_tokens)
+            
+            ai_response = response.choices[0].message.content
+            response_cache.put(message, business_context["role"], business_context["business_id"], ai_response)
         
         # Format response for WhatsApp
         formatted_response = format_response_for_whatsapp(ai_response)
         
-        # Save to conversation history
-        conversation_context["conversation_history"].append({
-            "timestamp": datetime.now().isoformat(),
-            "user_message": message,
-            "ai_response": formatted_response
-        })
-        
-        # Keep only last 10 exchanges
-        if len(conversation_context["conversation_history"]) > 10:
-            conversation_context["conversation_history"] = conversation_context["conversation_history"][-10:]
-        
-        whatsapp_sessions[normalize_phone(phone)] = conversation_context
+        # Save to conversation history (compacted, last 10 exchanges); only the
+        # fields this turn set are written, the rest is re-read from the store
+        turn_fields = {
+            key: conversation_context[key]
+            for key in ("first_interaction", "message_count", "last_context", "needs_introduction")
+            if key in conversation_context
+        }
+        session_store.append_exchange(
+            SESSION_PREFIX + normalize_phone(phone), message, formatted_response,
+            max_exchanges=10, fields=turn_fields
+        )
+        summarizer.schedule(SESSION_PREFIX + normalize_phone(phone))
         
         return formatted_response
         
@@ -354,7 +365,11 @@ def send_message(customer_id: str, text: str):
             "text": {"body": text}
         }
         
-        response = requests.post(url, headers=headers, json=payload)
+        started = time.perf_counter()
+        with tracer.span("http.whatsapp.send_message", customer=customer_id) as span:
+            response = requests.post(url, headers=headers, json=payload)
+            span.set_attribute("status_code", response.status_code)
+        WHATSAPP_SEND_SECONDS.observe(time.perf_counter() - started, status=response.status_code)
         print(f"📤 Message sent to {customer_id}: {response.status_code}")
         
         if response.status_code != 200:
@@ -366,6 +381,71 @@ def send_message(customer_id: str, text: str):
         print(f"❌ Error sending message: {e}")
         return False
 
+def upload_media(path) -> str:
+    """Upload a photo to WhatsApp once and reuse its media ID (None on failure)"""
+    key = str(path)
+    cached = media_cache.get(key)
+    if cached and time.time() - cached[1] < MEDIA_TTL_SECONDS:
+        return cached[0]
+    
+    mime_type = "image/png" if path.suffix.lower() == ".png" else "image/jpeg"
+    url = f"https://graph.facebook.com/v19.0/{WHATSAPP_ID}/media"
+    with open(path, 'rb') as f:
+        response = requests.post(
+            url,
+            headers={"Authorization": f"Bearer {ACCESS_TOKEN}"},
+            data={"messaging_product": "whatsapp", "type": mime_type},
+            files={"file": (path.name, f, mime_type)}
+        )
+    if response.status_code != 200:
+        print(f"❌ Media upload error: {response.text}")
+        return None
+    
+    media_id = response.json().get("id")
+    media_cache[key] = (media_id, time.time())
+    return media_id
+
+def send_product_photos(customer_id: str, text: str, business_id: str) -> int:
+    """Send photos of the catalog products a reply mentions; returns how many were sent"""
+    if os.getenv("SASABOT_PRODUCT_PHOTOS", "true").lower() == "false":
+        return 0
+    
+    sent = 0
+    try:
+        products = load_business_data(business_id)["products"]
+        # WhatsApp images must be JPEG or PNG
+        photos = catalog_enrichment.photos_in_reply(text, products, limit=MAX_PHOTOS_PER_REPLY, fmt="jpg")
+        for product, path in photos:
+            media_id = upload_media(path)
+            if not media_id:
+                continue
+            
+            payload = {
+                "messaging_product": "whatsapp",
+                "to": customer_id,
+                "type": "image",
+                "image": {"id": media_id, "caption": f"{product.get('name', 'Product')} - KSh {product.get('price', 0):,}"}
+            }
+            started = time.perf_counter()
+            with tracer.span("http.whatsapp.send_photo", customer=customer_id) as span:
+                response = requests.post(
+                    f"https://graph.facebook.com/v19.0/{WHATSAPP_ID}/messages",
+                    headers={"Authorization": f"Bearer {ACCESS_TOKEN}", "Content-Type": "application/json"},
+                    json=payload
+                )
+                span.set_attribute("status_code", response.status_code)
+            WHATSAPP_SEND_SECONDS.observe(time.perf_counter() - started, status=response.status_code)
+            if response.status_code == 200:
+                sent += 1
+            else:
+                print(f"❌ Photo send error: {response.text}")
+    except Exception as e:
+        print(f"❌ Error sending product photos: {e}")
+    
+    if sent:
+        print(f"🖼️ Sent {sent} product photo(s) to {customer_id}")
+    return sent
+
 @webhook_bp.route('/webhook', methods=['GET', 'POST'])
 def webhook():
     if request.method == 'GET':
@@ -415,31 +495,35 @@ def webhook():
                                     # Save interaction
                                     save_interaction(customer_phone, message_body)
                                     
-                                    # Process with OpenAI in a new event loop
+                                    # One trace per message: model call(s), tools and the reply send
+                                    WEBHOOK_IN_PROGRESS.inc()
                                     try:
-                                        # Create and run new event loop for async processing
-                                        loop = asyncio.new_event_loop()
-                                        asyncio.set_event_loop(loop)
-                                        
-                                        response_text = loop.run_until_complete(
-                                            process_message_with_openai(message_body, customer_phone)
-                                        )
-                                        
-                                        loop.close()
-                                        
-                                        print(f"🤖 AI Response ready ({len(response_text)} chars)")
-                                        
-                                        # Send response
-                                        success = send_message(customer_phone, response_text)
-                                        
-                                        if success:
-                                            print(f"✅ Response sent to {customer_phone}")
-                                        else:
-                                            print(f"❌ Failed to send to {customer_phone}")
+                                        with tracer.span("whatsapp.message", phone=customer_phone):
+                                            # Process with OpenAI on the gateway's long-lived event loop
+                                            try:
+                                                response_text = llm_gateway.run(
+                                                    process_message_with_openai(message_body, customer_phone)
+                                                )
                                             
-                                    except Exception as e:
-                                        print(f"❌ Error processing message: {e}")
-                                        send_message(customer_phone, "Sorry, I'm having trouble right now. Please try again in a moment.")
+                                                print(f"🤖 AI Response ready ({len(response_text)} chars)")
+                                            
+                                                # Send response
+                                                success = send_message(customer_phone, response_text)
+                                            
+                                                if success:
+                                                    print(f"✅ Response sent to {customer_phone}")
+                                                    send_product_photos(
+                                                        customer_phone, response_text,
+                                                        get_business_context(customer_phone)["business_id"]
+                                                    )
+                                                else:
+                                                    print(f"❌ Failed to send to {customer_phone}")
+                                                
+                                            except Exception as e:
+                                                print(f"❌ Error processing message: {e}")
+                                                send_message(customer_phone, "Sorry, I'm having trouble right now. Please try again in a moment.")
+                                    finally:
+                                        WEBHOOK_IN_PROGRESS.dec()
                                 
                                 else:
                                     print(f"📎 Non-text message: {message.get('type', 'unknown')}")
@@ -460,20 +544,31 @@ def health():
         "status": "healthy",
         "service": "Sasabot WhatsApp",
         "timestamp": datetime.now().isoformat(),
-        "active_sessions": len(whatsapp_sessions),
-        "message_cache_size": sum(len(cache) for cache in message_cache.values())
+        "active_sessions": session_store.count_by_channel().get(SESSION_PREFIX.rstrip(":"), 0),
+        "message_cache_size": sum(len(cache) for cache in message_cache.values()),
+        "response_cache": response_cache.get_stats(),
+        "models": model_router.get_stats(),
+        "llm_gateway": llm_gateway.get_stats()
     }
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics"""
+    return metrics.render(), 200, {"Content-Type": CONTENT_TYPE}
+
 @app.route('/sessions')
 def sessions():
     """View current sessions (for debugging)"""
+    by_channel = session_store.count_by_channel()
     return {
-        "sessions": {phone: {
+        "sessions": {session_id[len(SESSION_PREFIX):]: {
             "message_count": session.get("message_count", 0),
             "last_message": session.get("conversation_history", [{}])[-1].get("timestamp", "never") if session.get("conversation_history") else "never",
             "needs_intro": session.get("needs_introduction", True)
-        } for phone, session in whatsapp_sessions.items()},
-        "total_sessions": len(whatsapp_sessions)
+        } for session_id, session in session_store.items(limit=100, prefix=SESSION_PREFIX)},
+        "total_sessions": by_channel.get(SESSION_PREFIX.rstrip(":"), 0),
+        "sessions_by_channel": by_channel,
+        "store": session_store.get_stats()
     }
 
 if __name__ == "__main__":
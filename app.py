@@ -18,7 +18,12 @@ sys.path.insert(0, str(project_root))
 # Import database and tools
 try:
     from utils.simple_db import db, initialize_database
+    from utils.prompt_budget import prompt_budget
+    from utils.tracing import tracer, format_summary
+    from utils.metrics import metrics
+    from utils.catalog_enrichment import catalog_enrichment
     from realtime.assistant import SasabotAssistant
+    from realtime.voice_session import VoiceSession, voice_enabled
     # from realtime.vendor_tools import vendor_tools
     # from realtime.customer_tools import customer_tools
 except ImportError as e:
@@ -170,6 +175,21 @@ def get_recent_activity():
         return f"❌ Error getting recent activity: {e}"
 
 
+def product_photo_elements(response: str) -> list:
+    """Inline photos of the catalog products a reply mentions (SASABOT_PRODUCT_PHOTOS)"""
+    if os.getenv("SASABOT_PRODUCT_PHOTOS", "true").lower() == "false":
+        return []
+    try:
+        photos = catalog_enrichment.photos_in_reply(response, db.get_products())
+    except Exception as e:
+        print(f"⚠️ Product photo lookup failed: {e}")
+        return []
+    return [
+        cl.Image(path=str(path), name=product.get('name', 'Product'), display="inline")
+        for product, path in photos
+    ]
+
+
 # Initialize database at module level
 print("🚀 Starting Sasabot application...")
 database_initialized = initialize_app_database()
@@ -183,6 +203,8 @@ try:
     print("🤖 Initializing Sasabot assistant...")
     assistant = SasabotAssistant()
     print("✅ Sasabot assistant ready!")
+    # Chainlit owns the main port, so Prometheus scrapes a side port
+    metrics.serve()
 except Exception as e:
     print(f"❌ Failed to initialize assistant: {e}")
     sys.exit(1)
@@ -212,6 +234,10 @@ async def start():
     # Store initialization timestamp
     cl.user_session.set("start_time", datetime.now())
     cl.user_session.set("message_count", 0)
+    
+    # Speech-to-speech mode; connects when the user first turns on the mic
+    if voice_enabled():
+        cl.user_session.set("voice_session", VoiceSession(assistant))
 
 
 @cl.on_message
@@ -228,7 +254,66 @@ async def main(message: cl.Message):
         
         # Handle special database commands
         if user_input.lower() in ["show database stats", "database stats", "stats"]:
-            response = get_database_stats()
+            fast_path = assistant.fast_path.get_stats()
+            response = get_database_stats() + (
+                f"⚡ Fast path: {fast_path['hits']}/{fast_path['messages']} messages "
+                f"({fast_path['hit_rate']:.0%}) answered without the LLM, "
+                f"avg {fast_path['avg_latency_ms']} ms\n"
+            )
+            policy = assistant.response_policy.get_stats()
+            response += (
+                f"🧾 Replies: {policy['verbatim']} verbatim, {policy['template']} templated, "
+                f"{policy['llm']} verbalized by the LLM\n"
+            )
+            prompts = prompt_budget.get_stats()
+            response += (
+                f"🧮 Prompts: {prompts['calls']} LLM calls, avg {prompts['avg_tokens']} tokens, "
+                f"max {prompts['max_tokens']} ({prompts['estimator']})\n"
+            )
+            speculation = assistant.speculator.get_stats()
+            response += (
+                f"🔮 Tool prefetch: {speculation['hits']} hits / {speculation['misses']} misses "
+                f"({speculation['hit_rate']:.0%}), {speculation['ready_on_hit']:.0%} of hits ready in time\n"
+            )
+            tool_flight = assistant.tool_flight.get_stats()
+            response += (
+                f"🤝 Coalesced calls: {tool_flight['shared']} tool calls and "
+                f"{db.get_load_stats()['shared']} DB loads shared an in-flight run\n"
+            )
+            dispatch = assistant.dispatcher.get_stats()
+            response += (
+                f"🛂 Tool arguments: {dispatch['calls']} calls checked, {dispatch['coerced']} coerced, "
+                f"{dispatch['rejected']} sent back to the model\n"
+            )
+            scopes = assistant.tool_selector.get_stats()
+            response += (
+                f"🧰 Tool scopes: {scopes['all_tools']} tools total, sent per scope: "
+                + ", ".join(f"{name} {size['tools']} ({size['tokens']} tokens)"
+                            for name, size in scopes['scope_sizes'].items())
+                + "\n"
+            )
+            cache = assistant.response_cache.get_stats()
+            response += (
+                f"🗃️ Response cache: {cache['exact_hits']} exact + {cache['similar_hits']} similar hits, "
+                f"{cache['misses']} misses ({cache['hit_rate']:.0%})\n"
+            )
+            voice = cl.user_session.get("voice_session")
+            if voice is not None and voice.turns:
+                call = voice.get_stats()
+                response += (
+                    f"🎙️ Voice: {call['turns']} spoken replies, {call['interruptions']} interruptions, "
+                    f"p50 {call['p50_response_ms']} ms from end of speech to first audio\n"
+                )
+            for tier, models in assistant.model_router.get_stats()["tiers"].items():
+                response += (
+                    f"🧠 {tier.title()} model ({models['model']}): {models['calls']} calls, "
+                    f"avg {models['avg_latency_ms']} ms, ${models['cost_usd']}\n"
+                )
+            await cl.Message(content=response).send()
+            return
+            
+        if user_input.lower() in ["slow stages", "trace summary", "traces"]:
+            response = f"🔎 **Slowest stages** ({len(tracer.recent)} recent spans)\n```\n{format_summary(tracer.summary())}\n```"
             await cl.Message(content=response).send()
             return
             
@@ -260,17 +345,28 @@ async def main(message: cl.Message):
             await cl.Message(content=response).send()
             return
         
-        # Show typing indicator
-        async with cl.Step(name="Processing", type="run") as step:
-            step.output = "🤖 Sasabot is thinking..."
+        if assistant.streaming:
+            # Stream tokens straight into the reply message
+            reply = cl.Message(content="")
+            response = await assistant.process_message(user_input, stream_message=reply)
             
-            # Process message with assistant
-            response = await assistant.process_message(user_input)
+            # Fallback/error replies are returned without being streamed
+            if reply.content != response:
+                reply.content = response
+            reply.elements = product_photo_elements(response)
+            await reply.send()
+        else:
+            # Show typing indicator
+            async with cl.Step(name="Processing", type="run") as step:
+                step.output = "🤖 Sasabot is thinking..."
+                
+                # Process message with assistant
+                response = await assistant.process_message(user_input)
+                
+                step.output = "✅ Response ready!"
             
-            step.output = "✅ Response ready!"
-        
-        # Send response
-        await cl.Message(content=response).send()
+            # Send response
+            await cl.Message(content=response, elements=product_photo_elements(response)).send()
         
         # Add session info for long conversations
         if msg_count > 0 and msg_count % 10 == 0:
@@ -307,6 +403,44 @@ Something went wrong while processing your request:
         await cl.Message(content=error_message).send()
 
 
+@cl.on_audio_start
+async def on_audio_start():
+    """
+    Called when the user turns on the microphone
+    Returns False to keep the mic off when voice mode can't be used
+    """
+    voice = cl.user_session.get("voice_session")
+    if voice is None:
+        return False
+    try:
+        await voice.start()
+        return True
+    except Exception as e:
+        print(f"❌ Voice session failed to connect: {e}")
+        await cl.ErrorMessage(content=f"🎙️ Voice mode is unavailable right now: {e}").send()
+        return False
+
+
+@cl.on_audio_chunk
+async def on_audio_chunk(chunk: cl.InputAudioChunk):
+    """
+    Stream microphone audio to the realtime session as it is captured
+    """
+    voice = cl.user_session.get("voice_session")
+    if voice is not None:
+        await voice.append_audio(chunk.data)
+
+
+@cl.on_stop
+async def on_stop():
+    """
+    Called when the user stops the current reply
+    """
+    voice = cl.user_session.get("voice_session")
+    if voice is not None:
+        await voice.interrupt()
+
+
 @cl.on_chat_end
 async def end():
     """
@@ -322,6 +456,11 @@ async def end():
         
         print(f"📊 Session ended: {msg_count} messages in {duration_mins} minutes")
     
+    voice = cl.user_session.get("voice_session")
+    if voice is not None:
+        await voice.close()
+    
+    assistant.end_session()
     print("👋 Chat session ended")
 
 
@@ -0,0 +1,252 @@
+"""
+Assistant Pipeline Benchmark
+Drives recorded conversations through SasabotAssistant.process_message with
+the mock LLM backend (utils/mock_llm.py) and reports per-stage latency
+percentiles and throughput at several session concurrency levels.
+
+Conversations come from data/bottle_store_conversations.csv (customer
+prompts, split into sessions of --turns messages) and
+data/whatsapp_interactions.json (messages grouped by phone number).
+
+Stages (time per message, summed over the calls made while handling it):
+- context:   user context + prompt assembly
+- tool_exec: tool execution (includes the DB I/O it does)
+- db_io:     JSON database reads and writes
+- render:    template rendering of tool results
+- llm:       mock LLM requests (the configured latency)
+- overhead:  total minus llm, i.e. everything we own
+Async stages are wall-clock, so at high concurrency they include time spent
+waiting for other sessions.
+
+Usage:
+    python benchmarks/assistant_pipeline.py
+    python benchmarks/assistant_pipeline.py --concurrency 1,8,32 --llm-latency-ms 300
+    python benchmarks/assistant_pipeline.py --source whatsapp --no-cache --json results.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import csv
+import io
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+STAGES = ["context", "tool_exec", "db_io", "render", "llm", "overhead", "total"]
+
+# Stage timings of the message being handled in the current task
+_message_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("bench_timings", default=None)
+
+
+# =============================================================================
+# CONVERSATIONS
+# =============================================================================
+
+def load_csv_conversations(path: Path, turns: int) -> List[Tuple[str, List[str]]]:
+    """Customer prompts from the bottle store CSV, in sessions of `turns` messages"""
+    with open(path, "r", encoding="utf-8") as f:
+        prompts = [row["Customer Prompt"].strip() for row in csv.DictReader(f) if row.get("Customer Prompt")]
+    return [("customer", prompts[i:i + turns]) for i in range(0, len(prompts), turns)]
+
+
+def load_whatsapp_conversations(path: Path) -> List[Tuple[str, List[str]]]:
+    """Recorded WhatsApp messages grouped per phone number, in time order"""
+    with open(path, "r", encoding="utf-8") as f:
+        interactions = json.load(f)
+    by_phone: Dict[str, List[Dict]] = defaultdict(list)
+    for interaction in interactions:
+        if interaction.get("message"):
+            by_phone[interaction.get("phone", "unknown")].append(interaction)
+    return [
+        ("unknown", [i["message"] for i in sorted(messages, key=lambda i: i.get("timestamp", ""))])
+        for messages in by_phone.values()
+    ]
+
+
+# =============================================================================
+# STAGE TIMING
+# =============================================================================
+
+def _record(stage: str, elapsed: float):
+    timings = _message_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + elapsed
+
+
+def time_stage(obj: Any, attribute: str, stage: str):
+    """Wrap obj.attribute so its calls are added to the current message's stage time"""
+    original = getattr(obj, attribute)
+
+    if asyncio.iscoroutinefunction(original):
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await original(*args, **kwargs)
+            finally:
+                _record(stage, time.perf_counter() - started)
+    else:
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                _record(stage, time.perf_counter() - started)
+
+    setattr(obj, attribute, timed)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), round(pct / 100 * len(ordered) + 0.5)))
+    return ordered[rank - 1]
+
+
+# =============================================================================
+# RUN
+# =============================================================================
+
+async def run_level(assistant, conversations: List[Tuple[str, List[str]]], concurrency: int,
+                    label: str) -> Dict[str, Any]:
+    """Run every conversation with at most `concurrency` sessions in flight"""
+    from realtime.assistant import LocalSession, use_session
+
+    per_message: List[Dict[str, float]] = []
+    errors = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for index, conversation in enumerate(conversations):
+        queue.put_nowait((index, conversation))
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            index, (role, messages) = queue.get_nowait()
+            use_session(LocalSession(f"bench-{label}-{index}", user_type=role))
+            for message in messages:
+                timings: Dict[str, float] = {}
+                _message_timings.set(timings)
+                started = time.perf_counter()
+                reply = await assistant.process_message(message)
+                timings["total"] = time.perf_counter() - started
+                timings["overhead"] = timings["total"] - timings.get("llm", 0.0)
+                if reply.startswith("❌"):
+                    errors += 1
+                per_message.append(timings)
+
+    started = time.perf_counter()
+    # Each worker is its own task, so its session and timings don't leak into the others
+    await asyncio.gather(*(asyncio.create_task(worker()) for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    stages = {}
+    for stage in STAGES:
+        values = [t.get(stage, 0.0) * 1000 for t in per_message]
+        stages[stage] = {
+            "p50": round(percentile(values, 50), 3),
+            "p95": round(percentile(values, 95), 3),
+            "p99": round(percentile(values, 99), 3),
+            "mean": round(sum(values) / len(values), 3) if values else 0.0,
+        }
+    return {
+        "concurrency": concurrency,
+        "sessions": len(conversations),
+        "messages": len(per_message),
+        "errors": errors,
+        "wall_seconds": round(wall, 3),
+        "messages_per_second": round(len(per_message) / wall, 1) if wall else 0.0,
+        "stages_ms": stages,
+    }
+
+
+def print_level(result: Dict[str, Any]):
+    print(f"\n🏁 Concurrency {result['concurrency']}: {result['messages']} messages in "
+          f"{result['sessions']} sessions, {result['wall_seconds']}s, "
+          f"{result['messages_per_second']} msg/s, {result['errors']} errors")
+    print(f"   {'stage':<10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'mean ms':>9}")
+    for stage, numbers in result["stages_ms"].items():
+        print(f"   {stage:<10} {numbers['p50']:>9.2f} {numbers['p95']:>9.2f} "
+              f"{numbers['p99']:>9.2f} {numbers['mean']:>9.2f}")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the assistant pipeline with a mock LLM")
+    parser.add_argument("--source", choices=["csv", "whatsapp", "all"], default="all")
+    parser.add_argument("--turns", type=int, default=5, help="messages per CSV session")
+    parser.add_argument("--max-sessions", type=int, default=0, help="limit the number of sessions (0 = all)")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated session concurrency levels")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="mock LLM time to first token")
+    parser.add_argument("--token-ms", type=float, default=0.0, help="mock LLM time per completion token")
+    parser.add_argument("--no-cache", action="store_true", help="disable the response cache")
+    parser.add_argument("--no-fast-path", action="store_true", help="disable the fast path")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="show the pipeline's own log output")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Settings are read at import time, so they go in before the assistant is imported
+    os.environ["SASABOT_LLM_BACKEND"] = "mock"
+    os.environ["SASABOT_MOCK_LLM_LATENCY_MS"] = str(args.llm_latency_ms)
+    os.environ["SASABOT_MOCK_LLM_TOKEN_MS"] = str(args.token_ms)
+    os.environ.setdefault("SASABOT_LOG_PROMPT_TOKENS", "false")
+    if args.no_cache:
+        os.environ["SASABOT_RESPONSE_CACHE"] = "false"
+    if args.no_fast_path:
+        os.environ["SASABOT_FAST_PATH"] = "false"
+
+    output = sys.stdout if args.verbose else io.StringIO()
+    with contextlib.redirect_stdout(output):
+        from realtime.assistant import SasabotAssistant
+        from utils.simple_db import db
+        assistant = SasabotAssistant()
+
+    time_stage(assistant, "_get_user_context", "context")
+    time_stage(assistant, "_build_conversation_history", "context")
+    time_stage(assistant, "_execute_function_call", "tool_exec")
+    time_stage(assistant.response_policy, "render", "render")
+    time_stage(assistant.llm, "chat", "llm")
+    time_stage(db, "load_json", "db_io")
+    time_stage(db, "save_json", "db_io")
+
+    conversations = []
+    if args.source in ("csv", "all"):
+        conversations += load_csv_conversations(project_root / "data" / "bottle_store_conversations.csv", args.turns)
+    if args.source in ("whatsapp", "all"):
+        conversations += load_whatsapp_conversations(project_root / "data" / "whatsapp_interactions.json")
+    if args.max_sessions:
+        conversations = conversations[:args.max_sessions]
+
+    total_messages = sum(len(messages) for _, messages in conversations)
+    print(f"🧪 Benchmarking {len(conversations)} sessions / {total_messages} messages "
+          f"(mock LLM {args.llm_latency_ms} ms + {args.token_ms} ms/token)")
+
+    results = []
+    for level in [int(c) for c in args.concurrency.split(",") if c.strip()]:
+        # Start every level cold so the levels are comparable
+        assistant.response_cache.invalidate()
+        with contextlib.redirect_stdout(output):
+            result = asyncio.run(run_level(assistant, conversations, level, f"c{level}"))
+        print_level(result)
+        results.append(result)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results, "llm": assistant.llm.get_stats()}, f, indent=2)
+        print(f"\n💾 Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Audio Pipeline Benchmark
+CPU time spent per second of voice audio in the realtime client's audio path
+(realtime/realtime_client.py), against the previous per-chunk numpy/base64
+implementation, with synthetic PCM16 audio and no network.
+
+- input:  microphone chunks through append_input_audio up to the serialized
+          input_audio_buffer.append events (the websocket send is stubbed
+          with the json.dumps the real send does)
+- output: response.audio.delta events through the conversation's delta
+          processing (decode and store per item), in replies of
+          --reply-seconds each
+
+Reported per audio second: CPU milliseconds and websocket events; for input
+also the microphone history held at the end of the run (the previous code
+kept the whole session, the ring buffer keeps SASABOT_AUDIO_HISTORY_SECONDS).
+
+Usage:
+    python benchmarks/audio_pipeline.py
+    python benchmarks/audio_pipeline.py --seconds 120 --chunk-ms 10,20,50 --frame-ms 100
+    python benchmarks/audio_pipeline.py --json audio_results.json
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+
+# =============================================================================
+# AUDIO
+# =============================================================================
+
+def synthetic_pcm(seconds: float, sample_rate: int) -> bytes:
+    """A 440 Hz tone with some noise, as PCM16 bytes"""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    signal = 0.3 * np.sin(2 * np.pi * 440 * t) + 0.05 * np.random.default_rng(0).standard_normal(len(t))
+    return (np.clip(signal, -1, 1) * 32767).astype(np.int16).tobytes()
+
+
+def split(data: bytes, chunk_bytes: int) -> List[bytes]:
+    return [data[i:i + chunk_bytes] for i in range(0, len(data), chunk_bytes)]
+
+
+def cpu_time(fn) -> float:
+    started = time.process_time()
+    fn()
+    return time.process_time() - started
+
+
+# =============================================================================
+# INPUT PATH
+# =============================================================================
+
+def run_input(chunks: List[bytes], legacy: bool) -> Dict[str, Any]:
+    """Feed every chunk through append_input_audio (or the previous implementation)"""
+    from realtime.realtime_client import RealtimeClient, array_buffer_to_base64
+
+    client = RealtimeClient(api_key="benchmark")
+    events = 0
+
+    async def send(event_name, data=None):
+        nonlocal events
+        events += 1
+        json.dumps({"event_id": "evt_0", "type": event_name, **(data or {})})
+
+    client.realtime.send = send
+    history = bytearray()
+
+    async def legacy_append(array_buffer):
+        if len(array_buffer) > 0:
+            await client.realtime.send(
+                "input_audio_buffer.append", {"audio": array_buffer_to_base64(np.array(array_buffer))}
+            )
+            history.extend(array_buffer)
+
+    append = legacy_append if legacy else client.append_input_audio
+
+    async def feed():
+        for chunk in chunks:
+            await append(chunk)
+        if not legacy:
+            await client.flush_input_audio()
+
+    seconds = cpu_time(lambda: asyncio.run(feed()))
+    history_bytes = len(history) if legacy else client.input_audio_buffer.capacity
+    return {"cpu_seconds": seconds, "events": events, "history_bytes": history_bytes}
+
+
+# =============================================================================
+# OUTPUT PATH
+# =============================================================================
+
+def run_output(deltas: List[str], deltas_per_reply: int, legacy: bool) -> Dict[str, Any]:
+    """Process response.audio.delta events, starting a new assistant item every deltas_per_reply"""
+    from realtime.realtime_client import RealtimeConversation, base64_to_array_buffer
+
+    conversation = RealtimeConversation()
+    events = []
+    for index, delta in enumerate(deltas):
+        item_id = f"item_{index // deltas_per_reply}"
+        if index % deltas_per_reply == 0:
+            events.append({
+                "type": "conversation.item.created",
+                "item": {"id": item_id, "type": "message", "role": "assistant", "status": "in_progress",
+                         "content": []},
+            })
+        events.append({"type": "response.audio.delta", "item_id": item_id, "content_index": 0, "delta": delta})
+
+    def legacy_delta(event):
+        item = conversation.get_item(event["item_id"])
+        if not isinstance(item["formatted"]["audio"], list):
+            item["formatted"]["audio"] = []
+        append_values = base64_to_array_buffer(event["delta"]).tobytes()
+        item["formatted"]["audio"] += [append_values]
+        return item, {"audio": append_values}
+
+    if legacy:
+        # Same event dispatch, previous delta handling
+        conversation._process_audio_delta = legacy_delta
+
+    def feed():
+        for event in events:
+            conversation.process_event(event)
+
+    seconds = cpu_time(feed)
+    return {"cpu_seconds": seconds, "events": len(deltas)}
+
+
+# =============================================================================
+# RUN
+# =============================================================================
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark CPU per second of audio in the realtime client")
+    parser.add_argument("--seconds", type=float, default=60.0, help="audio seconds per run")
+    parser.add_argument("--chunk-ms", default="10,20,40", help="comma-separated microphone chunk sizes")
+    parser.add_argument("--delta-ms", type=float, default=50.0, help="output audio delta size")
+    parser.add_argument("--reply-seconds", type=float, default=5.0, help="audio length of each spoken reply")
+    parser.add_argument("--frame-ms", type=float, help="input frame size (default: SASABOT_AUDIO_FRAME_MS or 100)")
+    parser.add_argument("--json", help="also write the results to this file")
+    return parser.parse_args(argv)
+
+
+def per_audio_second(result: Dict[str, Any], audio_seconds: float) -> Dict[str, float]:
+    summary = {
+        "cpu_ms": round(result["cpu_seconds"] * 1000 / audio_seconds, 3),
+        "events": round(result["events"] / audio_seconds, 1),
+    }
+    if "history_bytes" in result:
+        summary["history_mb"] = round(result["history_bytes"] / 2 ** 20, 2)
+    return summary
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.frame_ms:
+        os.environ["SASABOT_AUDIO_FRAME_MS"] = str(args.frame_ms)
+
+    from realtime.realtime_client import RealtimeConversation
+    sample_rate = RealtimeConversation.default_frequency
+    audio = synthetic_pcm(args.seconds, sample_rate)
+    print(f"🧪 {args.seconds:g}s of PCM16 audio at {sample_rate} Hz "
+          f"(frames of {os.getenv('SASABOT_AUDIO_FRAME_MS', '100')} ms)")
+
+    results = {"input": [], "output": {}}
+    print(f"\n🎤 Input: per audio second")
+    print(f"   {'chunk ms':>8} {'legacy cpu ms':>14} {'cpu ms':>8} {'legacy events':>14} {'events':>8} "
+          f"{'legacy hist MB':>15} {'hist MB':>8}")
+    for chunk_ms in [float(c) for c in args.chunk_ms.split(",") if c.strip()]:
+        chunks = split(audio, int(chunk_ms * sample_rate / 1000) * 2)
+        legacy = per_audio_second(run_input(chunks, legacy=True), args.seconds)
+        current = per_audio_second(run_input(chunks, legacy=False), args.seconds)
+        results["input"].append({"chunk_ms": chunk_ms, "legacy": legacy, "current": current})
+        print(f"   {chunk_ms:>8g} {legacy['cpu_ms']:>14.3f} {current['cpu_ms']:>8.3f} "
+              f"{legacy['events']:>14.1f} {current['events']:>8.1f} "
+              f"{legacy['history_mb']:>15.2f} {current['history_mb']:>8.2f}")
+
+    deltas = [base64.b64encode(chunk).decode("ascii")
+              for chunk in split(audio, int(args.delta_ms * sample_rate / 1000) * 2)]
+    deltas_per_reply = max(1, int(args.reply_seconds * 1000 / args.delta_ms))
+    legacy = per_audio_second(run_output(deltas, deltas_per_reply, legacy=True), args.seconds)
+    current = per_audio_second(run_output(deltas, deltas_per_reply, legacy=False), args.seconds)
+    results["output"] = {"delta_ms": args.delta_ms, "legacy": legacy, "current": current}
+    print(f"\n🔊 Output ({args.delta_ms:g} ms deltas): {legacy['cpu_ms']:.3f} -> {current['cpu_ms']:.3f} "
+          f"CPU ms per audio second")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "sample_rate": sample_rate, "results": results}, f, indent=2)
+        print(f"\n💾 Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,12 +3,16 @@ Sasabot Assistant - LLM-Powered with JSON Database
 Intelligent AI assistant using OpenAI function calling with persistent JSON data
 """
 
-import openai
+import asyncio
 import json
 import chainlit as cl
 from typing import Dict, Any, List, Optional
+from contextlib import aclosing
+from contextvars import ContextVar, Token
 from datetime import datetime
+from types import SimpleNamespace
 import os
+import time
 
 # Import database and tools
 from utils.simple_db import db
@@ -22,22 +26,86 @@ from .customer_tools import (
     place_order_handler, get_order_status_handler,
 )
 
+from .conversation_flow import parse_user_intent_handler
+from .fast_path import FastPathRouter
+from .response_policy import response_policy
+from .tool_scopes import ToolSelector
+from .speculation import speculator, Speculation
+from .tool_dispatch import ToolDispatcher, invalid_arguments_result
+from utils.prompt_budget import prompt_budget, compact_tool_result, trim_history, count_tokens
+from utils.response_cache import response_cache
+from utils.model_router import model_router, LARGE, SMALL
+from utils.llm_gateway import llm_gateway
+from utils.session_store import session_store
+from utils.conversation_summary import summarizer, format_memory
+from utils.tracing import tracer
+from utils.metrics import TOOL_SECONDS, TOOL_CALLS
+from utils.single_flight import SingleFlight, flight_key
 from .payment_tools import (
     initiate_mpesa_payment_handler, check_payment_status_handler, 
     cancel_payment_handler, get_payment_help_handler, 
     retry_payment_handler, complete_mpesa_payment_handler
 )
 
+# Names of the tools called while handling the current message
+_turn_tools: ContextVar[Optional[List[str]]] = ContextVar("sasabot_turn_tools", default=None)
+
+# Whether the current message's reply was completed by the LLM and whether a tool
+# failed; only completed turns without tool failures go into the response cache
+_turn_cache_state: ContextVar[Optional[Dict[str, bool]]] = ContextVar("sasabot_turn_cache_state", default=None)
+
+# Tool calls prefetched while the model decides what to call (see realtime/speculation.py)
+_turn_speculation: ContextVar[Optional[Speculation]] = ContextVar("sasabot_turn_speculation", default=None)
+
+# Session used instead of cl.user_session in the current context (see use_session)
+_session_override: ContextVar[Optional[Any]] = ContextVar("sasabot_session", default=None)
+
+
+class LocalSession:
+    """Dict-backed stand-in for cl.user_session, for running the assistant outside Chainlit"""
+    
+    def __init__(self, session_id: str, **values):
+        self._values = {"id": session_id, **values}
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._values.get(key, default)
+    
+    def set(self, key: str, value: Any):
+        self._values[key] = value
+
+
+def use_session(session) -> Token:
+    """
+    Serve the assistant's session lookups from session (anything with get/set)
+    instead of cl.user_session, for the current context and tasks started from it
+    """
+    return _session_override.set(session)
 
 
 class SasabotAssistant:
     """LLM-powered assistant with intelligent conversation and tool calling"""
     
-    def __init__(self):
-        # Initialize OpenAI client
-        self.client = openai.AsyncOpenAI(
-            api_key=os.getenv("OPENAI_API_KEY")
-        )
+    def __init__(self, llm=None):
+        # Shared OpenAI access: pooled client, concurrency limit, retries (or an offline stand-in)
+        self.llm = llm or llm_gateway
+        
+        # Stream tokens to Chainlit as they arrive (set SASABOT_STREAMING=false to disable)
+        self.streaming = os.getenv("SASABOT_STREAMING", "true").lower() != "false"
+        
+        # Deterministic router for simple lookups (set SASABOT_FAST_PATH=false to disable)
+        self.fast_path = FastPathRouter()
+        
+        # Decides when tool output can be shown without a second LLM call
+        self.response_policy = response_policy
+        
+        # Replies to repeated customer questions (set SASABOT_RESPONSE_CACHE=false to disable)
+        self.response_cache = response_cache
+        
+        # Small/large model tiers per call (SASABOT_MODEL_SMALL / SASABOT_MODEL_LARGE)
+        self.model_router = model_router
+        
+        # Conversation histories, bounded and shared with the WhatsApp channel
+        self.sessions = session_store
         
         # UPDATED: Enhanced system prompt to prevent hallucination
         # Updated system prompt for assistant.py
@@ -224,6 +292,19 @@ CONVERSATION STATE AWARENESS:
 
 The system works with real JSON files that persist data between sessions."""
 
+        # The follow-up call only turns tool results into a reply, so it gets
+        # the rules that shape the wording rather than the full prompt again
+        self.follow_up_prompt = """You are Sasabot, an AI assistant for Kenyan e-commerce businesses and their customers.
+Turn the tool results into a warm, concise reply in the user's language (English or basic Swahili).
+
+RULES:
+- Use only facts from the tool results; NEVER make up product details, prices or stock
+- Always show Product IDs prominently: "🆔 ID: 4 | iPhone 13 | KSh 75,000 | 5 in stock"
+- Format prices as KSh with comma separators
+- When a product wasn't found, suggest the closest available products with their IDs
+- For analytics use emoji section headers (💰 📊 🔥 👥 ⚠️ 💡 🎯) and end with next actions
+- Suggest one relevant next step; don't repeat introductions"""
+
         # UPDATED: Modified function definitions to be more strict
         self.functions = [
             {
@@ -387,14 +468,17 @@ The system works with real JSON files that persist data between sessions."""
             },
             {
                 "name": "search_products",
-                "description": "Search for products by name, category, or price",
+                "description": "Search for products by name, category, or price. Use search_mode 'semantic' when the customer describes a need (e.g. 'something to keep tea hot')",
                 "parameters": {
                     "type": "object",
                     "properties": {
                         "query": {"type": "string"},
                         "max_price": {"type": "number"},
                         "category": {"type": "string"},
-                        "business_id": {"type": "string"}
+                        "business_id": {"type": "string"},
+                        "search_mode": {"type": "string", "enum": ["keyword", "semantic"]},
+                        "color": {"type": "string"},
+                        "material": {"type": "string"}
                     },
                     "required": []
                 }
@@ -566,56 +650,234 @@ The system works with real JSON files that persist data between sessions."""
                 }
             }
         ]
+        
+        # Function schemas in the tools API format (enables parallel tool calls)
+        self.tools = [{"type": "function", "function": function} for function in self.functions]
+        
+        # Per-request subsets of self.tools by role and conversation state
+        self.tool_selector = ToolSelector(self.tools)
+        
+        # Likely read-only tool calls run while the completion is in flight
+        self.speculator = speculator
+        
+        # Identical read-only tool calls running at the same time share one execution
+        self.tool_flight = SingleFlight("tools")
+        
+        # Function name -> handler and compiled argument validator, built once
+        handlers = {
+            "validate_product_info": self._validate_product_info,
+            "request_missing_product_info": self._request_missing_product_info,
+            "set_user_role": self._set_user_role,
+            "get_user_context": self._get_user_context_detailed,
+            "add_product": self._add_product,
+            "show_products": self._show_products,
+            "update_product": self._update_product,
+            "delete_product": self._delete_product,
+            "get_business_stats": self._get_business_stats,
+            "get_low_stock_products": self._get_low_stock_products,
+            "browse_products": self._browse_products,
+            "search_products": self._search_products,
+            "place_order": self._place_order,
+            "get_order_status": self._get_order_status,
+            "get_database_stats": self._get_database_stats,
+            "get_enhanced_business_stats": self._get_enhanced_business_stats,
+            "get_sales_analytics": self._get_sales_analytics,
+            "initiate_mpesa_payment": self._initiate_mpesa_payment,
+            "check_payment_status": self._check_payment_status,
+            "cancel_payment": self._cancel_payment,
+            "get_payment_help": self._get_payment_help,
+            "retry_payment": self._retry_payment,
+            "complete_mpesa_payment": self._complete_mpesa_payment
+        }
+        self.dispatcher = ToolDispatcher(
+            self.functions, handlers,
+            filled_by_caller=self.SESSION_FILLED_ARGS, self_checked=self.SELF_CHECKED_TOOLS
+        )
 
-    async def process_message(self, user_message: str) -> str:
-        """Process user message with LLM intelligence"""
+    @tracer.traced("assistant.process_message")
+    async def process_message(self, user_message: str, stream_message: Optional[cl.Message] = None) -> str:
+        """
+        Process user message with LLM intelligence
+        When stream_message is given (and streaming is enabled), tokens of the
+        reply and of the follow-up after a function call are streamed into it
+        """
         try:
             # Get user context
             user_context = self._get_user_context()
             
+            # Simple, parameter-complete requests skip the LLM entirely
+            fast_response = await self.fast_path.try_handle(self, user_message, user_context)
+            if fast_response is not None:
+                tracer.annotate(route="fast_path")
+                self._store_conversation(user_message, fast_response)
+                return fast_response
+            
+            # Repeated generic questions are answered from the response cache
+            user_type, business_id = user_context["user_type"], user_context["business_id"]
+            cached_response = self.response_cache.get(user_message, user_type, business_id)
+            if cached_response is not None:
+                tracer.annotate(route="cache")
+                self._store_conversation(user_message, cached_response)
+                return cached_response
+            
             # Build conversation history
             conversation_history = self._build_conversation_history(user_message, user_context)
             
-            # Call OpenAI with function calling
-            response = await self.client.chat.completions.create(
-                model="gpt-4",
-                messages=conversation_history,
-                functions=self.functions,
-                function_call="auto",
-                temperature=0.7,
-                max_tokens=1500
+            # Only the tool schemas relevant to this user and conversation state
+            history = self.sessions.get_history(self._session_id())
+            scope = self.tool_selector.select(user_type, user_message, history[-1]["ai_response"] if history else "")
+            
+            # Pick the model tier from intent and prompt size
+            intent = await parse_user_intent_handler(user_message, user_type)
+            
+            # Start the tool calls the model will most likely ask for
+            speculation = self.speculator.speculate(
+                self._execute_function_call, user_message, user_type, intent,
+                allowed_tools=scope.names, ignore=frozenset(self.SESSION_FILLED_ARGS)
             )
             
-            # Handle the response
-            return await self._handle_response(response, user_message)
+            prompt_tokens = prompt_budget.log("turn", conversation_history, tool_tokens=scope.tokens)["total"]
+            tier = self.model_router.choose(
+                "turn", intent=intent.get("intent"), message=user_message, prompt_tokens=prompt_tokens
+            )
+            tracer.annotate(route="llm", tier=tier, prompt_tokens=prompt_tokens, tool_scope=scope.state)
+            
+            if not (stream_message is not None and self.streaming):
+                stream_message = None
+            
+            turn_tools: List[str] = []
+            cache_state = {"completed": False, "tool_failed": False}
+            token = _turn_tools.set(turn_tools)
+            cache_token = _turn_cache_state.set(cache_state)
+            speculation_token = _turn_speculation.set(speculation)
+            try:
+                content, tool_calls = await self._complete_turn(
+                    conversation_history, scope.tools, tier, prompt_tokens, stream_message
+                )
+                reply = await self._handle_response(content, tool_calls, user_message, stream_message)
+            finally:
+                _turn_tools.reset(token)
+                _turn_cache_state.reset(cache_token)
+                _turn_speculation.reset(speculation_token)
+                if speculation is not None:
+                    speculation.cancel()
+            
+            # Only read-only turns are safe to replay for other users, and only
+            # when the reply is a finished answer (not a fallback or error text)
+            cacheable = cache_state["completed"] and not cache_state["tool_failed"]
+            if cacheable and not self.MUTATING_TOOLS.intersection(turn_tools):
+                self.response_cache.put(user_message, user_type, business_id, reply)
+            return reply
             
         except Exception as e:
             return f"❌ I encountered an error: {str(e)}\n\nPlease try rephrasing your request or contact support."
 
+    async def _complete_turn(self, conversation_history: List[Dict], tools: List[Dict], tier: str,
+                             prompt_tokens: int, stream_message: Optional[cl.Message] = None):
+        """
+        Run the tool-calling completion for a turn on the chosen tier, offering the given tools
+        If the small model produces tool calls with invalid arguments, the call
+        is redone on the large tier
+        Returns (content, tool calls)
+        """
+        kwargs = dict(
+            model=self.model_router.model(tier),
+            messages=conversation_history,
+            tools=tools,
+            tool_choice="auto",
+            temperature=0.7,
+            max_tokens=1500
+        )
+        started = time.perf_counter()
+        
+        if stream_message is not None:
+            content, tool_calls = await self._stream_completion(stream_message, **kwargs)
+            self.model_router.record(tier, started, prompt_tokens, count_tokens(content))
+        else:
+            response = await self.llm.chat(**kwargs)
+            self.model_router.record_response(tier, started, response, prompt_tokens)
+            message = response.choices[0].message
+            content, tool_calls = message.content, message.tool_calls
+        
+        if tier == SMALL and tool_calls:
+            problems = self.model_router.invalid_tool_calls(tool_calls, tools, check=self.dispatcher.check)
+            if problems:
+                self.model_router.escalate("; ".join(problems))
+                if stream_message is not None:
+                    stream_message.content = ""
+                return await self._complete_turn(conversation_history, tools, LARGE, prompt_tokens, stream_message)
+        
+        return content, tool_calls
+
+    async def _stream_completion(self, stream_message: cl.Message, **kwargs):
+        """
+        Run a streaming chat completion, forwarding content tokens to Chainlit
+        Tool-call ids/names/arguments arrive in fragments keyed by index and are accumulated
+        Returns (content, list of tool calls)
+        """
+        stream = await self.llm.chat(stream=True, **kwargs)
+        
+        content_parts = []
+        calls: Dict[int, Dict[str, Any]] = {}
+        
+        # Closed even if streaming into the message fails, so the gateway slot is freed
+        async with aclosing(stream):
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                
+                if delta.content:
+                    content_parts.append(delta.content)
+                    await stream_message.stream_token(delta.content)
+                
+                for tool_delta in getattr(delta, "tool_calls", None) or []:
+                    call = calls.setdefault(tool_delta.index, {"id": "", "name": "", "arguments": []})
+                    if tool_delta.id:
+                        call["id"] = tool_delta.id
+                    if tool_delta.function and tool_delta.function.name:
+                        call["name"] += tool_delta.function.name
+                    if tool_delta.function and tool_delta.function.arguments:
+                        call["arguments"].append(tool_delta.function.arguments)
+        
+        tool_calls = [
+            SimpleNamespace(
+                id=call["id"],
+                type="function",
+                function=SimpleNamespace(name=call["name"], arguments="".join(call["arguments"]) or "{}")
+            )
+            for _, call in sorted(calls.items())
+        ]
+        
+        return "".join(content_parts), tool_calls
+
     def _get_user_context(self) -> Dict[str, Any]:
         """Get current user session context"""
         return {
-            "user_type": cl.user_session.get("user_type", "unknown"),
-            "business_id": cl.user_session.get("business_id", "mama_jane_electronics"),
-            "conversation_count": cl.user_session.get("message_count", 0)
+            "user_type": self.user_session.get("user_type", "unknown"),
+            "business_id": self.user_session.get("business_id", "mama_jane_electronics"),
+            "conversation_count": self.user_session.get("message_count", 0)
         }
 
-    async def _handle_response(self, response, user_message: str) -> str:
-        """Handle OpenAI response with potential function calls"""
+    async def _handle_response(self, content: Optional[str], tool_calls, user_message: str,
+                               stream_message: Optional[cl.Message] = None) -> str:
+        """Handle the model's reply to a turn, with potential tool calls"""
         try:
-            message = response.choices[0].message
-            
-            # Check if LLM wants to call a function
-            if message.function_call:
-                # Execute the function call
-                function_result = await self._execute_function_call(message.function_call)
+            # Check if LLM wants to call tools (possibly several in parallel)
+            if tool_calls:
+                # Execute all tool calls
+                tool_results = await self._execute_tool_calls(tool_calls)
                 
-                # Get LLM to formulate a natural response based on function result
-                return await self._get_natural_response(user_message, message.function_call, function_result)
+                # Get LLM to formulate one natural response from all results
+                return await self._get_natural_response(
+                    user_message, tool_calls, tool_results, stream_message=stream_message
+                )
             
             else:
                 # Direct response from LLM
-                response_text = message.content
+                response_text = content
+                if response_text:
+                    self._mark_turn("completed")
                 
                 # Store conversation
                 self._store_conversation(user_message, response_text)
@@ -624,13 +886,14 @@ The system works with real JSON files that persist data between sessions."""
                 
         except Exception as e:
             return f"❌ Error processing response: {str(e)}"
+
     async def _get_enhanced_business_stats(self, **kwargs) -> Dict:
         """Get enhanced business statistics"""
         if "business_id" not in kwargs:
-            kwargs["business_id"] = cl.user_session.get("business_id")
+            kwargs["business_id"] = self.user_session.get("business_id")
         
         try:
-            result = get_enhanced_business_stats(kwargs["business_id"])
+            result = await asyncio.to_thread(get_enhanced_business_stats, kwargs["business_id"])
             return result
         except Exception as e:
             return {
@@ -642,14 +905,14 @@ The system works with real JSON files that persist data between sessions."""
     async def _get_sales_analytics(self, **kwargs) -> Dict:
         """Get detailed sales analytics"""
         if "business_id" not in kwargs:
-            kwargs["business_id"] = cl.user_session.get("business_id")
+            kwargs["business_id"] = self.user_session.get("business_id")
         
         # Set default period if not provided
         if "period" not in kwargs:
             kwargs["period"] = "monthly"
         
         try:
-            result = get_sales_analytics(kwargs["business_id"], kwargs["period"])
+            result = await asyncio.to_thread(get_sales_analytics, kwargs["business_id"], kwargs["period"])
             return result
         except Exception as e:
             return {
@@ -658,66 +921,157 @@ The system works with real JSON files that persist data between sessions."""
                 "error_type": "system_error"
             }
 
-    async def _execute_function_call(self, function_call) -> Any:
-        """Execute the function call requested by LLM"""
+    # Tools that write to the JSON database; these run one at a time
+    MUTATING_TOOLS = {
+        "add_product", "update_product", "delete_product", "place_order", "set_user_role",
+        "initiate_mpesa_payment", "cancel_payment", "retry_payment", "complete_mpesa_payment"
+    }
+
+    # Arguments the tool wrappers default from the session when the model omits them;
+    # every wrapper whose function requires one of these must fill it
+    SESSION_FILLED_ARGS = {"business_id"}
+
+    # Tools whose handler reports missing product fields itself
+    SELF_CHECKED_TOOLS = {"validate_product_info", "add_product"}
+
+    # Read-only tools whose result depends only on their arguments (and the
+    # session's business); concurrent identical calls are coalesced
+    COALESCED_TOOLS = {
+        "show_products", "get_business_stats", "get_low_stock_products", "browse_products",
+        "search_products", "get_order_status", "get_database_stats", "get_enhanced_business_stats",
+        "get_sales_analytics", "check_payment_status", "get_payment_help"
+    }
+
+    async def _execute_tool_calls(self, tool_calls) -> List[Any]:
+        """
+        Execute a batch of tool calls, returning results in call order
+        Writes run first, sequentially, so reads in the same batch see them;
+        read-only calls then run concurrently
+        """
+        results: List[Any] = [None] * len(tool_calls)
+        turn_tools = _turn_tools.get()
+        if turn_tools is not None:
+            turn_tools.extend(call.function.name for call in tool_calls)
+        writes = [i for i, call in enumerate(tool_calls) if call.function.name in self.MUTATING_TOOLS]
+        reads = [i for i, call in enumerate(tool_calls) if call.function.name not in self.MUTATING_TOOLS]
+        
+        for i in writes:
+            results[i] = await self._execute_function_call(tool_calls[i].function)
+        
+        # Prefetched results are only valid if nothing was written in between
+        speculation = None if writes else _turn_speculation.get()
+        read_results = await asyncio.gather(
+            *(self._execute_prefetched(tool_calls[i].function, speculation) for i in reads)
+        )
+        for i, result in zip(reads, read_results):
+            results[i] = result
+        
+        if any(self._tool_outcome(result) != "ok" for result in results):
+            self._mark_turn("tool_failed")
+        return results
+
+    async def _execute_prefetched(self, function_call, speculation: Optional[Speculation]) -> Any:
+        """Use the speculatively prefetched result of this call when there is one"""
+        if speculation is not None:
+            hit, result = await speculation.take(function_call)
+            if hit:
+                # The prefetch was counted as speculative; this is the model's call
+                self.dispatcher.prepare(function_call.name, function_call.arguments)
+                TOOL_CALLS.inc(tool=function_call.name, outcome=self._tool_outcome(result))
+                return result
+        return await self._execute_function_call(function_call)
+
+    @tracer.traced("assistant.execute_function_call")
+    async def _execute_function_call(self, function_call, speculative: bool = False) -> Any:
+        """
+        Execute the function call requested by LLM
+        speculative: a prefetch (see realtime/speculation.py); its metrics are labelled "speculative"
+        """
+        def outcome(name: str) -> str:
+            return "speculative" if speculative else name
+        
         try:
             function_name = function_call.name
-            function_args = json.loads(function_call.arguments)
-            
-            # Map function names to handlers
-            function_map = {
-                "validate_product_info": self._validate_product_info,
-                "request_missing_product_info": self._request_missing_product_info,
-                "set_user_role": self._set_user_role,
-                "get_user_context": self._get_user_context_detailed,
-                "add_product": self._add_product,
-                "show_products": self._show_products,
-                "update_product": self._update_product,
-                "delete_product": self._delete_product,
-                "get_business_stats": self._get_business_stats,
-                "get_low_stock_products": self._get_low_stock_products,
-                "browse_products": self._browse_products,
-                "search_products": self._search_products,
-                "place_order": self._place_order,
-                "get_order_status": self._get_order_status,
-                "get_database_stats": self._get_database_stats,
-                "get_enhanced_business_stats": self._get_enhanced_business_stats,
-                "get_sales_analytics": self._get_sales_analytics,
-                "initiate_mpesa_payment": self._initiate_mpesa_payment,
-                "check_payment_status": self._check_payment_status,
-                "cancel_payment": self._cancel_payment,
-                "get_payment_help": self._get_payment_help,
-                "retry_payment": self._retry_payment,
-                "complete_mpesa_payment": self._complete_mpesa_payment
-            }
+            tool, function_args, errors = self.dispatcher.prepare(
+                function_name, function_call.arguments, speculative=speculative
+            )
             
-            if function_name in function_map:
-                return await function_map[function_name](**function_args)
-            else:
+            if tool is None:
+                TOOL_CALLS.inc(tool=function_name, outcome=outcome("error"))
                 return {"error": f"Unknown function: {function_name}"}
+            if errors:
+                # Goes back to the model in this turn instead of failing inside the handler
+                TOOL_CALLS.inc(tool=function_name, outcome=outcome("invalid"))
+                return invalid_arguments_result(function_name, errors)
+            
+            async def run():
+                with tracer.span(f"tool.{function_name}"), TOOL_SECONDS.time(tool=function_name):
+                    result = await tool.handler(**function_args)
+                TOOL_CALLS.inc(tool=function_name, outcome=outcome(self._tool_outcome(result)))
+                return result
+            
+            if function_name not in self.COALESCED_TOOLS:
+                return await run()
+            # The wrappers fill business_id from the session, so it is part of the key
+            key_args = {name: self.user_session.get(name) for name in self.SESSION_FILLED_ARGS}
+            key_args.update(function_args)
+            return await self.tool_flight.do(flight_key(function_name, key_args), run)
                 
         except Exception as e:
+            TOOL_CALLS.inc(tool=getattr(function_call, "name", "unknown"), outcome=outcome("error"))
             return {"error": f"Function execution error: {str(e)}"}
 
-    async def _get_natural_response(self, user_message: str, function_call, function_result) -> str:
-        """Get natural language response based on function result with enhanced context processing"""
-        try:
-            # Enhanced processing for product-related errors
-            if isinstance(function_result, dict):
-                error_type = function_result.get("error_type")
-                context = function_result.get("context", {})
-                
-                # Special handling for product not found errors
-                if error_type == "product_not_found" and context:
-                    follow_up_messages = [
-                        {"role": "system", "content": self.system_prompt},
-                        {"role": "user", "content": user_message},
-                        {"role": "assistant", "content": "", "function_call": {
-                            "name": function_call.name,
-                            "arguments": function_call.arguments
-                        }},
-                        {"role": "function", "name": function_call.name, "content": json.dumps(function_result)},
-                        {"role": "system", "content": f"""
+    @staticmethod
+    def _mark_turn(flag: str):
+        """Set a flag of the current message's cache state (no-op outside process_message)"""
+        cache_state = _turn_cache_state.get()
+        if cache_state is not None:
+            cache_state[flag] = True
+
+    @staticmethod
+    def _tool_outcome(result: Any) -> str:
+        """ok, failed (the tool ran and reported failure, e.g. product not found) or error"""
+        if isinstance(result, dict):
+            if "error" in result:
+                return "error"
+            if result.get("success") is False:
+                return "failed"
+        return "ok"
+
+    def _tool_call_messages(self, user_message: str, tool_calls, tool_results: List[Any]) -> List[Dict]:
+        """Base follow-up messages: the assistant's tool calls and one tool message per result"""
+        messages = [
+            {"role": "system", "content": self.follow_up_prompt},
+            {"role": "user", "content": user_message},
+            {"role": "assistant", "content": None, "tool_calls": [
+                {
+                    "id": call.id,
+                    "type": "function",
+                    "function": {"name": call.function.name, "arguments": call.function.arguments}
+                }
+                for call in tool_calls
+            ]}
+        ]
+        for call, result in zip(tool_calls, tool_results):
+            messages.append({
+                "role": "tool",
+                "tool_call_id": call.id,
+                "content": compact_tool_result(result, query=user_message)
+            })
+        return messages
+
+    def _follow_up_instructions(self, tool_results: List[Any]) -> str:
+        """Pick the follow-up instructions for the most important tool result"""
+        dict_results = [r for r in tool_results if isinstance(r, dict)]
+        
+        if not dict_results:
+            return "Based on the function result above, provide a helpful, natural response to the user. Format any data nicely and suggest relevant next steps."
+        
+        # Product not found errors take priority, then validation errors, then product context
+        for function_result in dict_results:
+            context = function_result.get("context", {})
+            if function_result.get("error_type") == "product_not_found" and context:
+                return f"""
     The user's operation failed because the product wasn't found. You have been given rich context to help resolve this:
 
     CONTEXT PROVIDED:
@@ -736,20 +1090,11 @@ The system works with real JSON files that persist data between sessions."""
     7. Be helpful and guide them to the right product
 
     Remember: Your job is to help users find the right product using your intelligence and the available data.
-                        """}
-                    ]
-                
-                # Special handling for validation errors
-                elif error_type == "validation_error":
-                    follow_up_messages = [
-                        {"role": "system", "content": self.system_prompt},
-                        {"role": "user", "content": user_message},
-                        {"role": "assistant", "content": "", "function_call": {
-                            "name": function_call.name,
-                            "arguments": function_call.arguments
-                        }},
-                        {"role": "function", "name": function_call.name, "content": json.dumps(function_result)},
-                        {"role": "system", "content": f"""
+                        """
+        
+        for function_result in dict_results:
+            if function_result.get("error_type") == "validation_error":
+                return f"""
     The user's request has validation errors. Help them fix these issues:
 
     VALIDATION ERRORS: {function_result.get('validation_errors', [])}
@@ -760,20 +1105,12 @@ The system works with real JSON files that persist data between sessions."""
     3. Give examples of correct format
     4. Be encouraging and helpful
     5. If working with an existing product, show its current details for reference
-                        """}
-                    ]
-                
-                # Enhanced context processing for search results
-                elif context and context.get("available_products"):
-                    follow_up_messages = [
-                        {"role": "system", "content": self.system_prompt},
-                        {"role": "user", "content": user_message},
-                        {"role": "assistant", "content": "", "function_call": {
-                            "name": function_call.name,
-                            "arguments": function_call.arguments
-                        }},
-                        {"role": "function", "name": function_call.name, "content": json.dumps(function_result)},
-                        {"role": "system", "content": f"""
+                        """
+        
+        for function_result in dict_results:
+            context = function_result.get("context", {})
+            if context and context.get("available_products"):
+                return f"""
     Process the function result and present the information clearly to the user. 
 
     SPECIAL INSTRUCTIONS:
@@ -783,43 +1120,59 @@ The system works with real JSON files that persist data between sessions."""
     - If there are suggestions in the context, present them intelligently
     - Make it easy for users to reference products correctly in future operations
 
-    CONTEXT: {json.dumps(context, indent=2)}
-                        """}
-                    ]
-                
-                else:
-                    # Standard processing for other cases
-                    follow_up_messages = [
-                        {"role": "system", "content": self.system_prompt},
-                        {"role": "user", "content": user_message},
-                        {"role": "assistant", "content": "", "function_call": {
-                            "name": function_call.name,
-                            "arguments": function_call.arguments
-                        }},
-                        {"role": "function", "name": function_call.name, "content": json.dumps(function_result)},
-                        {"role": "system", "content": "Based on the function result above, provide a helpful, natural response to the user. Format any data nicely and suggest relevant next steps. Always make Product IDs prominent when displaying products."}
-                    ]
-            else:
-                # Fallback for non-dict results
-                follow_up_messages = [
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": user_message},
-                    {"role": "assistant", "content": "", "function_call": {
-                        "name": function_call.name,
-                        "arguments": function_call.arguments
-                    }},
-                    {"role": "function", "name": function_call.name, "content": json.dumps(function_result)},
-                    {"role": "system", "content": "Based on the function result above, provide a helpful, natural response to the user. Format any data nicely and suggest relevant next steps."}
-                ]
-            
-            response = await self.client.chat.completions.create(
-                model="gpt-4",
-                messages=follow_up_messages,
-                temperature=0.7,
-                max_tokens=1000
+    CONTEXT: {compact_tool_result(context)}
+                        """
+        
+        return "Based on the function result above, provide a helpful, natural response to the user. Format any data nicely and suggest relevant next steps. Always make Product IDs prominent when displaying products."
+
+    async def _get_natural_response(self, user_message: str, tool_calls, tool_results: List[Any],
+                                    stream_message: Optional[cl.Message] = None) -> str:
+        """
+        Get natural language response based on tool results with enhanced context processing
+        All results of a (possibly parallel) set of tool calls go back in one request,
+        unless the response policy can render every result without the LLM
+        """
+        direct_response = self.response_policy.render_all(
+            [call.function.name for call in tool_calls], tool_results
+        )
+        if direct_response is not None:
+            # Rendered from the tool results the same way every time
+            self._mark_turn("completed")
+            self._store_conversation(user_message, direct_response)
+            return direct_response
+        
+        try:
+            follow_up_messages = self._tool_call_messages(user_message, tool_calls, tool_results)
+            follow_up_messages.append({"role": "system", "content": self._follow_up_instructions(tool_results)})
+            prompt_tokens = prompt_budget.log("follow_up", follow_up_messages)["total"]
+            tier = self.model_router.choose(
+                "follow_up", prompt_tokens=prompt_tokens,
+                tool_names=[call.function.name for call in tool_calls], tool_results=tool_results
             )
+            started = time.perf_counter()
             
-            natural_response = response.choices[0].message.content
+            if stream_message is not None:
+                natural_response, _ = await self._stream_completion(
+                    stream_message,
+                    model=self.model_router.model(tier),
+                    messages=follow_up_messages,
+                    temperature=0.7,
+                    max_tokens=1000
+                )
+                self.model_router.record(tier, started, prompt_tokens, count_tokens(natural_response))
+            else:
+                response = await self.llm.chat(
+                    model=self.model_router.model(tier),
+                    messages=follow_up_messages,
+                    temperature=0.7,
+                    max_tokens=1000
+                )
+                self.model_router.record_response(tier, started, response, prompt_tokens)
+                
+                natural_response = response.choices[0].message.content
+            
+            if natural_response:
+                self._mark_turn("completed")
             
             # Store conversation
             self._store_conversation(user_message, natural_response)
@@ -827,21 +1180,28 @@ The system works with real JSON files that persist data between sessions."""
             return natural_response
             
         except Exception as e:
-            # Enhanced fallback with context awareness
-            if isinstance(function_result, dict):
-                if function_result.get("success"):
-                    return f"✅ {function_result.get('message', 'Operation completed successfully!')}"
-                else:
-                    error_msg = f"❌ {function_result.get('message', 'Operation failed.')}"
-                    
-                    # Add helpful context if available
-                    context = function_result.get('context', {})
-                    if context.get('available_products'):
-                        error_msg += f"\n\n💡 Try checking these available products and their IDs for reference."
-                    
-                    return error_msg
-            
-            return f"Operation completed. Result: {json.dumps(function_result, indent=2)}"
+            return "\n\n".join(self._fallback_response(result) for result in tool_results)
+
+    def _fallback_response(self, function_result) -> str:
+        """Context-aware reply for a tool result when the follow-up LLM call fails"""
+        if isinstance(function_result, dict):
+            if function_result.get("success"):
+                return f"✅ {function_result.get('message', 'Operation completed successfully!')}"
+            else:
+                error_msg = f"❌ {function_result.get('message', 'Operation failed.')}"
+                
+                # Add helpful context if available
+                context = function_result.get('context', {})
+                if context.get('available_products'):
+                    error_msg += f"\n\n💡 Try checking these available products and their IDs for reference."
+                
+                return error_msg
+        
+        # String handlers already return formatted text
+        if isinstance(function_result, str):
+            return function_result
+        
+        return f"Operation completed. Result: {json.dumps(function_result, indent=2)}"
 
 
     def _build_conversation_history(self, user_message: str, context: Dict[str, Any]) -> List[Dict[str, str]]:
@@ -850,52 +1210,51 @@ The system works with real JSON files that persist data between sessions."""
             {"role": "system", "content": self.system_prompt}
         ]
         
-        # Enhanced context message
-        context_msg = f"""CURRENT USER CONTEXT:
-    - User Type: {context['user_type']}
-    - Business ID: {context['business_id']} (if vendor)
-    - Messages in session: {context['conversation_count']}
-
-    DATABASE STATUS: ✅ JSON database is connected and operational
-
-    CRITICAL REMINDER: 
-    - NEVER assume or make up product details
-    - Always ask for complete information before adding products
-    - When products aren't found, use available context to suggest alternatives
-    - Always show Product IDs prominently for easy reference
-    - Help users find the right products using available data"""
+        # Session context (the standing rules are already in the system prompt)
+        context_msg = (
+            f"CURRENT USER CONTEXT: user type {context['user_type']}, "
+            f"business ID {context['business_id']} (if vendor), "
+            f"{context['conversation_count']} messages in session"
+        )
         
         messages.append({"role": "system", "content": context_msg})
         
-        # Get recent conversation history
-        history = cl.user_session.get("conversation_history", [])
-        for exchange in history[-5:]:  # Last 5 exchanges
-            messages.append({"role": "user", "content": exchange.get("user_message", "")})
-            messages.append({"role": "assistant", "content": exchange.get("ai_response", "")})
+        # Older exchanges are folded into a running summary with the IDs they mentioned
+        session = self.sessions.get(self._session_id()) or {}
+        memory = format_memory(session)
+        if memory:
+            messages.append({"role": "system", "content": memory})
+        
+        # Recent conversation history, trimmed to the history token budget
+        messages.extend(trim_history(session.get("conversation_history", [])))
         
         # Add current message
         messages.append({"role": "user", "content": user_message})
         
         return messages
 
+    @property
+    def user_session(self):
+        """Chainlit session of the current user, unless another was bound with use_session"""
+        return _session_override.get() or cl.user_session
+
+    def _session_id(self) -> str:
+        """Session store key of the current Chainlit session"""
+        return f"chainlit:{self.user_session.get('id') or 'local'}"
+
+    def end_session(self):
+        """Drop the current Chainlit session's history (called when the chat ends)"""
+        self.sessions.delete(self._session_id())
+
     def _store_conversation(self, user_message: str, ai_response: str):
         """Store conversation in session"""
-        history = cl.user_session.get("conversation_history", [])
-        history.append({
-            "timestamp": datetime.now().isoformat(),
-            "user_message": user_message,
-            "ai_response": ai_response
-        })
-        
         # Keep last 20 exchanges
-        if len(history) > 20:
-            history = history[-20:]
-        
-        cl.user_session.set("conversation_history", history)
+        self.sessions.append_exchange(self._session_id(), user_message, ai_response, max_exchanges=20)
+        summarizer.schedule(self._session_id())
         
         # Update message count
-        count = cl.user_session.get("message_count", 0) + 1
-        cl.user_session.set("message_count", count)
+        count = self.user_session.get("message_count", 0) + 1
+        self.user_session.set("message_count", count)
 
     # =============================================================================
     # NEW VALIDATION FUNCTIONS
@@ -974,9 +1333,9 @@ The system works with real JSON files that persist data between sessions."""
 
     async def _set_user_role(self, role: str, business_id: str = "mama_jane_electronics") -> Dict:
         """Set user role"""
-        cl.user_session.set("user_type", role)
+        self.user_session.set("user_type", role)
         if role == "vendor":
-            cl.user_session.set("business_id", business_id)
+            self.user_session.set("business_id", business_id)
         
         return {
             "success": True,
@@ -988,14 +1347,16 @@ The system works with real JSON files that persist data between sessions."""
     async def _get_user_context_detailed(self) -> Dict:
         """Get detailed user context"""
         return {
-            "user_type": cl.user_session.get("user_type", "unknown"),
-            "business_id": cl.user_session.get("business_id"),
-            "message_count": cl.user_session.get("message_count", 0),
+            "user_type": self.user_session.get("user_type", "unknown"),
+            "business_id": self.user_session.get("business_id"),
+            "message_count": self.user_session.get("message_count", 0),
             "session_active": True
         }
 
     async def _add_product(self, **kwargs) -> Dict:
         """Add product via vendor tools - with enhanced validation"""
+        if "business_id" not in kwargs:
+            kwargs["business_id"] = self.user_session.get("business_id", "mama_jane_electronics")
         # First validate all information is complete
         validation = await self._validate_product_info(**kwargs)
         
@@ -1007,74 +1368,78 @@ The system works with real JSON files that persist data between sessions."""
             }
         
         # If validation passes, proceed with adding product
-        return add_product_handler(**kwargs)
+        return await asyncio.to_thread(add_product_handler, **kwargs)
 
     async def _show_products(self, **kwargs) -> Dict:
         """Show products via vendor tools"""
         if "business_id" not in kwargs:
-            kwargs["business_id"] = cl.user_session.get("business_id", "mama_jane_electronics")
-        return show_products_handler(**kwargs)
+            kwargs["business_id"] = self.user_session.get("business_id", "mama_jane_electronics")
+        return await asyncio.to_thread(show_products_handler, **kwargs)
 
     async def _update_product(self, **kwargs) -> Dict:
         """Update product via vendor tools"""
-        return update_product_handler(**kwargs)
+        if "business_id" not in kwargs:
+            kwargs["business_id"] = self.user_session.get("business_id", "mama_jane_electronics")
+        return await asyncio.to_thread(update_product_handler, **kwargs)
 
     async def _delete_product(self, **kwargs) -> Dict:
         """Delete product via vendor tools"""
-        return delete_product_handler(**kwargs)
+        if "business_id" not in kwargs:
+            kwargs["business_id"] = self.user_session.get("business_id", "mama_jane_electronics")
+        return await asyncio.to_thread(delete_product_handler, **kwargs)
 
     async def _get_business_stats(self, **kwargs) -> Dict:
         """Get business stats"""
         if "business_id" not in kwargs:
-            kwargs["business_id"] = cl.user_session.get("business_id", "mama_jane_electronics")
-        return get_business_stats(**kwargs)
+            kwargs["business_id"] = self.user_session.get("business_id", "mama_jane_electronics")
+        return await asyncio.to_thread(get_business_stats, **kwargs)
 
     async def _get_low_stock_products(self, **kwargs) -> Dict:
         """Get low stock products"""
         if "business_id" not in kwargs:
-            kwargs["business_id"] = cl.user_session.get("business_id", "mama_jane_electronics")
-        return get_low_stock_products(**kwargs)
+            kwargs["business_id"] = self.user_session.get("business_id", "mama_jane_electronics")
+        return await asyncio.to_thread(get_low_stock_products, **kwargs)
 
     async def _browse_products(self, **kwargs) -> str:
         """Browse products for customers"""
-        return browse_products_handler(kwargs)
+        return await asyncio.to_thread(browse_products_handler, kwargs)
 
     async def _search_products(self, **kwargs) -> str:
         """Search products for customers"""
-        return search_products_handler(kwargs)
+        return await asyncio.to_thread(search_products_handler, kwargs)
 
     async def _place_order(self, **kwargs) -> str:
         """Place order for customers"""
-        return place_order_handler(kwargs)
+        return await asyncio.to_thread(place_order_handler, kwargs)
 
     async def _get_order_status(self, **kwargs) -> str:
         """Get order status"""
-        return get_order_status_handler(kwargs)
+        return await asyncio.to_thread(get_order_status_handler, kwargs)
 
     async def _get_database_stats(self) -> Dict:
         """Get database statistics"""
-        return db.get_stats()
+        return await asyncio.to_thread(db.get_stats)
     
     async def _initiate_mpesa_payment(self, **kwargs) -> Dict:
         """Initiate M-Pesa payment"""
-        return initiate_mpesa_payment_handler(**kwargs)
+        return await asyncio.to_thread(initiate_mpesa_payment_handler, **kwargs)
 
     async def _check_payment_status(self, **kwargs) -> Dict:
         """Check payment status"""
-        return check_payment_status_handler(**kwargs)
+        return await asyncio.to_thread(check_payment_status_handler, **kwargs)
 
     async def _cancel_payment(self, **kwargs) -> Dict:
         """Cancel payment"""
-        return cancel_payment_handler(**kwargs)
+        return await asyncio.to_thread(cancel_payment_handler, **kwargs)
 
     async def _get_payment_help(self, **kwargs) -> Dict:
         """Get payment help"""
-        return get_payment_help_handler(**kwargs)
+        return await asyncio.to_thread(get_payment_help_handler, **kwargs)
 
     async def _retry_payment(self, **kwargs) -> Dict:
         """Retry payment"""
-        return retry_payment_handler(**kwargs)
+        return await asyncio.to_thread(retry_payment_handler, **kwargs)
 
     async def _complete_mpesa_payment(self, **kwargs) -> Dict:
         """Complete payment simulation"""
-        return complete_mpesa_payment_handler(**kwargs)
+        return await asyncio.to_thread(complete_mpesa_payment_handler, **kwargs)
@@ -0,0 +1,221 @@
+"""
+Audio Buffers
+PCM16 buffers for the realtime voice path, built to avoid per-chunk copies:
+
+- FrameCoalescer packs microphone chunks into fixed-size frames in one
+  preallocated buffer. Each frame is base64-encoded once, straight from that
+  buffer (or from the caller's chunk when it holds whole frames), so a stream
+  of small chunks becomes fewer, larger input_audio_buffer.append events.
+- PCMBuffer holds one item's output audio in a preallocated buffer that grows
+  by doubling; decoded deltas are written into place and readers get
+  memoryviews instead of a list of byte strings.
+- PCMRingBuffer keeps the last N seconds of the session's microphone audio
+  in a fixed allocation and serves spans by their time in the stream.
+"""
+
+import base64
+from typing import List, Optional
+
+import numpy as np
+
+
+SAMPLE_WIDTH = 2  # bytes per PCM16 sample (mono)
+
+
+def pcm_view(audio) -> memoryview:
+    """Byte view of PCM16 audio: bytes-like objects as they are, float32 arrays converted"""
+    if isinstance(audio, (bytes, bytearray)):
+        return memoryview(audio)
+    if isinstance(audio, np.ndarray):
+        if audio.dtype == np.float32:
+            audio = (np.clip(audio, -1, 1) * 32767).astype(np.int16)
+        audio = np.ascontiguousarray(audio)
+    view = memoryview(audio)
+    return view if view.format == "B" and view.ndim == 1 else view.cast("B")
+
+
+def ms_to_bytes(ms: float, sample_rate: int) -> int:
+    """Byte length of `ms` of PCM16 audio, rounded down to whole samples"""
+    return int(ms * sample_rate / 1000) * SAMPLE_WIDTH
+
+
+class FrameCoalescer:
+    """Cuts a PCM16 stream into base64 frames of a fixed size"""
+
+    def __init__(self, frame_bytes: int):
+        self.frame_bytes = max(SAMPLE_WIDTH, frame_bytes - frame_bytes % SAMPLE_WIDTH)
+        self._buffer = bytearray(self.frame_bytes)
+        self._view = memoryview(self._buffer)
+        self._filled = 0
+
+    @property
+    def pending_bytes(self) -> int:
+        return self._filled
+
+    @staticmethod
+    def _encode(view: memoryview) -> str:
+        return base64.b64encode(view).decode("ascii")
+
+    def write(self, audio) -> List[str]:
+        """Add a chunk; returns the frames it completed (base64)"""
+        data = pcm_view(audio)
+        frames = []
+        offset = 0
+
+        if self._filled:
+            take = min(len(data), self.frame_bytes - self._filled)
+            self._view[self._filled:self._filled + take] = data[:take]
+            self._filled += take
+            offset = take
+            if self._filled < self.frame_bytes:
+                return frames
+            frames.append(self._encode(self._view))
+            self._filled = 0
+
+        # Whole frames are encoded from the caller's chunk without copying
+        while len(data) - offset >= self.frame_bytes:
+            frames.append(self._encode(data[offset:offset + self.frame_bytes]))
+            offset += self.frame_bytes
+
+        rest = len(data) - offset
+        if rest:
+            self._view[:rest] = data[offset:]
+            self._filled = rest
+        return frames
+
+    def flush(self) -> Optional[str]:
+        """The partial frame, if any (e.g. before committing the input buffer)"""
+        if not self._filled:
+            return None
+        frame = self._encode(self._view[:self._filled])
+        self._filled = 0
+        return frame
+
+    def clear(self):
+        self._filled = 0
+
+
+class PCMBuffer:
+    """Growable PCM16 byte buffer; the first append allocates `capacity` bytes"""
+
+    def __init__(self, capacity: int = 0):
+        self.capacity = capacity
+        self._buffer: Optional[bytearray] = None
+        self._length = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __bool__(self) -> bool:
+        return self._length > 0
+
+    @property
+    def samples(self) -> int:
+        return self._length // SAMPLE_WIDTH
+
+    def append(self, audio):
+        data = pcm_view(audio)
+        end = self._length + len(data)
+        if self._buffer is None or end > len(self._buffer):
+            self._grow(end)
+        self._buffer[self._length:end] = data
+        self._length = end
+
+    def _grow(self, needed: int):
+        size = max(needed, self.capacity, 2 * len(self._buffer) if self._buffer else 0)
+        # A new buffer rather than a resize, so views handed out earlier stay valid
+        grown = bytearray(size)
+        if self._length:
+            grown[:self._length] = memoryview(self._buffer)[:self._length]
+        self._buffer = grown
+
+    def view(self) -> memoryview:
+        """The audio so far, without copying"""
+        if self._buffer is None:
+            return memoryview(b"")
+        return memoryview(self._buffer)[:self._length]
+
+    def tobytes(self) -> bytes:
+        return self.view().tobytes()
+
+    def truncate(self, length: int):
+        """Keep the first `length` bytes (rounded down to whole samples)"""
+        self._length = min(self._length, max(0, length - length % SAMPLE_WIDTH))
+
+
+class PCMRingBuffer:
+    """
+    The last `capacity` bytes of a PCM16 stream, addressed by stream position
+    Positions count every byte ever appended, so a span can be asked for by
+    its offset from the start of the stream (e.g. the server's audio_start_ms)
+    even after the buffer has wrapped; older audio is overwritten in place and
+    the memory used never exceeds `capacity` (allocated on the first append).
+    """
+
+    def __init__(self, capacity: int, sample_rate: int):
+        self.capacity = max(SAMPLE_WIDTH, capacity - capacity % SAMPLE_WIDTH)
+        self.sample_rate = sample_rate
+        self._buffer: Optional[bytearray] = None
+        self.written = 0  # bytes appended since the stream started
+        self.committed = 0  # stream position of the last commit()
+
+    def __len__(self) -> int:
+        """Bytes currently held"""
+        return min(self.written, self.capacity)
+
+    def __bool__(self) -> bool:
+        return self.written > 0
+
+    @property
+    def start(self) -> int:
+        """Stream position of the oldest byte still held"""
+        return self.written - len(self)
+
+    @property
+    def pending(self) -> int:
+        """Bytes appended since the last commit()"""
+        return self.written - self.committed
+
+    def append(self, audio):
+        data = pcm_view(audio)
+        if self._buffer is None:
+            self._buffer = bytearray(self.capacity)
+        size = len(data)
+        if size > self.capacity:
+            # Only the tail survives anyway
+            self.written += size - self.capacity
+            data = data[size - self.capacity:]
+            size = self.capacity
+
+        offset = self.written % self.capacity
+        first = min(size, self.capacity - offset)
+        self._buffer[offset:offset + first] = data[:first]
+        if first < size:
+            self._buffer[:size - first] = data[first:]
+        self.written += size
+
+    def slice(self, start: int, end: int) -> bytes:
+        """Bytes between two stream positions; the part already overwritten is left out"""
+        start = max(start - start % SAMPLE_WIDTH, self.start)
+        end = min(end - end % SAMPLE_WIDTH, self.written)
+        if end <= start:
+            return b""
+        first, last = start % self.capacity, end % self.capacity or self.capacity
+        if first < last:
+            return bytes(self._buffer[first:last])
+        return bytes(self._buffer[first:]) + bytes(self._buffer[:last])
+
+    def slice_ms(self, start_ms: float, end_ms: float) -> bytes:
+        """Audio between two times measured from the start of the stream"""
+        return self.slice(ms_to_bytes(start_ms, self.sample_rate), ms_to_bytes(end_ms, self.sample_rate))
+
+    def commit(self) -> bytes:
+        """The audio appended since the last commit, marking it committed"""
+        audio = self.slice(self.committed, self.written)
+        self.committed = self.written
+        return audio
+
+    def clear(self):
+        """Start a new stream (positions restart at 0); the allocation is kept"""
+        self.written = 0
+        self.committed = 0
@@ -7,6 +7,8 @@ import chainlit as cl
 import json
 from typing import Dict, List, Optional
 
+from utils.query_normalizer import normalize_query
+
 # =============================================================================
 # WELCOME & GREETING
 # =============================================================================
@@ -168,7 +170,9 @@ parse_user_intent_def = {
 
 async def parse_user_intent_handler(message: str, user_type: str, conversation_context: str = ""):
     """Parse user intent from message"""
-    message_lower = message.lower()
+    # Intent keywords are checked on the translated text (Swahili/Sheng -> English);
+    # names and prices are taken from the user's own words
+    message_lower = normalize_query(message).lower()
     
     # Common intents for both user types
     if any(word in message_lower for word in ["help", "assistance", "commands", "what can you do"]):
@@ -249,13 +253,15 @@ async def parse_user_intent_handler(message: str, user_type: str, conversation_c
             
             return {"intent": "browse_products", "confidence": 0.9, "parameters": params}
         
-        elif any(word in message_lower for word in ["search", "find", "looking for"]):
+        elif any(word in message_lower for word in ["search", "find", "looking for", "do you sell", "do you have"]):
             # Extract search term
-            search_terms = ["search", "find", "looking for"]
+            search_terms = ["search", "find", "looking for", "do you sell", "do you have"]
             search_term = ""
             for term in search_terms:
-                if term in message_lower:
-                    parts = message_lower.split(term)
+                # The original wording when the keyword is in it, else the translation
+                text = message.lower() if term in message.lower() else message_lower
+                if term in text:
+                    parts = text.split(term)
                     if len(parts) > 1:
                         search_term = parts[1].strip()
                         break
@@ -267,8 +273,9 @@ async def parse_user_intent_handler(message: str, user_type: str, conversation_c
             buy_terms = ["buy", "purchase", "order", "want to buy"]
             product_name = ""
             for term in buy_terms:
-                if term in message_lower:
-                    parts = message_lower.split(term)
+                text = message.lower() if term in message.lower() else message_lower
+                if term in text:
+                    parts = text.split(term)
                     if len(parts) > 1:
                         product_name = parts[1].strip()
                         break
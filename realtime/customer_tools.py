@@ -5,8 +5,13 @@ All data now loads from and saves to JSON files
 """
 
 import json
+from pathlib import Path
 from typing import Dict, Any, List
 from utils.simple_db import db
+from utils.render_cache import render_cache
+from utils.semantic_index import get_semantic_index
+from utils.query_normalizer import normalize_query
+from utils.catalog_enrichment import catalog_enrichment
 from datetime import datetime
 
 from .payment_tools import (
@@ -21,6 +26,8 @@ def browse_products_handler(params: Dict[str, Any]) -> str:
     Now loads fresh data from JSON files
     """
     try:
+        channel = params.get('channel', 'chainlit')
+        
         # Load fresh products from JSON database
         all_products = db.get_products()
         businesses = db.get_businesses()
@@ -69,31 +76,7 @@ def browse_products_handler(params: Dict[str, Any]) -> str:
                     result += f"\n📂 **{category}**\n"
                     current_category = category
                 
-                # Format product info
-                name = product.get('name', 'Unknown Product')
-                price = product.get('price', 0)
-                stock = product.get('stock', 0)
-                brand = product.get('brand', '')
-                warranty = product.get('warranty', '')
-                
-                result += f"   🔹 **{name}**"
-                if brand:
-                    result += f" ({brand})"
-                result += f"\n      💰 KSh {price:,}"
-                result += f" | 📦 {stock} in stock"
-                if warranty:
-                    result += f" | 🛡️ {warranty} warranty"
-                result += f"\n      🆔 Product ID: {product.get('id', 'N/A')}\n"
-                
-                # Add description if available
-                description = product.get('description', '')
-                if description:
-                    # Truncate long descriptions
-                    if len(description) > 80:
-                        description = description[:77] + "..."
-                    result += f"      📝 {description}\n"
-                
-                result += "\n"
+                result += render_cache.render(product, "browse", channel)
             
             result += "\n" + "="*60 + "\n\n"
         
@@ -116,15 +99,21 @@ def search_products_handler(params: Dict[str, Any]) -> str:
     """
     Search for products by name, category, or price range
     Now searches through current JSON data
+    search_mode 'semantic' ranks by meaning using the local embedding index;
+    keyword searches that find nothing fall back to semantic ranking
     """
     try:
-        query = params.get('query', '').strip().lower()
+        query = normalize_query(params.get('query', '').strip(), stem_words=True)
         max_price = params.get('max_price')
         category = params.get('category', '').strip().lower()
         business_id = params.get('business_id', '').strip()
+        search_mode = params.get('search_mode', 'keyword').strip().lower()
+        channel = params.get('channel', 'chainlit')
+        color = params.get('color', '').strip().lower()
+        material = params.get('material', '').strip().lower()
         
-        if not query and not max_price and not category and not business_id:
-            return "❌ Please provide at least one search criteria:\n- query: product name to search\n- max_price: maximum price\n- category: product category\n- business_id: specific business"
+        if not query and not max_price and not category and not business_id and not color and not material:
+            return "❌ Please provide at least one search criteria:\n- query: product name to search\n- max_price: maximum price\n- category: product category\n- business_id: specific business\n- color / material: product attributes"
         
         # Load fresh products from JSON database
         all_products = db.get_products()
@@ -133,6 +122,21 @@ def search_products_handler(params: Dict[str, Any]) -> str:
         if not all_products:
             return "🔍 No products available to search."
         
+        # Semantic scores by product ID (only used in semantic mode)
+        semantic_scores = {}
+        catalog_matches = []
+        if query and search_mode == 'semantic':
+            semantic_scores, catalog_matches = _semantic_matches(query)
+        
+        # Attribute filters come from the prebuilt enrichment index
+        if color or material:
+            attribute_matches = catalog_enrichment.find(color=color, material=material)
+            if catalog_matches:
+                keys = {r['key'] for r in attribute_matches}
+                catalog_matches = [r for r in catalog_matches if Path(str(r.get('image', ''))).stem in keys]
+            else:
+                catalog_matches = attribute_matches[:3]
+        
         # Filter products based on search criteria
         matching_products = []
         
@@ -143,8 +147,13 @@ def search_products_handler(params: Dict[str, Any]) -> str:
             
             matches = True
             
+            # Search by meaning
+            if query and search_mode == 'semantic':
+                if product.get('id') not in semantic_scores:
+                    matches = False
+            
             # Search by name/description
-            if query:
+            elif query:
                 product_name = product.get('name', '').lower()
                 product_desc = product.get('description', '').lower()
                 product_brand = product.get('brand', '').lower()
@@ -171,14 +180,29 @@ def search_products_handler(params: Dict[str, Any]) -> str:
                 if product.get('business_id', '') != business_id:
                     matches = False
             
+            # Filter by color/material
+            if matches and (color or material):
+                if not catalog_enrichment.product_matches(product, color, material):
+                    matches = False
+            
             if matches:
                 matching_products.append(product)
         
+        # Nothing matched literally - try matching by meaning instead
+        if not matching_products and query and search_mode != 'semantic':
+            return search_products_handler({**params, 'search_mode': 'semantic'})
+        
+        if not matching_products and catalog_matches:
+            names = "\n".join(f"- {record.get('name', 'Unknown item')}" for record in catalog_matches)
+            return f"🔍 No listed products match, but these catalogue items look related:\n{names}\n\n💡 Ask a vendor to list them, or browse all products to see what's available"
+        
         if not matching_products:
             return f"🔍 No products found matching your search criteria.\n\n💡 Try:\n- Different keywords\n- Higher price limit\n- Different category\n- Browse all products to see what's available"
         
         # Sort results by relevance (name match first, then price)
-        if query:
+        if semantic_scores:
+            matching_products.sort(key=lambda x: -semantic_scores.get(x.get('id'), 0))
+        elif query:
             matching_products.sort(key=lambda x: (
                 0 if query in x.get('name', '').lower() else 1,
                 x.get('price', 0)
@@ -192,6 +216,8 @@ def search_products_handler(params: Dict[str, Any]) -> str:
         criteria = []
         if query:
             criteria.append(f"Query: '{query}'")
+        if semantic_scores:
+            criteria.append("Matched by meaning")
         if max_price:
             criteria.append(f"Max Price: KSh {max_price:,}")
         if category:
@@ -199,6 +225,10 @@ def search_products_handler(params: Dict[str, Any]) -> str:
         if business_id:
             business_name = businesses.get(business_id, {}).get('name', business_id)
             criteria.append(f"Business: {business_name}")
+        if color:
+            criteria.append(f"Color: {color}")
+        if material:
+            criteria.append(f"Material: {material}")
         
         result += f"📋 Search criteria: {' | '.join(criteria)}\n"
         result += f"📊 Found {len(matching_products)} products\n\n"
@@ -221,28 +251,20 @@ def search_products_handler(params: Dict[str, Any]) -> str:
             result += f"📍 {business.get('location', 'Unknown Location')}\n"
             result += f"📞 {business.get('phone', 'No phone')}\n\n"
             
-            for product in products:
-                name = product.get('name', 'Unknown Product')
-                price = product.get('price', 0)
-                stock = product.get('stock', 0)
-                category = product.get('category', 'Other')
-                brand = product.get('brand', '')
-                
-                result += f"   🔹 **{name}**"
-                if brand:
-                    result += f" ({brand})"
-                result += f"\n      💰 KSh {price:,} | 📂 {category} | 📦 {stock} available"
-                result += f"\n      🆔 Product ID: {product.get('id', 'N/A')}\n"
-                
-                # Highlight matching terms in description
-                description = product.get('description', '')
-                if description and len(description) <= 100:
-                    result += f"      📝 {description}\n"
-                
-                result += "\n"
+            result += render_cache.render_many(products, "search", channel)
             
             result += "─" * 40 + "\n\n"
         
+        # Related catalogue descriptions that are not listed products
+        if catalog_matches:
+            result += "📚 **Related items from our catalogue:**\n"
+            for record in catalog_matches:
+                result += f"   • {record.get('name', 'Unknown item')}"
+                if record.get('color'):
+                    result += f" ({record['color']})"
+                result += "\n"
+            result += "\n"
+        
         result += "💡 To order any of these products, use the 'Place Order' tool with the Product ID."
         
         return result
@@ -251,6 +273,27 @@ def search_products_handler(params: Dict[str, Any]) -> str:
         return f"❌ Error searching products: {str(e)}\nPlease try again with valid search criteria."
 
 
+def _semantic_matches(query: str, limit: int = 10, min_product_score: float = 0.1):
+    """
+    Rank products by meaning using the local embedding index
+    Returns ({product_id: score}, [related products_details records])
+    """
+    try:
+        hits = get_semantic_index().search(query, top_k=limit * 2)
+    except Exception as e:
+        print(f"⚠️ Semantic search unavailable: {e}")
+        return {}, []
+    
+    scores = {}
+    catalog_matches = []
+    for hit in hits:
+        if hit.get('source') == 'products' and len(scores) < limit and hit['score'] >= min_product_score:
+            scores[hit['product'].get('id')] = hit['score']
+        elif hit.get('source') == 'details' and len(catalog_matches) < 3:
+            catalog_matches.append(hit['record'])
+    return scores, catalog_matches
+
+
 def place_order_handler(params: Dict[str, Any]) -> str:
     """
     Place an order for products
@@ -581,6 +624,19 @@ customer_tools = [
                 "business_id": {
                     "type": "string",
                     "description": "Filter by specific business ID"
+                },
+                "search_mode": {
+                    "type": "string",
+                    "enum": ["keyword", "semantic"],
+                    "description": "Use 'semantic' when the customer describes what they need rather than naming a product"
+                },
+                "color": {
+                    "type": "string",
+                    "description": "Color filter (e.g. 'black', 'pink')"
+                },
+                "material": {
+                    "type": "string",
+                    "description": "Material filter (e.g. 'stainless steel', 'copper')"
                 }
             },
             "required": []
@@ -0,0 +1,170 @@
+"""
+Fast Path Router
+Answers simple, unambiguous requests (order/payment lookups, category browsing,
+low stock) by running the tool directly and rendering the reply through the
+response policy - no LLM call
+"""
+
+import json
+import os
+import re
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+
+from utils.query_normalizer import normalize_query
+from utils.simple_db import db
+from .conversation_flow import parse_user_intent_handler
+from .response_policy import response_policy
+
+
+ORDER_ID_PATTERN = re.compile(r"\bORD\d{3,}\b", re.IGNORECASE)
+PAYMENT_ID_PATTERN = re.compile(r"\bPAY\d{3,}\b", re.IGNORECASE)
+
+# Messages joining several requests need the LLM to split them
+MULTI_REQUEST_PATTERN = re.compile(r"\b(and|also|then|plus|na)\b|[;&]", re.IGNORECASE)
+MAX_FAST_PATH_WORDS = 12
+
+# Anything that changes an order or payment must go through the LLM
+ACTION_PATTERN = re.compile(
+    r"\b(cancel|retry|complete|pay|refund|update|change|delete|confirm|ship|deliver)\b", re.IGNORECASE
+)
+LOW_STOCK_PATTERN = re.compile(r"\blow[\s-]+stock\b|\brunning (low|out)\b", re.IGNORECASE)
+# Browsing with a price condition only skips the LLM when the parser read it as max_price
+PRICE_PATTERN = re.compile(
+    r"\d|\b(ksh|kes|shillings?|bob|under|below|less than|cheaper than|up to|max(imum)?|within)\b", re.IGNORECASE
+)
+LOWER_BOUND_PATTERN = re.compile(r"\b(above|over|more than|at least|between|from)\b", re.IGNORECASE)
+# Words a plain browse request is made of; anything else ("phones", "red") is a
+# filter the parser didn't capture, so the message goes to the LLM
+BROWSE_WORDS = {
+    "show", "me", "browse", "list", "view", "see", "all", "the", "your", "our", "you", "what", "whats", "what's",
+    "do", "have", "is", "are", "can", "i", "please", "products", "product", "items", "catalog", "catalogue",
+    "available", "everything", "in", "stock", "category", "under", "below", "k", "ksh", "kes", "this", "these",
+}
+
+
+class FastPathRouter:
+    """
+    Confidence-gated router in front of the LLM
+    A message qualifies only when its intent is clear and every parameter the
+    tool needs is present; anything else falls through to the model
+    """
+
+    def __init__(self, min_confidence: float = None):
+        self.enabled = os.getenv("SASABOT_FAST_PATH", "true").lower() != "false"
+        self.min_confidence = min_confidence if min_confidence is not None else float(
+            os.getenv("SASABOT_FAST_PATH_MIN_CONFIDENCE", "0.9")
+        )
+        self._categories = None
+        self._categories_loaded_at = 0.0
+
+        # Metrics
+        self.total = 0
+        self.hits = 0
+        self.hits_by_tool: Dict[str, int] = {}
+        self.total_latency_ms = 0.0
+
+    def _known_categories(self) -> Dict[str, str]:
+        """Lowercase -> display category names, refreshed every minute"""
+        if self._categories is None or time.time() - self._categories_loaded_at > 60:
+            self._categories = {
+                p.get('category', '').lower(): p.get('category', '')
+                for p in db.get_products() if p.get('category')
+            }
+            self._categories_loaded_at = time.time()
+        return self._categories
+
+    async def route(self, message: str, user_context: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Decide whether a message can skip the LLM
+        Returns {"tool", "arguments", "intent", "confidence"} or None
+        """
+        text = message.strip()
+        if not text or len(text.split()) > MAX_FAST_PATH_WORDS or MULTI_REQUEST_PATTERN.search(text):
+            return None
+
+        order_ids = ORDER_ID_PATTERN.findall(text)
+        payment_ids = PAYMENT_ID_PATTERN.findall(text)
+
+        # Exactly one ID and nothing else to do with it
+        if (order_ids or payment_ids) and ACTION_PATTERN.search(text):
+            return None
+        if len(order_ids) == 1 and not payment_ids:
+            return self._match("get_order_status", {"order_id": order_ids[0].upper()}, "track_order", 0.95)
+        if len(payment_ids) == 1 and not order_ids:
+            return self._match("check_payment_status", {"payment_id": payment_ids[0].upper()}, "check_payment", 0.95)
+        if order_ids or payment_ids:
+            return None
+
+        user_type = user_context.get("user_type", "unknown")
+        if user_type == "vendor" and LOW_STOCK_PATTERN.search(text) and not ACTION_PATTERN.search(text):
+            return self._match("get_low_stock_products", {}, "check_stock", 0.95)
+
+        intent = await parse_user_intent_handler(text, user_type)
+        name, confidence = intent.get("intent"), intent.get("confidence", 0)
+        message_lower = text.lower()
+
+        if user_type == "customer" and name == "browse_products":
+            parameters = dict(intent.get("parameters") or {})
+            # A price condition the parser couldn't turn into max_price needs the LLM
+            if LOWER_BOUND_PATTERN.search(text) or (PRICE_PATTERN.search(text) and "max_price" not in parameters):
+                return None
+            # Category browsing needs a category we actually stock; every other
+            # parsed parameter (e.g. max_price) goes along with it
+            parameters.pop("category", None)
+            category = next((c for key, c in self._known_categories().items() if key and key in message_lower), None)
+            if category is None and "category" in (intent.get("parameters") or {}):
+                return None
+            words = set(re.findall(r"[a-z']+", normalize_query(text))) - BROWSE_WORDS
+            if category is not None:
+                words -= set(category.lower().split())
+            if words:
+                return None
+            if category is not None:
+                return self._match("search_products", {"category": category, **parameters}, name, confidence)
+            if parameters:
+                return self._match("search_products", parameters, name, confidence)
+            return self._match("browse_products", {}, name, confidence)
+
+        return None
+
+    def _match(self, tool: str, arguments: Dict, intent: str, confidence: float) -> Optional[Dict[str, Any]]:
+        if confidence < self.min_confidence:
+            return None
+        return {"tool": tool, "arguments": arguments, "intent": intent, "confidence": confidence}
+
+    async def try_handle(self, assistant, message: str, user_context: Dict[str, Any]) -> Optional[str]:
+        """Run the fast path; returns the reply, or None to fall through to the LLM"""
+        if not self.enabled:
+            return None
+
+        started = time.perf_counter()
+        self.total += 1
+
+        match = await self.route(message, user_context)
+        if not match:
+            return None
+
+        call = SimpleNamespace(name=match["tool"], arguments=json.dumps(match["arguments"]))
+        result = await assistant._execute_function_call(call)
+
+        # Results the policy wants verbalized (or dispatch errors) go to the LLM
+        reply = response_policy.render(match["tool"], result)
+        if reply is None:
+            return None
+
+        self.hits += 1
+        self.hits_by_tool[match["tool"]] = self.hits_by_tool.get(match["tool"], 0) + 1
+        self.total_latency_ms += (time.perf_counter() - started) * 1000
+        return reply
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Fast path hit-rate metrics"""
+        return {
+            "messages": self.total,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.total, 3) if self.total else 0.0,
+            "hits_by_tool": dict(self.hits_by_tool),
+            "avg_latency_ms": round(self.total_latency_ms / self.hits, 2) if self.hits else 0.0,
+        }
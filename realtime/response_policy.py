@@ -0,0 +1,173 @@
+"""
+Response Policy
+Decides per tool and per outcome how a tool result reaches the user:
+returned verbatim, rendered from a template, or verbalized by the LLM.
+Most tools already return formatted messages, so the LLM is only needed
+where it adds something (product disambiguation, analytics narration).
+"""
+
+import os
+from typing import Any, Dict, List, Optional
+
+from utils.simple_db import db
+
+
+VERBATIM = "verbatim"
+TEMPLATE = "template"
+LLM = "llm"
+
+# {tool: {outcome: mode}}; "*" applies to every tool. Outcomes are the
+# result's error_type, or "success" / "error" when there is none.
+DEFAULT_POLICY: Dict[str, Dict[str, str]] = {
+    "*": {
+        "product_not_found": LLM,
+        # Arguments rejected before dispatch - the model asks for what was wrong
+        "invalid_arguments": LLM,
+    },
+    # Intermediate step - the model decides whether to add the product next
+    "validate_product_info": {"success": LLM},
+    "get_enhanced_business_stats": {"success": LLM},
+    "get_business_stats": {"success": LLM},
+    "get_sales_analytics": {"success": LLM},
+    "show_products": {"success": TEMPLATE},
+    "get_low_stock_products": {"success": TEMPLATE},
+    "get_database_stats": {"success": TEMPLATE},
+    "get_user_context": {"success": TEMPLATE},
+    "set_user_role": {"success": TEMPLATE},
+}
+
+
+# =============================================================================
+# TEMPLATES
+# =============================================================================
+
+def _render_show_products(result: Dict) -> str:
+    data = result.get("data") or {}
+    lines = [item.get("display", "") for item in data.get("formatted_products", [])]
+    reply = f"{result.get('message', '')}\n\n" + "\n".join(lines)
+    reply += f"\n\n💰 Inventory value: KSh {data.get('total_value', 0):,}"
+    if data.get("low_stock_count"):
+        reply += f" | ⚠️ {data['low_stock_count']} low on stock"
+    reply += "\n\n💡 Say 'update product [ID]' or 'delete product [ID]' to manage an item."
+    return reply
+
+
+def _render_low_stock(result: Dict) -> str:
+    data = result.get("data") or {}
+    products = data.get("low_stock_products", [])
+    if not products:
+        return f"✅ No low stock products at {data.get('business_name', 'your business')} (all above {data.get('threshold', 5)} units)."
+
+    reply = f"⚠️ **Low Stock Alert - {data.get('business_name', '')}**\n"
+    reply += f"{result.get('message', '')}\n\n"
+    reply += "\n".join(db.format_product_display(p) for p in products)
+    reply += "\n\n💡 Say 'update product [ID] stock [quantity]' to restock."
+    return reply
+
+
+def _render_database_stats(result: Dict) -> str:
+    return (
+        "📊 **Database Statistics**\n"
+        f"🏪 Businesses: {result.get('businesses_count', 0)}\n"
+        f"📦 Products: {result.get('products_count', 0)}\n"
+        f"📋 Orders: {result.get('orders_count', 0)}\n"
+        f"👥 Customers: {result.get('customers_count', 0)}"
+    )
+
+
+def _render_user_context(result: Dict) -> str:
+    reply = f"👤 You are using Sasabot as a **{result.get('user_type', 'unknown')}**"
+    if result.get("business_id"):
+        reply += f" for business `{result['business_id']}`"
+    return reply + f" ({result.get('message_count', 0)} messages this session)."
+
+
+def _render_user_role(result: Dict) -> str:
+    if result.get("role") == "vendor":
+        return f"✅ You're now in vendor mode for `{result.get('business_id')}`. Try 'show my products' or 'low stock'."
+    return f"✅ You're now in {result.get('role')} mode. Try 'browse products' or 'search for a phone'."
+
+
+TEMPLATES = {
+    "show_products": _render_show_products,
+    "get_low_stock_products": _render_low_stock,
+    "get_database_stats": _render_database_stats,
+    "get_user_context": _render_user_context,
+    "set_user_role": _render_user_role,
+}
+
+
+class ResponsePolicy:
+    """Chooses verbatim / template / LLM rendering for tool results"""
+
+    def __init__(self, policy: Dict[str, Dict[str, str]] = None):
+        self.policy = policy or DEFAULT_POLICY
+        # SASABOT_RESPONSE_POLICY=llm restores the always-verbalize behaviour
+        self.force_llm = os.getenv("SASABOT_RESPONSE_POLICY", "").lower() == LLM
+        self.counts = {VERBATIM: 0, TEMPLATE: 0, LLM: 0}
+
+    @staticmethod
+    def _outcome(result: Any) -> str:
+        if isinstance(result, dict):
+            if result.get("error_type"):
+                return result["error_type"]
+            if result.get("error") or result.get("success") is False:
+                return "error"
+        return "success"
+
+    def decide(self, tool_name: str, result: Any) -> str:
+        """Rendering mode for one tool result"""
+        if self.force_llm:
+            return LLM
+
+        outcome = self._outcome(result)
+        for scope in (tool_name, "*"):
+            mode = self.policy.get(scope, {}).get(outcome)
+            if mode:
+                return mode
+
+        # Default: anything that already carries user-facing text is shown as-is
+        if isinstance(result, str) or (isinstance(result, dict) and result.get("message")):
+            return VERBATIM
+        return LLM
+
+    def render(self, tool_name: str, result: Any) -> Optional[str]:
+        """Reply text for one result, or None when the LLM should verbalize it"""
+        mode = self.decide(tool_name, result)
+        if mode == TEMPLATE and tool_name not in TEMPLATES:
+            mode = VERBATIM if isinstance(result, (str, dict)) else LLM
+
+        if mode == VERBATIM:
+            text = result if isinstance(result, str) else result.get("message") if isinstance(result, dict) else None
+            if not text:
+                return None
+        elif mode == TEMPLATE:
+            try:
+                text = TEMPLATES[tool_name](result)
+            except Exception:
+                return None
+        else:
+            return None
+
+        self.counts[mode] += 1
+        return text
+
+    def render_all(self, tool_names: List[str], results: List[Any]) -> Optional[str]:
+        """Reply for a batch of tool results; None if any of them needs the LLM"""
+        if any(self.decide(name, result) == LLM for name, result in zip(tool_names, results)):
+            self.counts[LLM] += 1
+            return None
+
+        parts = [self.render(name, result) for name, result in zip(tool_names, results)]
+        if any(part is None for part in parts):
+            self.counts[LLM] += 1
+            return None
+        return "\n\n".join(parts)
+
+    def get_stats(self) -> Dict[str, int]:
+        """How often each rendering mode was used"""
+        return dict(self.counts)
+
+
+# Global response policy instance
+response_policy = ResponsePolicy()
@@ -0,0 +1,178 @@
+"""
+Speculative Tool Prefetch
+While the tool-calling completion is in flight, runs the read-only tool
+calls the model is most likely to make (order/payment lookups, product
+searches from the fast intent parser) in the background. When the model then
+asks for the same call, the prefetched result is used instead of running the
+tool again; predictions the model doesn't use are cancelled at the end of the
+turn. Either way the DB and search caches have been warmed.
+
+Only read-only tools are speculated, and a batch that contains a write never
+uses prefetched results. Disable with SASABOT_SPECULATION=false.
+"""
+
+import asyncio
+import json
+import os
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.metrics import metrics
+from utils.tracing import tracer
+from .fast_path import ORDER_ID_PATTERN, PAYMENT_ID_PATTERN
+
+
+SPECULATIVE_TOOLS = {"search_products", "browse_products", "get_order_status", "check_payment_status"}
+SPECULATING_ROLES = {"customer", "unknown"}
+MAX_SPECULATIONS = 2
+
+SPECULATIONS = metrics.counter(
+    "sasabot_speculations_total", "Speculative tool calls by outcome (hit or miss)", ["tool", "outcome"]
+)
+
+Prediction = Tuple[str, Dict[str, Any]]
+
+
+def _normalize_value(value: Any) -> Any:
+    # Only case and whitespace: "iphone-13" and "iphone 13" may find different products
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def call_key(name: str, arguments: Dict[str, Any], ignore: frozenset = frozenset()) -> str:
+    """Comparable form of a tool call: empty and session-filled arguments dropped, strings normalized"""
+    normalized = {
+        key: _normalize_value(value) for key, value in arguments.items()
+        if key not in ignore and value not in (None, "", [], {})
+    }
+    return f"{name}:{json.dumps(normalized, sort_keys=True, default=str)}"
+
+
+def predict_tool_calls(message: str, user_type: str, intent: Dict[str, Any]) -> List[Prediction]:
+    """Read-only tool calls the model is likely to make for this message"""
+    predictions: List[Prediction] = []
+    for order_id in ORDER_ID_PATTERN.findall(message):
+        predictions.append(("get_order_status", {"order_id": order_id.upper()}))
+    for payment_id in PAYMENT_ID_PATTERN.findall(message):
+        predictions.append(("check_payment_status", {"payment_id": payment_id.upper()}))
+
+    if user_type in SPECULATING_ROLES:
+        name, parameters = intent.get("intent"), intent.get("parameters") or {}
+        term = (parameters.get("search_term") or parameters.get("product_name") or "").strip(" ?.!")
+        if name in ("search_products", "buy_product") and term:
+            predictions.append(("search_products", {"query": term}))
+        elif name == "browse_products":
+            if parameters:
+                predictions.append(("search_products", dict(parameters)))
+            else:
+                predictions.append(("browse_products", {}))
+
+    return predictions[:MAX_SPECULATIONS]
+
+
+class Speculation:
+    """Prefetched tool calls of one turn"""
+
+    def __init__(self, speculator: "Speculator", ignore: frozenset):
+        self.speculator = speculator
+        self.ignore = ignore
+        self.tasks: Dict[str, Tuple[str, asyncio.Task]] = {}
+
+    def start(self, execute, predictions: List[Prediction]):
+        """
+        Run each prediction through execute(function_call, speculative=True) in the background
+        (the executor labels these runs separately in its metrics)
+        """
+        for name, arguments in predictions:
+            key = call_key(name, arguments, self.ignore)
+            if key in self.tasks:
+                continue
+            call = SimpleNamespace(name=name, arguments=json.dumps(arguments))
+
+            async def prefetch(call=call):
+                with tracer.span(f"speculation.{call.name}"):
+                    return await execute(call, speculative=True)
+
+            self.tasks[key] = (name, asyncio.create_task(prefetch()))
+            self.speculator.started += 1
+
+    async def take(self, function_call) -> Tuple[bool, Any]:
+        """(True, result) when this call was prefetched, else (False, None)"""
+        try:
+            arguments = json.loads(function_call.arguments or "{}")
+        except json.JSONDecodeError:
+            return False, None
+        entry = self.tasks.pop(call_key(function_call.name, arguments, self.ignore), None)
+        if entry is None:
+            return False, None
+
+        name, task = entry
+        if task.done():
+            self.speculator.ready_hits += 1
+        self.speculator._count(name, "hit")
+        return True, await task
+
+    def cancel(self):
+        """Drop the predictions the model didn't use"""
+        for name, task in self.tasks.values():
+            task.cancel()
+            self.speculator._count(name, "miss")
+        self.tasks.clear()
+
+
+class Speculator:
+    """Starts per-turn speculations and keeps hit-rate statistics"""
+
+    def __init__(self):
+        self.enabled = os.getenv("SASABOT_SPECULATION", "true").lower() != "false"
+
+        # Metrics
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.ready_hits = 0
+        self.by_tool: Dict[str, Dict[str, int]] = {}
+
+    def speculate(self, execute, message: str, user_type: str, intent: Dict[str, Any],
+                  allowed_tools: frozenset, ignore: frozenset = frozenset()) -> Optional[Speculation]:
+        """Start prefetching the likely tool calls of a turn (None when there is nothing to do)"""
+        if not self.enabled:
+            return None
+        predictions = [
+            (name, arguments) for name, arguments in predict_tool_calls(message, user_type, intent)
+            if name in SPECULATIVE_TOOLS and name in allowed_tools
+        ]
+        if not predictions:
+            return None
+        speculation = Speculation(self, ignore)
+        speculation.start(execute, predictions)
+        return speculation
+
+    def _count(self, tool: str, outcome: str):
+        if outcome == "hit":
+            self.hits += 1
+        else:
+            self.misses += 1
+        counts = self.by_tool.setdefault(tool, {"hit": 0, "miss": 0})
+        counts[outcome] += 1
+        SPECULATIONS.inc(tool=tool, outcome=outcome)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Speculation hit rates"""
+        finished = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "started": self.started,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / finished, 3) if finished else 0.0,
+            "ready_on_hit": round(self.ready_hits / self.hits, 3) if self.hits else 0.0,
+            "by_tool": {tool: dict(counts) for tool, counts in self.by_tool.items()},
+        }
+
+
+# Global speculator instance
+speculator = Speculator()
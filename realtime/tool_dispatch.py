@@ -0,0 +1,295 @@
+"""
+Tool Dispatch
+Dispatch table for the assistant's function tools, built once from the
+function schemas. Each function gets a validator compiled from its JSON
+schema that checks and coerces the model's arguments before the handler runs:
+"1200" becomes 1200.0 for a number, "5" becomes 5 for an integer, "weekly"
+matches an enum case-insensitively, a lone string becomes a one-item array.
+
+Arguments that still don't fit come back to the model as a tool result
+(error_type "invalid_arguments") in the same turn, instead of failing deep
+inside a handler or a database call.
+
+Arguments a function doesn't declare are dropped, so a key the model made up
+never reaches a handler (or a product record). An object schema without
+properties (e.g. provided_info) is free-form and kept as given.
+
+Supports the schema keywords the function definitions use: type, properties,
+required, items and enum.
+"""
+
+import json
+import math
+import re
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+
+Validator = Callable[[Any], Any]
+
+_NUMBER_NOISE = re.compile(r"^\s*(ksh\.?|kes)\s*|[\s,_]", re.IGNORECASE)
+TRUE_WORDS = {"true", "yes", "1"}
+FALSE_WORDS = {"false", "no", "0"}
+
+
+class ArgumentError(ValueError):
+    """An argument that doesn't match its schema and can't be coerced"""
+
+
+def _describe(value: Any) -> str:
+    text = json.dumps(value, default=str)
+    return text if len(text) <= 40 else text[:37] + "..."
+
+
+# =============================================================================
+# SCHEMA COMPILATION
+# =============================================================================
+
+def _string(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    raise ArgumentError(f"expected a string, got {_describe(value)}")
+
+
+def _number(value: Any) -> float:
+    if isinstance(value, str):
+        try:
+            value = float(_NUMBER_NOISE.sub("", value))
+        except ValueError:
+            pass
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value):
+        return value
+    raise ArgumentError(f"expected a number, got {_describe(value)}")
+
+
+def _integer(value: Any) -> int:
+    number = _number(value)
+    if float(number).is_integer():
+        return int(number)
+    raise ArgumentError(f"expected a whole number, got {_describe(value)}")
+
+
+def _boolean(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    word = str(value).strip().lower()
+    if word in TRUE_WORDS:
+        return True
+    if word in FALSE_WORDS:
+        return False
+    raise ArgumentError(f"expected true or false, got {_describe(value)}")
+
+
+def _decoded(value: Any, kind: type) -> Any:
+    """A JSON-encoded list/object passed as a string, decoded"""
+    if isinstance(value, str) and value.strip()[:1] in "[{":
+        try:
+            decoded = json.loads(value)
+        except json.JSONDecodeError:
+            return value
+        if isinstance(decoded, kind):
+            return decoded
+    return value
+
+
+def _with_enum(validate: Validator, options: List[Any]) -> Validator:
+    canonical = {option.lower(): option for option in options if isinstance(option, str)}
+
+    def check(value):
+        value = validate(value)
+        if value in options:
+            return value
+        if isinstance(value, str) and value.strip().lower() in canonical:
+            return canonical[value.strip().lower()]
+        raise ArgumentError(f"must be one of {', '.join(map(str, options))}, got {_describe(value)}")
+    return check
+
+
+def _array(items: Optional[Validator]) -> Validator:
+    def check(value):
+        value = _decoded(value, list)
+        if not isinstance(value, list):
+            if items is None or isinstance(value, dict):
+                raise ArgumentError(f"expected a list, got {_describe(value)}")
+            value = [value]
+        if items is None:
+            return value
+        coerced = []
+        for index, item in enumerate(value):
+            try:
+                coerced.append(items(item))
+            except ArgumentError as e:
+                raise ArgumentError(f"item {index}: {e}")
+        return coerced
+    return check
+
+
+def _object(properties: Optional[Dict[str, Validator]], required: Iterable[str]) -> Validator:
+    required = tuple(required)
+
+    def check(value):
+        value = _decoded(value, dict)
+        if not isinstance(value, dict):
+            raise ArgumentError(f"expected an object, got {_describe(value)}")
+        if properties is None:
+            return value
+        coerced, errors = validate_properties(value, properties, required)
+        if errors:
+            raise ArgumentError("; ".join(errors))
+        return coerced
+    return check
+
+
+SCALARS: Dict[str, Validator] = {
+    "string": _string,
+    "number": _number,
+    "integer": _integer,
+    "boolean": _boolean,
+}
+
+
+def compile_schema(schema: Dict[str, Any]) -> Validator:
+    """Validator for one JSON schema: returns the coerced value or raises ArgumentError"""
+    kind = schema.get("type")
+    if kind in SCALARS:
+        validate = SCALARS[kind]
+    elif kind == "array":
+        validate = _array(compile_schema(schema["items"]) if "items" in schema else None)
+    elif kind == "object":
+        validate = _object(
+            {name: compile_schema(prop) for name, prop in schema["properties"].items()}
+            if "properties" in schema else None,
+            schema.get("required", []),
+        )
+    else:
+        validate = lambda value: value
+    if "enum" in schema:
+        validate = _with_enum(validate, schema["enum"])
+    return validate
+
+
+def validate_properties(arguments: Dict[str, Any], properties: Dict[str, Validator],
+                        required: Iterable[str]) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Check and coerce an arguments object
+    Nulls count as not given; arguments the schema doesn't list are dropped
+    Returns (coerced arguments, problems)
+    """
+    coerced: Dict[str, Any] = {}
+    errors: List[str] = []
+    for name, value in arguments.items():
+        if value is None:
+            continue
+        validate = properties.get(name)
+        if validate is None:
+            continue
+        try:
+            coerced[name] = validate(value)
+        except ArgumentError as e:
+            errors.append(f"{name}: {e}")
+    errors.extend(f"{name}: required" for name in required if name not in coerced)
+    return coerced, errors
+
+
+# =============================================================================
+# DISPATCH TABLE
+# =============================================================================
+
+class Tool(NamedTuple):
+    name: str
+    handler: Callable
+    properties: Dict[str, Validator]
+    required: Tuple[str, ...]
+
+
+class ToolDispatcher:
+    """Handlers and compiled argument validators by function name"""
+
+    def __init__(self, functions: List[Dict[str, Any]], handlers: Dict[str, Callable],
+                 filled_by_caller: Iterable[str] = (), self_checked: Iterable[str] = ()):
+        """
+        filled_by_caller: required arguments the handlers default themselves (e.g. business_id)
+        self_checked: functions whose handler reports missing fields itself, in its own words
+        """
+        filled_by_caller, self_checked = set(filled_by_caller), set(self_checked)
+        self.tools: Dict[str, Tool] = {}
+        for function in functions:
+            name = function["name"]
+            parameters = function.get("parameters", {})
+            required = () if name in self_checked else tuple(
+                p for p in parameters.get("required", []) if p not in filled_by_caller
+            )
+            self.tools[name] = Tool(
+                name=name,
+                handler=handlers[name],
+                properties={p: compile_schema(s) for p, s in parameters.get("properties", {}).items()},
+                required=required,
+            )
+
+        # Metrics
+        self.calls = 0
+        self.coerced = 0
+        self.rejected = 0
+        self.speculative = 0
+
+    def prepare(self, name: str, raw_arguments: Optional[str],
+                speculative: bool = False) -> Tuple[Optional[Tool], Dict[str, Any], List[str]]:
+        """
+        Parse and validate a call's JSON arguments
+        Speculative calls (predicted, not made by the model) are counted apart from the model's calls
+        Returns (tool, coerced arguments, problems); tool is None for an unknown function
+        """
+        tool = self.tools.get(name)
+        if tool is None:
+            return None, {}, [f"unknown function {name}"]
+
+        arguments, coerced, errors = self._check(tool, raw_arguments)
+        if speculative:
+            self.speculative += 1
+            return tool, coerced, errors
+        self.calls += 1
+        if errors:
+            self.rejected += 1
+        elif coerced != arguments:
+            self.coerced += 1
+        return tool, coerced, errors
+
+    def check(self, name: str, raw_arguments: Optional[str]) -> List[str]:
+        """Problems prepare would report for this call, without counting it"""
+        tool = self.tools.get(name)
+        if tool is None:
+            return [f"unknown function {name}"]
+        return self._check(tool, raw_arguments)[2]
+
+    @staticmethod
+    def _check(tool: Tool, raw_arguments: Optional[str]) -> Tuple[Any, Dict[str, Any], List[str]]:
+        """(parsed arguments, coerced arguments, problems)"""
+        try:
+            arguments = json.loads(raw_arguments or "{}")
+        except json.JSONDecodeError as e:
+            return None, {}, [f"arguments are not valid JSON ({e.msg})"]
+        if not isinstance(arguments, dict):
+            return arguments, {}, ["arguments must be a JSON object"]
+        coerced, errors = validate_properties(arguments, tool.properties, tool.required)
+        return arguments, coerced, errors
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Validated, coerced and rejected calls"""
+        return {
+            "tools": len(self.tools),
+            "calls": self.calls,
+            "coerced": self.coerced,
+            "rejected": self.rejected,
+            "speculative": self.speculative,
+        }
+
+
+def invalid_arguments_result(name: str, errors: List[str]) -> Dict[str, Any]:
+    """Tool result telling the model what was wrong, so it can ask the user"""
+    return {
+        "success": False,
+        "message": f"Invalid arguments for {name}: {'; '.join(errors)}. Ask the user for the missing or corrected details.",
+        "error_type": "invalid_arguments",
+        "errors": errors,
+    }
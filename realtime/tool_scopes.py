@@ -0,0 +1,104 @@
+"""
+Tool Scopes
+Selects which function schemas are sent with a request, by user role and
+conversation state, instead of sending every vendor, customer and payment
+tool on every completion. Mirrors the vendor / customer / onboarding tool
+sets of the top-level tools registry.
+"""
+
+import json
+import re
+from typing import Dict, List, NamedTuple, Optional
+
+from utils.prompt_budget import count_tokens
+
+
+COMMON_TOOLS = ["set_user_role", "get_user_context", "get_payment_help"]
+
+VENDOR_TOOLS = [
+    "add_product", "show_products", "update_product", "delete_product", "get_low_stock_products",
+    "get_business_stats", "get_enhanced_business_stats", "get_sales_analytics",
+    "get_order_status", "check_payment_status", "get_database_stats",
+]
+# add_product validates on its own; the step-by-step helpers only matter mid-flow
+VENDOR_ADDING_TOOLS = ["validate_product_info", "request_missing_product_info"]
+
+CUSTOMER_TOOLS = [
+    "browse_products", "search_products", "place_order", "get_order_status",
+    "initiate_mpesa_payment", "check_payment_status",
+]
+CUSTOMER_PAYMENT_TOOLS = ["cancel_payment", "retry_payment", "complete_mpesa_payment"]
+
+# {(role, state): tool names}; "unknown" users shop like customers until they pick a role
+SCOPES: Dict[tuple, List[str]] = {
+    ("vendor", "default"): COMMON_TOOLS + VENDOR_TOOLS,
+    ("vendor", "adding_product"): COMMON_TOOLS + VENDOR_TOOLS + VENDOR_ADDING_TOOLS,
+    ("customer", "default"): COMMON_TOOLS + CUSTOMER_TOOLS,
+    ("customer", "payment"): COMMON_TOOLS + CUSTOMER_TOOLS + CUSTOMER_PAYMENT_TOOLS,
+    ("unknown", "default"): COMMON_TOOLS + [
+        "browse_products", "search_products", "get_order_status", "check_payment_status",
+    ],
+}
+
+ADDING_PRODUCT_PATTERN = re.compile(
+    r"\b(add|new product|list (a|my)|stock (a|new)|ongeza)\b|missing (information|details)|to add this product",
+    re.IGNORECASE,
+)
+PAYMENT_PATTERN = re.compile(r"\b(pay|paid|payment|m-?pesa|PAY\d+|lipa|retry|cancel)\b", re.IGNORECASE)
+
+
+class ToolScope(NamedTuple):
+    """Tools for one (role, state), with the serialized payload measured once"""
+    role: str
+    state: str
+    tools: List[Dict]
+    names: frozenset
+    tokens: int
+
+
+class ToolSelector:
+    """Builds and caches per-role, per-state tool lists from the full schema list"""
+
+    def __init__(self, all_tools: List[Dict]):
+        self.all_tools = all_tools
+        self._by_name = {tool["function"]["name"]: tool for tool in all_tools}
+        self._scopes: Dict[tuple, ToolScope] = {}
+        self.selections: Dict[str, int] = {}
+
+    @staticmethod
+    def detect_state(role: str, message: str, last_response: str = "") -> str:
+        """Conversation state from the message and the bot's previous reply"""
+        text = f"{message}\n{last_response}"
+        if role == "vendor" and ADDING_PRODUCT_PATTERN.search(text):
+            return "adding_product"
+        if role == "customer" and PAYMENT_PATTERN.search(text):
+            return "payment"
+        return "default"
+
+    def scope(self, role: str, state: str = "default") -> ToolScope:
+        """Cached tool scope (falls back to every tool for unknown roles)"""
+        key = (role, state)
+        if key not in self._scopes:
+            names = SCOPES.get(key) or SCOPES.get((role, "default"))
+            tools = [self._by_name[n] for n in dict.fromkeys(names) if n in self._by_name] if names else self.all_tools
+            payload = json.dumps(tools, separators=(",", ":"))
+            self._scopes[key] = ToolScope(
+                role, state, tools, frozenset(t["function"]["name"] for t in tools), count_tokens(payload)
+            )
+        return self._scopes[key]
+
+    def select(self, role: str, message: str, last_response: Optional[str] = "") -> ToolScope:
+        """Tools to send for this message"""
+        scope = self.scope(role, self.detect_state(role, message, last_response or ""))
+        label = f"{scope.role}/{scope.state}"
+        self.selections[label] = self.selections.get(label, 0) + 1
+        return scope
+
+    def get_stats(self) -> Dict:
+        """Selections per scope and the schema size of each"""
+        return {
+            "all_tools": len(self.all_tools),
+            "selections": dict(self.selections),
+            "scope_sizes": {f"{s.role}/{s.state}": {"tools": len(s.tools), "tokens": s.tokens}
+                            for s in self._scopes.values()},
+        }
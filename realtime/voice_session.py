@@ -0,0 +1,208 @@
+"""
+Voice Session
+Speech-to-speech mode for the Chainlit app over the OpenAI realtime API
+(realtime/realtime_client.py). Microphone audio is streamed into the realtime
+session as it is captured and the model's audio deltas are played back as
+they arrive; the server detects the end of each utterance, so a reply starts
+without a typed round-trip. Speaking over the assistant interrupts playback.
+
+The realtime model calls Sasabot's own tools, registered with
+RealtimeClient.add_tool and run through SasabotAssistant's dispatch (argument
+validation, coalescing, metrics), so voice and text turns share tools, data
+and conversation history. Tools are scoped to the user's role like text
+requests, and re-registered when the role changes mid-call.
+
+Settings: SASABOT_VOICE (default true), SASABOT_REALTIME_MODEL,
+SASABOT_VOICE_NAME (default shimmer). The microphone must be enabled in
+.chainlit/config.toml ([features.audio] enabled = true).
+"""
+
+import json
+import os
+import time
+from collections import deque
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+from uuid import uuid4
+
+import chainlit as cl
+
+from utils.metrics import VOICE_RESPONSE_SECONDS
+from utils.prompt_budget import compact_tool_result
+from .realtime_client import RealtimeClient
+
+
+DEFAULT_REALTIME_MODEL = "gpt-4o-realtime-preview-2024-12-17"
+
+# The largest tool scope of each role, since the realtime model picks tools itself
+VOICE_TOOL_STATES = {"vendor": "adding_product", "customer": "payment"}
+
+VOICE_INSTRUCTIONS = """
+
+VOICE CALL:
+- You are speaking, not writing: keep replies short and easy to say out loud
+- No markdown, tables, bullet symbols or emojis
+- Say prices as "shillings" (e.g. "twelve thousand shillings")
+- Read product and order IDs clearly, and repeat order details back before placing an order
+"""
+
+
+def voice_enabled() -> bool:
+    return os.getenv("SASABOT_VOICE", "true").lower() != "false"
+
+
+class VoiceSession:
+    """One Chainlit user's realtime voice conversation"""
+
+    def __init__(self, assistant, client: Optional[RealtimeClient] = None):
+        self.assistant = assistant
+        self.client = client or RealtimeClient(api_key=os.getenv("OPENAI_API_KEY"))
+        self.model = os.getenv("SASABOT_REALTIME_MODEL", DEFAULT_REALTIME_MODEL)
+        self.voice = os.getenv("SASABOT_VOICE_NAME", "shimmer")
+        # Playback track; a new one after an interruption drops the queued audio
+        self.track_id = str(uuid4())
+        self.role: Optional[str] = None
+        self._playing = False
+        self._speech_stopped_at: Optional[float] = None
+        self._user_transcript = ""
+
+        # Metrics
+        self.turns = 0
+        self.interruptions = 0
+        self.tool_calls = 0
+        self.response_latencies: deque = deque(maxlen=100)
+
+        self.client.on("conversation.updated", self._on_conversation_updated)
+        self.client.on("conversation.item.completed", self._on_item_completed)
+        self.client.on("conversation.interrupted", self._on_interrupted)
+        self.client.realtime.on("server.input_audio_buffer.speech_stopped", self._on_speech_stopped)
+        self.client.realtime.on(
+            "server.conversation.item.input_audio_transcription.completed", self._on_user_transcript
+        )
+        self.client.realtime.on("server.error", self._on_error)
+
+    # =============================================================================
+    # SESSION LIFECYCLE
+    # =============================================================================
+
+    async def start(self):
+        """Register tools for the user's current role and connect (no-op when connected)"""
+        if self.client.is_connected():
+            return
+        context = self.assistant._get_user_context()
+        await self._register_tools(context["user_type"])
+        await self.client.update_session(
+            instructions=self.assistant.system_prompt + VOICE_INSTRUCTIONS
+            + f"\nCURRENT USER: {context['user_type']} (business: {context['business_id']})",
+            voice=self.voice,
+        )
+        await self.client.connect(model=self.model)
+        print(f"🎙️ Voice session connected ({self.model}, {len(self.client.tools)} tools)")
+
+    async def append_audio(self, chunk: bytes):
+        """Stream one microphone chunk (PCM16) into the realtime session"""
+        if self.client.is_connected():
+            await self.client.append_input_audio(chunk)
+
+    async def interrupt(self):
+        """Stop the reply being spoken"""
+        if self.client.is_connected():
+            await self.client.cancel_response()
+        await self._restart_playback()
+
+    async def close(self):
+        if self.client.is_connected():
+            await self.client.disconnect()
+            print(f"🎙️ Voice session closed after {self.turns} turns")
+
+    # =============================================================================
+    # TOOLS
+    # =============================================================================
+
+    async def _register_tools(self, role: str):
+        """(Re)register the role's tools with the realtime client"""
+        if role == self.role:
+            return
+        scope = self.assistant.tool_selector.scope(role, VOICE_TOOL_STATES.get(role, "default"))
+        for name in list(self.client.tools):
+            self.client.remove_tool(name)
+        for function in self.assistant.functions:
+            if function["name"] in scope.names:
+                await self.client.add_tool(function, self._tool_handler(function["name"]))
+        self.role = role
+
+    def _tool_handler(self, name: str):
+        async def handler(**arguments) -> str:
+            self.tool_calls += 1
+            call = SimpleNamespace(name=name, arguments=json.dumps(arguments))
+            result = await self.assistant._execute_function_call(call)
+            if name == "set_user_role" and isinstance(result, dict) and result.get("success"):
+                await self._register_tools(result["role"])
+            return compact_tool_result(result)
+        return handler
+
+    # =============================================================================
+    # EVENTS
+    # =============================================================================
+
+    async def _on_conversation_updated(self, event: Dict[str, Any]):
+        delta = event.get("delta") or {}
+        audio = delta.get("audio")
+        if not audio:
+            return
+        if self._speech_stopped_at is not None:
+            latency = time.perf_counter() - self._speech_stopped_at
+            self._speech_stopped_at = None
+            self.response_latencies.append(latency)
+            VOICE_RESPONSE_SECONDS.observe(latency)
+        self._playing = True
+        await cl.context.emitter.send_audio_chunk(
+            cl.OutputAudioChunk(mimeType="pcm16", data=audio, track=self.track_id)
+        )
+
+    async def _on_item_completed(self, event: Dict[str, Any]):
+        item = event.get("item") or {}
+        if item.get("role") != "assistant":
+            return
+        self._playing = False
+        formatted = item.get("formatted") or {}
+        transcript = formatted.get("transcript") or formatted.get("text")
+        if not transcript:
+            return
+        self.turns += 1
+        await cl.Message(content=transcript).send()
+        self.assistant._store_conversation(self._user_transcript or "(voice message)", transcript)
+        self._user_transcript = ""
+
+    async def _on_interrupted(self, event: Dict[str, Any]):
+        # Sent whenever the user starts speaking; only an interruption while a reply plays
+        if self._playing:
+            self.interruptions += 1
+            self._playing = False
+        await self._restart_playback()
+
+    async def _restart_playback(self):
+        self.track_id = str(uuid4())
+        await cl.context.emitter.send_audio_interrupt()
+
+    def _on_speech_stopped(self, event: Dict[str, Any]):
+        self._speech_stopped_at = time.perf_counter()
+
+    def _on_user_transcript(self, event: Dict[str, Any]):
+        self._user_transcript = (event.get("transcript") or "").strip()
+
+    def _on_error(self, event: Dict[str, Any]):
+        error = event.get("error") or {}
+        print(f"❌ Realtime error: {error.get('message', error)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Turns, interruptions and speech-to-speech latency of this call"""
+        latencies = sorted(self.response_latencies)
+        return {
+            "connected": self.client.is_connected(),
+            "role": self.role,
+            "turns": self.turns,
+            "interruptions": self.interruptions,
+            "tool_calls": self.tool_calls,
+            "p50_response_ms": round(latencies[len(latencies) // 2] * 1000) if latencies else None,
+        }
@@ -0,0 +1,42 @@
+"""Conversation summary: IDs kept from folded exchanges"""
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("openai")
+
+from utils.conversation_summary import extract_entities, merge_entities
+
+
+def entities(text):
+    return extract_entities([{"user_message": text, "ai_response": ""}])
+
+
+@pytest.mark.parametrize("text", [
+    "I paid 1500 yesterday",
+    "warranty valid 12 months",
+    "I did 4 orders",
+    "my id 5 is here",
+])
+def test_numbers_in_ordinary_words_are_not_product_ids(text):
+    assert entities(text)["product_ids"] == []
+
+
+@pytest.mark.parametrize("text, ids", [
+    ("🆔 **ID: 106** | Mouse", ["106"]),
+    ("**ID:** 12", ["12"]),
+    ("Product ID 7 and product ID: 8", ["7", "8"]),
+    ("ID #5", ["5"]),
+])
+def test_product_ids(text, ids):
+    assert entities(text)["product_ids"] == ids
+
+
+def test_order_and_payment_ids():
+    found = entities("order ord001 paid with PAY002")
+    assert found["order_ids"] == ["ORD001"] and found["payment_ids"] == ["PAY002"]
+
+
+def test_merge_keeps_most_recent_last():
+    merged = merge_entities({"product_ids": ["1", "2"]}, {"product_ids": ["1"], "order_ids": []})
+    assert merged == {"product_ids": ["2", "1"]}
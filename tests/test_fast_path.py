@@ -0,0 +1,69 @@
+"""Fast path routing: parsed browse parameters reach the tool, unparsed constraints go to the LLM"""
+
+import asyncio
+import json
+import time
+
+import pytest
+
+pytest.importorskip("chainlit")
+
+from realtime.fast_path import FastPathRouter
+
+
+CUSTOMER = {"user_type": "customer", "business_id": "mama_jane_electronics"}
+
+
+@pytest.fixture
+def router():
+    router = FastPathRouter(min_confidence=0.9)
+    router._categories = {"accessories": "Accessories", "storage": "Storage"}
+    router._categories_loaded_at = time.time()
+    return router
+
+
+def route(router, message, context=CUSTOMER):
+    return asyncio.run(router.route(message, context))
+
+
+@pytest.mark.parametrize("message, arguments", [
+    ("show me accessories under 2000", {"category": "Accessories", "max_price": 2000.0}),
+    ("show me accessories under 2,000", {"category": "Accessories", "max_price": 2000.0}),
+    ("show me storage under 5k", {"category": "Storage", "max_price": 5000.0}),
+    ("show me products under 5k", {"max_price": 5000.0}),
+    ("browse storage", {"category": "Storage"}),
+])
+def test_browse_passes_every_parsed_parameter(router, message, arguments):
+    match = route(router, message)
+    assert match["tool"] == "search_products"
+    assert match["arguments"] == arguments
+
+
+def test_plain_browse(router):
+    assert route(router, "show me products")["tool"] == "browse_products"
+
+
+@pytest.mark.parametrize("message", [
+    "show me accessories above 2000",       # lower bound
+    "show me accessories under twenty",     # price the parser didn't read
+    "show me phones",                       # category we don't stock
+    "show me red accessories",              # filter the parser didn't capture
+])
+def test_unparsed_constraints_fall_through(router, message):
+    assert route(router, message) is None
+
+
+def test_vendors_do_not_browse_through_the_fast_path(router):
+    assert route(router, "show me products", {"user_type": "vendor"}) is None
+
+
+def test_try_handle_runs_the_routed_call(router):
+    calls = []
+
+    class Assistant:
+        async def _execute_function_call(self, call):
+            calls.append((call.name, json.loads(call.arguments)))
+            return {"success": False, "message": "nothing", "error_type": "not_found"}
+
+    asyncio.run(router.try_handle(Assistant(), "show me storage under 5k", CUSTOMER))
+    assert calls == [("search_products", {"category": "Storage", "max_price": 5000.0})]
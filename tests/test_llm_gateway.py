@@ -0,0 +1,45 @@
+"""LLM gateway: sync callers are bounded and cancelled work frees its slot"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("openai")
+
+from utils.llm_gateway import LLMGateway
+
+
+def test_run_returns_the_result():
+    async def work():
+        return 42
+
+    assert LLMGateway().run(work()) == 42
+
+
+def test_run_timeout_cancels_the_coroutine():
+    gateway = LLMGateway()
+    cancelled = threading.Event()
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        finally:
+            cancelled.set()
+
+    started = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        gateway.run(slow(), timeout=0.1)
+    assert time.perf_counter() - started < 2
+    assert cancelled.wait(2)
+    assert gateway.get_stats()["run_timeouts"] == 1
+
+
+def test_default_run_timeout_fits_a_webhook(monkeypatch):
+    monkeypatch.delenv("SASABOT_LLM_RUN_TIMEOUT", raising=False)
+    monkeypatch.setenv("SASABOT_LLM_TIMEOUT", "60")
+    assert LLMGateway().run_timeout == 70
+    monkeypatch.setenv("SASABOT_LLM_RUN_TIMEOUT", "25")
+    assert LLMGateway().run_timeout == 25
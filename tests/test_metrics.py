@@ -0,0 +1,41 @@
+"""Metrics: exposition format and the metric base class"""
+
+import pytest
+
+from utils.metrics import Counter, Gauge, Histogram, _Metric
+
+
+def test_counter_and_gauge_render():
+    counter = Counter("test_total", "Test counter", ["tool", "outcome"])
+    counter.inc(tool="search", outcome="speculative")
+    counter.inc(2, tool="search", outcome="ok")
+    assert counter.render().splitlines() == [
+        "# HELP test_total Test counter",
+        "# TYPE test_total counter",
+        'test_total{tool="search",outcome="speculative"} 1',
+        'test_total{tool="search",outcome="ok"} 2',
+    ]
+
+    gauge = Gauge("test_in_progress", "Test gauge")
+    gauge.inc()
+    gauge.dec()
+    assert gauge.render().splitlines()[-1] == "test_in_progress 0"
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_seconds", "Test histogram", buckets=(0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    lines = histogram.render().splitlines()
+    assert 'test_seconds_bucket{le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{le="1"} 2' in lines
+    assert 'test_seconds_bucket{le="+Inf"} 2' in lines
+    assert "test_seconds_count 2" in lines
+
+
+def test_metric_types_must_define_samples():
+    class Untyped(_Metric):
+        pass
+
+    with pytest.raises(TypeError):
+        Untyped("test_untyped", "No samples")
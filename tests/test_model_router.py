@@ -0,0 +1,60 @@
+"""Model router: tier choice and escalation of invalid tool calls"""
+
+from types import SimpleNamespace
+
+from realtime.tool_dispatch import ToolDispatcher
+from utils.model_router import ModelRouter, LARGE, SMALL
+
+
+FUNCTION = {
+    "name": "update_product",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "business_id": {"type": "string"},
+            "product_identifier": {"type": "string"},
+            "price": {"type": "number"},
+        },
+        "required": ["business_id", "product_identifier"],
+    },
+}
+TOOLS = [{"type": "function", "function": FUNCTION}]
+DISPATCHER = ToolDispatcher([FUNCTION], {"update_product": lambda **kwargs: kwargs}, filled_by_caller={"business_id"})
+
+
+def call(name, arguments):
+    return SimpleNamespace(function=SimpleNamespace(name=name, arguments=arguments))
+
+
+def problems(*calls):
+    return ModelRouter.invalid_tool_calls(list(calls), TOOLS, check=DISPATCHER.check)
+
+
+def test_valid_calls_do_not_escalate():
+    assert problems(call("update_product", '{"product_identifier": "Mouse", "price": "1,500"}')) == []
+
+
+def test_escalation_agrees_with_dispatch():
+    bad_price = call("update_product", '{"product_identifier": "Mouse", "price": "abc"}')
+    assert problems(bad_price)
+    _, _, errors = DISPATCHER.prepare("update_product", bad_price.function.arguments)
+    assert problems(bad_price) == [f"update_product: {error}" for error in errors]
+
+
+def test_missing_and_unoffered():
+    assert problems(call("update_product", "{}")) == ["update_product: product_identifier: required"]
+    assert problems(call("delete_product", "{}")) == ["unknown function delete_product"]
+
+
+def test_check_does_not_count_calls():
+    dispatcher = ToolDispatcher([FUNCTION], {"update_product": lambda **kwargs: kwargs})
+    dispatcher.check("update_product", "{}")
+    assert dispatcher.get_stats()["calls"] == 0 and dispatcher.get_stats()["rejected"] == 0
+
+
+def test_tiers():
+    router = ModelRouter()
+    router.enabled = True
+    assert router.choose("turn", intent="greeting", message="hi") == SMALL
+    assert router.choose("turn", intent="add_product") == LARGE
+    assert router.choose("follow_up", tool_names=["get_sales_analytics"]) == LARGE
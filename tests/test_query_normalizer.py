@@ -0,0 +1,33 @@
+"""Query normalizer: numbers and emails survive; only known phrases are rewritten"""
+
+import pytest
+
+from utils.query_normalizer import normalize_query
+
+
+@pytest.mark.parametrize("text", ["1,500", "12.50", "5k", "+254712345678", "jane.doe@mail.co.ke"])
+def test_numbers_and_emails_stay_whole(text):
+    assert normalize_query(f"send {text} now") == f"send {text} now"
+
+
+def test_emails_are_lowercased_not_split():
+    assert normalize_query("Email me at Jane.Doe@Mail.co.ke") == "email me at jane.doe@mail.co.ke"
+
+
+def test_prices_next_to_rewritten_words():
+    assert normalize_query("simu ya 1,500 bob") == "phone ya 1,500 bob"
+
+
+@pytest.mark.parametrize("text", ["moto g", "ni", "na", "ya", "dope"])
+def test_single_words_with_other_meanings_are_left_alone(text):
+    assert normalize_query(text) == text
+
+
+def test_phrases_are_rewritten():
+    assert normalize_query("nataka simu") == "i want phone"
+    assert normalize_query("iko ya moto") == "iko hot"
+
+
+def test_stemming_is_opt_in():
+    assert normalize_query("cheap phones") == "cheap phones"
+    assert normalize_query("cheap phones", stem_words=True) == "cheap phone"
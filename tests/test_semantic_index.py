@@ -0,0 +1,85 @@
+"""Semantic index: refreshed only when the catalog changes, consistent under concurrent searches"""
+
+import json
+import os
+import threading
+
+import pytest
+
+from utils import simple_db
+from utils.semantic_index import HashedTfidfEmbedder, SemanticProductIndex
+
+
+class CountingEmbedder(HashedTfidfEmbedder):
+    def __init__(self):
+        super().__init__(dim=256)
+        self.embedded = 0
+
+    def embed(self, texts):
+        self.embedded += len(texts)
+        return super().embed(texts)
+
+
+def write_products(path, products):
+    path.write_text(json.dumps(products))
+    # Distinct mtimes even on coarse filesystem clocks
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    (tmp_path / "businesses.json").write_text("{}")
+    write_products(tmp_path / "products.json", [
+        {"id": "1", "name": "Stainless Steel Water Bottle", "category": "Household Items"},
+        {"id": "2", "name": "Wireless Mouse", "category": "Accessories"},
+    ])
+    database = simple_db.JSONDatabase(str(tmp_path))
+    monkeypatch.setattr(simple_db, "get_db", lambda: database)
+    return SemanticProductIndex(str(tmp_path), embedder=CountingEmbedder())
+
+
+def test_catalog_is_not_rescanned_per_search(index, monkeypatch):
+    assert index.search("water bottle")[0]["doc_id"] == "product:1"
+    refreshes = []
+    monkeypatch.setattr(index, "_refresh", lambda products: refreshes.append(1))
+    for _ in range(3):
+        index.search("mouse")
+    assert refreshes == []
+
+
+def test_catalog_changes_are_picked_up(index, tmp_path):
+    index.search("mouse")
+    embedded = index.embedder.embedded
+    write_products(tmp_path / "products.json", [
+        {"id": "1", "name": "Stainless Steel Water Bottle", "category": "Household Items"},
+        {"id": "2", "name": "Wireless Mouse", "category": "Accessories"},
+        {"id": "3", "name": "Electric Kettle", "category": "Household Items"},
+    ])
+    assert index.search("kettle")[0]["doc_id"] == "product:3"
+    # Query embeddings aside, only the new product was embedded
+    assert index.embedder.embedded - embedded == 1 + 1
+
+
+def test_concurrent_searches_see_one_generation(index, tmp_path):
+    errors = []
+
+    def searcher():
+        try:
+            for _ in range(50):
+                for hit in index.search("bottle mouse kettle"):
+                    assert hit["doc_id"].startswith(("product:", "detail:"))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=searcher) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for n in range(3, 13):
+        write_products(tmp_path / "products.json", [
+            {"id": str(i), "name": f"Kettle {i}", "category": "Household Items"} for i in range(1, n)
+        ])
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(index.doc_ids) == len(index.raw_vectors)
@@ -0,0 +1,74 @@
+"""Session stores: reads keep sessions alive, sweeps drop only idle ones"""
+
+import pytest
+
+from utils import session_store as module
+from utils.session_store import MemorySessionStore, SQLiteSessionStore
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(module.time, "time", clock.time)
+    return clock
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path, clock):
+    if request.param == "memory":
+        return MemorySessionStore(ttl_seconds=100)
+    return SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl_seconds=100)
+
+
+def test_read_then_sweep(clock):
+    store = MemorySessionStore(ttl_seconds=100)
+    for offset, session_id in enumerate(["whatsapp:a", "whatsapp:b", "whatsapp:c"]):
+        clock.now = 1000.0 + offset
+        store.save(session_id, {"n": offset})
+
+    clock.now = 1050.0
+    assert store.get("whatsapp:a") == {"n": 0}
+
+    clock.now = 1120.0
+    assert store.sweep() == 2
+    assert store.get("whatsapp:a") == {"n": 0}
+    assert store.get("whatsapp:b") is None and store.get("whatsapp:c") is None
+
+
+def test_a_session_that_is_only_read_stays_alive(clock):
+    store = MemorySessionStore(ttl_seconds=100)
+    store.save("chainlit:x", {"n": 1})
+    for _ in range(5):
+        clock.now += 60
+        assert store.get("chainlit:x") == {"n": 1}
+
+
+def test_counts_and_prefix_filter(store):
+    store.save("whatsapp:1", {})
+    store.save("chainlit:x", {})
+    store.save("whatsapp:2", {})
+    assert store.count_by_channel() == {"whatsapp": 2, "chainlit": 1}
+    assert sorted(k for k, _ in store.items(prefix="whatsapp:")) == ["whatsapp:1", "whatsapp:2"]
+
+
+def test_update_merges_into_the_stored_state(store):
+    store.save("whatsapp:1", {"a": 1})
+    store.update("whatsapp:1", lambda state: state.update(b=2))
+    assert store.get("whatsapp:1") == {"a": 1, "b": 2}
+
+
+def test_incomplete_store_cannot_be_created():
+    class Partial(module.SessionStore):
+        def get(self, session_id):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial(ttl_seconds=10)
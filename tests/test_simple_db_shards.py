@@ -0,0 +1,72 @@
+"""Sharded JSON database: locating records by ID"""
+
+import json
+
+import pytest
+
+from utils.simple_db import JSONDatabase
+
+
+@pytest.fixture
+def db(tmp_path):
+    for name, data in {
+        "businesses": {"shop_a": {"name": "A"}, "shop_b": {"name": "B"}},
+        "products": [
+            {"id": "1", "name": "Mouse", "business_id": "shop_a"},
+            {"id": "2", "name": "Kettle", "business_id": "shop_b"},
+        ],
+        "orders": [],
+    }.items():
+        (tmp_path / f"{name}.json").write_text(json.dumps(data))
+    database = JSONDatabase(str(tmp_path))
+    from utils.migrate_shards import migrate_to_shards
+    migrate_to_shards(database)
+    return database
+
+
+@pytest.fixture
+def reads(db, monkeypatch):
+    loaded = []
+    original = db._read_json
+
+    def counting(filename):
+        loaded.append(filename)
+        return original(filename)
+
+    monkeypatch.setattr(db, "_read_json", counting)
+    return loaded
+
+
+def test_locate_existing_records(db):
+    assert db._locate_shard("products", "1") == "shop_a"
+    assert db._locate_shard("products", "2") == "shop_b"
+
+
+def test_missing_ids_do_not_reload_every_shard(db, reads):
+    db._locate_shard("products", "1")
+    reads.clear()
+    for _ in range(5):
+        assert db._locate_shard("products", "999") is None
+    assert [f for f in reads if f.endswith("/products")] == []
+
+
+def test_shard_written_elsewhere_is_reread(db, reads, tmp_path):
+    db._locate_shard("products", "1")
+    shard = tmp_path / "shop_b" / "products.json"
+    shard.write_text(json.dumps([
+        {"id": "2", "name": "Kettle", "business_id": "shop_b"},
+        {"id": "3", "name": "Toaster", "business_id": "shop_b"},
+    ]))
+    reads.clear()
+    assert db._locate_shard("products", "3") == "shop_b"
+    assert [f for f in reads if f.endswith("/products")] == ["shop_b/products"]
+
+
+def test_own_writes_keep_the_index_current(db, reads):
+    db._locate_shard("products", "1")
+    assert db.add_product({"name": "Cable", "business_id": "shop_a", "price": 100})
+    new_id = max(db._all_record_ids("products"), key=int)
+    reads.clear()
+    assert db._locate_shard("products", new_id) == "shop_a"
+    assert db._locate_shard("products", "999") is None
+    assert [f for f in reads if f.endswith("/products")] == []
@@ -0,0 +1,87 @@
+"""Single-flight: concurrent identical calls share one execution"""
+
+import asyncio
+import threading
+import time
+
+from utils.single_flight import SingleFlight, ThreadSingleFlight, flight_key
+
+
+def test_flight_key_ignores_order_and_unset_arguments():
+    assert flight_key("search", {"query": "tv", "max_price": None, "category": "x"}) == \
+        flight_key("search", {"category": "x", "query": "tv"})
+    assert flight_key("search", {"query": "tv"}) != flight_key("search", {"query": "TV"})
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test")
+    runs = []
+
+    async def work():
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        return {"value": 42}
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", work) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert len(runs) == 1
+    assert all(result == {"value": 42} for result in results)
+    assert flight.get_stats()["shared"] == 4 and flight.get_stats()["in_flight"] == 0
+
+
+def test_a_cancelled_caller_does_not_fail_the_others():
+    flight = SingleFlight("test")
+
+    async def work():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("key", work))
+        second = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == "done"
+
+
+def test_errors_reach_every_caller():
+    flight = SingleFlight("test")
+
+    async def work():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", work) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(result, ValueError) for result in asyncio.run(main()))
+
+
+def test_thread_callers_get_their_own_copy():
+    flight = ThreadSingleFlight("test")
+    started = threading.Event()
+    results = []
+
+    def load():
+        started.set()
+        time.sleep(0.05)
+        return [1, 2, 3]
+
+    def caller():
+        results.append(flight.do("key", load, share=list))
+
+    threads = [threading.Thread(target=caller) for _ in range(4)]
+    threads[0].start()
+    started.wait()
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert flight.get_stats()["executed"] == 1
+    assert all(result == [1, 2, 3] for result in results)
+    assert len({id(result) for result in results}) == 4
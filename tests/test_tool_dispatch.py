@@ -0,0 +1,129 @@
+"""Tool dispatch: argument validation and session-filled business_id"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from realtime.tool_dispatch import ToolDispatcher
+
+
+FUNCTIONS = [{
+    "name": "update_product",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "business_id": {"type": "string"},
+            "product_identifier": {"type": "string"},
+            "price": {"type": "number"},
+        },
+        "required": ["business_id", "product_identifier"],
+    },
+}]
+
+
+def dispatcher(**options):
+    return ToolDispatcher(FUNCTIONS, {"update_product": lambda **kwargs: kwargs}, **options)
+
+
+def test_missing_business_id_is_rejected_unless_filled_by_caller():
+    _, _, errors = dispatcher().prepare("update_product", '{"product_identifier": "Mouse"}')
+    assert errors == ["business_id: required"]
+
+    tool, arguments, errors = dispatcher(filled_by_caller={"business_id"}).prepare(
+        "update_product", '{"product_identifier": "Mouse"}'
+    )
+    assert errors == []
+    assert arguments == {"product_identifier": "Mouse"}
+    assert tool.required == ("product_identifier",)
+
+
+def test_arguments_are_coerced_and_counted():
+    tools = dispatcher(filled_by_caller={"business_id"})
+    _, arguments, errors = tools.prepare("update_product", '{"product_identifier": "Mouse", "price": "1,500"}')
+    assert errors == [] and arguments["price"] == 1500
+    tools.prepare("update_product", "not json")
+    assert tools.get_stats()["coerced"] == 1 and tools.get_stats()["rejected"] == 1
+
+
+def test_speculative_calls_are_counted_apart():
+    tools = dispatcher(filled_by_caller={"business_id"})
+    tools.prepare("update_product", '{"product_identifier": "Mouse"}', speculative=True)
+    assert tools.get_stats()["calls"] == 0 and tools.get_stats()["speculative"] == 1
+
+
+def test_undeclared_arguments_are_dropped():
+    tools = dispatcher(filled_by_caller={"business_id"})
+    _, arguments, errors = tools.prepare(
+        "update_product", '{"product_identifier": "Mouse", "price": 1500, "discount_code": "X", "stock_hint": 9}'
+    )
+    assert errors == []
+    assert arguments == {"product_identifier": "Mouse", "price": 1500}
+
+
+def test_nested_objects_drop_undeclared_keys_unless_free_form():
+    functions = [{
+        "name": "place_order",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "items": {"type": "array", "items": {
+                    "type": "object", "properties": {"product_id": {"type": "string"}}
+                }},
+                "notes": {"type": "object"},
+            },
+        },
+    }]
+    tools = ToolDispatcher(functions, {"place_order": lambda **kwargs: kwargs})
+    _, arguments, errors = tools.prepare(
+        "place_order", '{"items": [{"product_id": "1", "colour": "red"}], "notes": {"gift": true}}'
+    )
+    assert errors == []
+    assert arguments == {"items": [{"product_id": "1"}], "notes": {"gift": True}}
+
+
+def test_unknown_function():
+    tool, _, errors = dispatcher().prepare("nope", "{}")
+    assert tool is None and errors
+
+
+# =============================================================================
+# ASSISTANT WRAPPERS
+# =============================================================================
+
+@pytest.fixture
+def assistant(monkeypatch):
+    pytest.importorskip("chainlit")
+    pytest.importorskip("openai")
+    import realtime.assistant as module
+
+    calls = []
+
+    def recorder(name):
+        def handler(**kwargs):
+            calls.append((name, kwargs))
+            return {"success": True, "message": "ok"}
+        return handler
+
+    for name in ("add_product_handler", "update_product_handler", "delete_product_handler"):
+        monkeypatch.setattr(module, name, recorder(name))
+    token = module.use_session(module.LocalSession("test", user_type="vendor", business_id="test_shop"))
+    assistant = module.SasabotAssistant()
+    assistant.calls = calls
+    yield assistant
+    module._session_override.reset(token)
+
+
+@pytest.mark.parametrize("name, arguments", [
+    ("add_product", {"name": "Mouse", "price": 1500, "stock": 3, "category": "Accessories",
+                     "description": "Wireless", "brand": "Logi", "warranty": "1 year"}),
+    ("update_product", {"product_identifier": "Mouse", "price": 1600}),
+    ("delete_product", {"product_identifier": "Mouse"}),
+])
+def test_wrappers_fill_business_id_from_the_session(assistant, name, arguments):
+    call = SimpleNamespace(name=name, arguments=json.dumps(arguments))
+    result = asyncio.run(assistant._execute_function_call(call))
+    assert result.get("success") is True, result
+    assert assistant.calls[-1][0] == f"{name}_handler"
+    assert assistant.calls[-1][1]["business_id"] == "test_shop"
@@ -0,0 +1,440 @@
+"""
+Catalog Enrichment
+Ingests data/products_details.jsonl and data/product_photos into a prebuilt
+attribute index (color, material, capacity) with resized photo variants,
+so search filters and photo lookups never touch the raw files at request time.
+
+Detail records are linked to catalog products by name, brand, kind of item,
+material and capacity. The Chainlit and WhatsApp replies attach the linked
+photo of each product they mention (SASABOT_PRODUCT_PHOTOS, default true);
+the index is built on first use when it was never ingested.
+
+Usage:
+    python -m utils.catalog_enrichment               # ingest into data/catalog_enrichment.json
+    python -m utils.catalog_enrichment --data-dir path/to/data
+"""
+
+import argparse
+import json
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from utils import simple_db
+from utils.query_normalizer import stem
+
+
+ENRICHMENT_FILE = "catalog_enrichment.json"
+THUMBNAIL_DIR = "derived"
+THUMBNAIL_SIZES = (160, 480)
+
+COLORS = [
+    "baby pink", "navy blue", "lime green", "black", "white", "silver", "grey", "gray",
+    "red", "blue", "green", "pink", "orange", "yellow", "purple", "brown", "gold", "copper",
+]
+MATERIALS = {
+    "stainless steel": ["stainless steel", "steel"],
+    "copper": ["copper"],
+    "plastic": ["plastic", "bpa-free", "tritan"],
+    "glass": ["glass"],
+    "aluminium": ["aluminium", "aluminum"],
+    "bamboo": ["bamboo"],
+    "silicone": ["silicone"],
+}
+FEATURES = {
+    "insulated": ["insulat", "vacuum", "thermo", "thermal"],
+    "leak-proof": ["leak-proof", "spill-proof", "leakproof"],
+    "straw": ["straw"],
+    "kids": ["kid", "kids'", "small hands"],
+}
+CAPACITY_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*(fl\.?\s*oz|oz|ml|l|litres?|liters?)\b", re.IGNORECASE)
+ML_PER_UNIT = {"oz": 29.57, "ml": 1.0, "l": 1000.0}
+
+# Linking detail records to catalog products: the kind of item must agree
+# (a mug is never linked to a bottle), and so must material and capacity when
+# both sides state them
+PRODUCT_KINDS = {
+    "bottle", "mug", "flask", "tumbler", "cup", "pint", "canteen", "phone", "laptop",
+    "headphone", "speaker", "charger", "cable", "mouse", "drive",
+}
+NAME_STOPWORDS = {"the", "and", "with", "for", "set", "classic", "collection", "new", "in"}
+UNIT_TOKEN = re.compile(r"\d+(?:oz|ml|l)")
+LINK_THRESHOLD = 0.5
+CAPACITY_TOLERANCE = 0.2
+
+# Product references in a reply: "Product ID: 105", "🆔 **ID: 105**"
+PRODUCT_ID_PATTERN = re.compile(r"\bID[:\s]*\**\s*(\d+)\b")
+
+
+# =============================================================================
+# STREAMING INGEST
+# =============================================================================
+
+def iter_detail_records(path: Path, chunk_size: int = 65536) -> Iterator[Dict]:
+    """
+    Stream records from a JSON-lines file or a top-level JSON array
+    without loading the whole file into memory
+    """
+    if not Path(path).exists():
+        return
+
+    decoder = json.JSONDecoder()
+    buffer = ""
+    with open(path, 'r', encoding='utf-8') as f:
+        eof = False
+        while True:
+            # Skip separators between records: whitespace, array brackets, commas
+            stripped = buffer.lstrip(" \t\r\n[],")
+            if not stripped and eof:
+                return
+            try:
+                record, end = decoder.raw_decode(stripped)
+            except json.JSONDecodeError:
+                if eof:
+                    if stripped.strip():
+                        print(f"⚠️ Skipping unparseable trailing data in {path}")
+                    return
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer = stripped + chunk
+                continue
+
+            buffer = stripped[end:]
+            if isinstance(record, dict):
+                yield record
+
+
+def _capacity_ml(text: str) -> Optional[int]:
+    match = CAPACITY_PATTERN.search(text)
+    if not match:
+        return None
+    amount, unit = float(match.group(1)), match.group(2).lower()
+    unit = "oz" if "oz" in unit else ("ml" if unit == "ml" else "l")
+    return int(round(amount * ML_PER_UNIT[unit]))
+
+
+def extract_attributes(record: Dict) -> Dict[str, Any]:
+    """Pull color, material, capacity and features out of a detail record"""
+    text = f"{record.get('name', '')} {record.get('description', '')}".lower()
+
+    colors = []
+    if record.get('color'):
+        colors.append(str(record['color']).lower())
+    for color in COLORS:
+        if re.search(rf"\b{color}\b", text) and not any(color in c for c in colors):
+            colors.append(color)
+
+    materials = [name for name, words in MATERIALS.items() if any(w in text for w in words)]
+    features = [name for name, words in FEATURES.items() if any(w in text for w in words)]
+
+    return {
+        "colors": colors,
+        "materials": materials,
+        "capacity_ml": _capacity_ml(text),
+        "features": features,
+    }
+
+
+def _tokens(text: str) -> set:
+    """Name tokens: lowercased, singular, without filler words and sizes ("18oz")"""
+    return {
+        stem(word) for word in re.findall(r"[a-z0-9]+", text.lower())
+        if word not in NAME_STOPWORDS and not UNIT_TOKEN.fullmatch(word)
+    }
+
+
+def _compatible(record_attributes: Dict, product_attributes: Dict) -> bool:
+    """Material and capacity don't contradict each other (unstated counts as compatible)"""
+    record_materials, product_materials = set(record_attributes["materials"]), set(product_attributes["materials"])
+    if record_materials and product_materials and not record_materials & product_materials:
+        return False
+    record_ml, product_ml = record_attributes["capacity_ml"], product_attributes["capacity_ml"]
+    if record_ml and product_ml and abs(record_ml - product_ml) > CAPACITY_TOLERANCE * product_ml:
+        return False
+    return True
+
+
+def link_score(record: Dict, product: Dict) -> float:
+    """
+    How well a detail record matches a catalog product (0..1)
+    The share of the product's name found in the record's name, plus a bonus
+    when the record names the product's brand; 0 when they are different
+    kinds of item or their material/capacity disagree
+    """
+    record_tokens = _tokens(record.get('name', ''))
+    product_tokens = _tokens(product.get('name', ''))
+    if not record_tokens or not product_tokens:
+        return 0.0
+
+    record_kinds, product_kinds = record_tokens & PRODUCT_KINDS, product_tokens & PRODUCT_KINDS
+    if record_kinds and product_kinds and not record_kinds & product_kinds:
+        return 0.0
+    if not _compatible(extract_attributes(record), extract_attributes(product)):
+        return 0.0
+
+    score = len(record_tokens & product_tokens) / len(product_tokens)
+    brand_tokens = _tokens(product.get('brand', '')) - {"generic"}
+    if brand_tokens and brand_tokens <= record_tokens:
+        score += 0.5
+    return min(score, 1.0)
+
+
+def best_link(record: Dict, products: List[Dict], threshold: float = LINK_THRESHOLD) -> Tuple[Optional[str], float]:
+    """(product id, score) of the best matching catalog product; (None, 0.0) below the threshold"""
+    best_id, best_score = None, 0.0
+    for product in products:
+        score = link_score(record, product)
+        if score > best_score:
+            best_id, best_score = product.get('id'), score
+    return (best_id, round(best_score, 3)) if best_score >= threshold else (None, 0.0)
+
+
+def link_to_catalog(record: Dict, products: List[Dict], threshold: float = LINK_THRESHOLD) -> Optional[str]:
+    """Link a detail record to the best matching catalog product (None below the threshold)"""
+    return best_link(record, products, threshold)[0]
+
+
+def generate_thumbnails(photo: Path, output_dir: Path) -> Dict[str, str]:
+    """
+    Write resized JPEG + WebP variants of a photo (skipped when up to date)
+    Returns {"<size>": relative webp path, "<size>_jpg": relative jpeg path}
+    """
+    variants = {}
+    if Image is None or not photo.exists():
+        return variants
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    source_mtime = photo.stat().st_mtime
+    image = None
+    for size in THUMBNAIL_SIZES:
+        for fmt, suffix in (("WEBP", "webp"), ("JPEG", "jpg")):
+            target = output_dir / f"{photo.stem}_{size}.{suffix}"
+            key = str(size) if suffix == "webp" else f"{size}_jpg"
+            variants[key] = str(target.relative_to(output_dir.parent.parent))
+            if target.exists() and target.stat().st_mtime >= source_mtime:
+                continue
+            if image is None:
+                image = Image.open(photo).convert("RGB")
+            thumbnail = image.copy()
+            thumbnail.thumbnail((size, size))
+            thumbnail.save(target, fmt, quality=82)
+    return variants
+
+
+def build_enrichment(database=None) -> Dict[str, Any]:
+    """
+    Run the ingest pipeline and write data/catalog_enrichment.json
+    Records are keyed by image stem (e.g. 'pink_thermo_flask')
+    """
+    database = database or simple_db.get_db()
+    data_dir = database.data_dir
+    photos_dir = data_dir / "product_photos"
+    products = database.get_products()
+
+    if Image is None:
+        print("⚠️ Pillow not installed - skipping thumbnail generation (pip install pillow)")
+
+    records = {}
+    index = {"color": {}, "material": {}, "feature": {}}
+    for i, record in enumerate(iter_detail_records(data_dir / "products_details.jsonl")):
+        key = Path(str(record.get('image') or f"record_{i}")).stem
+        attributes = extract_attributes(record)
+        photo = photos_dir / str(record.get('image', ''))
+        linked_id, score = best_link(record, products)
+
+        records[key] = {
+            "name": record.get('name', ''),
+            "description": record.get('description', ''),
+            "price": record.get('price'),
+            "stock_quantity": record.get('stock_quantity'),
+            "image": str(photo.relative_to(data_dir)) if record.get('image') and photo.exists() else None,
+            "thumbnails": generate_thumbnails(photo, photos_dir / THUMBNAIL_DIR) if record.get('image') else {},
+            "linked_product_id": linked_id,
+            "link_score": score,
+            "attributes": attributes,
+        }
+
+        for color in attributes["colors"]:
+            index["color"].setdefault(color, []).append(key)
+        for material in attributes["materials"]:
+            index["material"].setdefault(material, []).append(key)
+        for feature in attributes["features"]:
+            index["feature"].setdefault(feature, []).append(key)
+
+    enrichment = {
+        "generated_at": datetime.now().isoformat(),
+        "records": records,
+        "index": index,
+    }
+    database.save_json(ENRICHMENT_FILE.replace('.json', ''), enrichment, create_backup=False)
+    linked = sum(1 for r in records.values() if r["linked_product_id"])
+    print(f"✅ Enriched {len(records)} detail records ({linked} linked to catalog products)")
+    return enrichment
+
+
+# =============================================================================
+# CACHED LOOKUPS
+# =============================================================================
+
+class CatalogEnrichment:
+    """Read side of the enrichment index, reloaded only when the file changes"""
+
+    def __init__(self):
+        self._data: Dict[str, Any] = {"records": {}, "index": {}}
+        self._mtime = None
+        self._by_product: Dict[str, List[str]] = {}
+        self._build_attempted = False
+
+    def _load(self) -> Dict[str, Any]:
+        path = simple_db.get_db().data_dir / ENRICHMENT_FILE
+        mtime = path.stat().st_mtime if path.exists() else None
+        if mtime != self._mtime:
+            self._mtime = mtime
+            self._data = {"records": {}, "index": {}}
+            if mtime is not None:
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        self._data = json.load(f)
+                except (OSError, json.JSONDecodeError) as e:
+                    print(f"⚠️ Could not read {ENRICHMENT_FILE}: {e}")
+            self._by_product = {}
+            records = self._data.get("records", {})
+            for key, record in records.items():
+                if record.get("linked_product_id"):
+                    self._by_product.setdefault(str(record["linked_product_id"]), []).append(key)
+            # Closest match first (its photo represents the product)
+            for keys in self._by_product.values():
+                keys.sort(key=lambda k: -records[k].get("link_score", 0))
+        return self._data
+
+    def get_record(self, key: str) -> Optional[Dict]:
+        """Enrichment record by image stem"""
+        return self._load()["records"].get(key)
+
+    def records_for_product(self, product_id: str) -> List[Dict]:
+        """Enrichment records linked to a catalog product"""
+        data = self._load()
+        return [data["records"][key] for key in self._by_product.get(str(product_id), [])]
+
+    def find(self, color: str = None, material: str = None, feature: str = None,
+             min_capacity_ml: int = None, max_capacity_ml: int = None) -> List[Dict]:
+        """Records matching every given attribute filter"""
+        data = self._load()
+        index = data.get("index", {})
+        keys = None
+
+        for field, value in (("color", color), ("material", material), ("feature", feature)):
+            if not value:
+                continue
+            value = value.strip().lower()
+            # Partial match so "blue" also finds "navy blue"
+            matched = {k for name, ks in index.get(field, {}).items() if value in name for k in ks}
+            keys = matched if keys is None else keys & matched
+
+        if keys is None:
+            keys = set(data["records"])
+
+        results = []
+        for key in sorted(keys):
+            record = data["records"][key]
+            capacity = record["attributes"].get("capacity_ml")
+            if min_capacity_ml is not None and (capacity is None or capacity < min_capacity_ml):
+                continue
+            if max_capacity_ml is not None and (capacity is None or capacity > max_capacity_ml):
+                continue
+            results.append({"key": key, **record})
+        return results
+
+    def product_matches(self, product: Dict, color: str = None, material: str = None) -> bool:
+        """Check a catalog product against attribute filters (linked records or own text)"""
+        text = f"{product.get('name', '')} {product.get('description', '')}".lower()
+        linked = self.records_for_product(product.get('id'))
+        for field, value in (("colors", color), ("materials", material)):
+            if not value:
+                continue
+            value = value.strip().lower()
+            in_linked = any(value in v for r in linked for v in r["attributes"].get(field, []))
+            if not in_linked and value not in text:
+                return False
+        return True
+
+    def photo_for(self, key: str, size: int = THUMBNAIL_SIZES[0], fmt: str = "webp") -> Optional[Path]:
+        """Path to a pre-generated photo variant, falling back to the original"""
+        record = self.get_record(key)
+        if not record:
+            return None
+        variant = record.get("thumbnails", {}).get(str(size) if fmt == "webp" else f"{size}_jpg")
+        relative = variant or record.get("image")
+        return simple_db.get_db().data_dir / relative if relative else None
+
+    def _ensure_built(self):
+        """Build the index once if it was never ingested, so photos work out of the box"""
+        if self._build_attempted:
+            return
+        self._build_attempted = True
+        if not (simple_db.get_db().data_dir / ENRICHMENT_FILE).exists():
+            try:
+                build_enrichment()
+            except Exception as e:
+                print(f"⚠️ Could not build the catalog enrichment index: {e}")
+
+    def photo_for_product(self, product_id, size: int = THUMBNAIL_SIZES[1], fmt: str = "webp") -> Optional[Path]:
+        """Photo of a catalog product, from the first linked record whose photo exists"""
+        self._ensure_built()
+        self._load()
+        for key in self._by_product.get(str(product_id), []):
+            path = self.photo_for(key, size, fmt)
+            if path is not None and path.exists():
+                return path
+        return None
+
+    def photos_in_reply(self, text: str, products: List[Dict], limit: int = 3,
+                        size: int = THUMBNAIL_SIZES[1], fmt: str = "webp") -> List[Tuple[Dict, Path]]:
+        """
+        (product, photo) for the catalog products a reply mentions, by product ID
+        or by name, in the order they are mentioned; products without a photo are skipped
+        """
+        if not text or not products:
+            return []
+        lowered = text.lower()
+        by_id = {str(p.get('id')): p for p in products}
+
+        positions: Dict[str, int] = {}
+        for match in PRODUCT_ID_PATTERN.finditer(text):
+            if match.group(1) in by_id:
+                positions.setdefault(match.group(1), match.start())
+        # Longest names first, blanking each match so "Water Bottle" doesn't
+        # also match inside "500ml Steel Water Bottle"
+        for product_id, product in sorted(by_id.items(), key=lambda item: -len(item[1].get('name') or "")):
+            name = (product.get('name') or "").lower()
+            start = lowered.find(name) if name else -1
+            if start < 0:
+                continue
+            lowered = lowered[:start] + " " * len(name) + lowered[start + len(name):]
+            positions.setdefault(product_id, start)
+
+        photos = []
+        for product_id in sorted(positions, key=positions.get):
+            path = self.photo_for_product(product_id, size, fmt)
+            if path is not None:
+                photos.append((by_id[product_id], path))
+                if len(photos) >= limit:
+                    break
+        return photos
+
+
+# Global enrichment instance
+catalog_enrichment = CatalogEnrichment()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the catalog enrichment index")
+    parser.add_argument("--data-dir", default="data", help="Data directory (default: data)")
+    args = parser.parse_args()
+    build_enrichment(simple_db.initialize_database(args.data_dir))
@@ -0,0 +1,190 @@
+"""
+Conversation Summary
+Folds older exchanges of a session into a compact running summary so long
+sessions don't resend old product listings on every turn. The most recent
+exchanges stay verbatim; product, order and payment IDs mentioned in folded
+exchanges are kept in structured form.
+
+The summary is written by the small model in the background after a turn
+(SASABOT_SUMMARY_MODE=llm, the default when an API key is set), or by a local
+extractive fallback (SASABOT_SUMMARY_MODE=extractive, or when the LLM fails).
+"""
+
+import asyncio
+import os
+import re
+import time
+from typing import Any, Dict, List
+
+from utils.llm_gateway import llm_gateway
+from utils.model_router import model_router, SMALL
+from utils.session_store import session_store
+
+
+KEEP_RECENT = 3
+FOLD_BATCH = 2
+SUMMARY_MAX_CHARS = 800
+MAX_ENTITIES = 10
+
+ENTITY_PATTERNS = {
+    # "ID" only in capitals, so "paid 1500" or "valid 12" aren't read as product IDs
+    "product_ids": re.compile(r"\b(?:(?i:product)\s+ID|ID)\b\s*[:#]?\s*\**\s*(\d+)\b"),
+    "order_ids": re.compile(r"\b(ORD\d+)\b", re.IGNORECASE),
+    "payment_ids": re.compile(r"\b(PAY\d+)\b", re.IGNORECASE),
+}
+
+SUMMARY_PROMPT = """Update the running summary of a shop assistant conversation.
+Keep it under 80 words. Keep what the user wants, decisions made, products/orders discussed
+(with their IDs) and anything still pending. Drop greetings and full product listings.
+
+Current summary:
+{summary}
+
+New exchanges to fold in:
+{exchanges}
+
+Updated summary:"""
+
+
+def extract_entities(exchanges: List[Dict[str, str]]) -> Dict[str, List[str]]:
+    """Product/order/payment IDs referenced in exchanges, in order of appearance"""
+    entities: Dict[str, List[str]] = {name: [] for name in ENTITY_PATTERNS}
+    for exchange in exchanges:
+        text = f"{exchange.get('user_message', '')}\n{exchange.get('ai_response', '')}"
+        for name, pattern in ENTITY_PATTERNS.items():
+            for match in pattern.findall(text):
+                value = match.upper()
+                if value not in entities[name]:
+                    entities[name].append(value)
+    return entities
+
+
+def merge_entities(existing: Dict[str, List[str]], new: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """Most recent references last, capped per kind"""
+    merged = {}
+    for name in ENTITY_PATTERNS:
+        values = [v for v in existing.get(name, []) if v not in new.get(name, [])] + new.get(name, [])
+        if values:
+            merged[name] = values[-MAX_ENTITIES:]
+    return merged
+
+
+def _first_line(text: str, limit: int = 100) -> str:
+    line = next((l.strip() for l in (text or "").splitlines() if l.strip()), "")
+    line = line.replace("**", "")
+    return line if len(line) <= limit else line[:limit - 1] + "…"
+
+
+def extractive_summary(summary: str, exchanges: List[Dict[str, str]]) -> str:
+    """Local fallback: one line per exchange, oldest lines dropped past the size cap"""
+    lines = [line for line in (summary or "").splitlines() if line]
+    for exchange in exchanges:
+        lines.append(f"- User: {_first_line(exchange.get('user_message', ''))} → "
+                     f"Bot: {_first_line(exchange.get('ai_response', ''))}")
+    while lines and len("\n".join(lines)) > SUMMARY_MAX_CHARS:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+def format_memory(state: Dict[str, Any]) -> str:
+    """Summary + entity references for a system message ('' when there is nothing yet)"""
+    parts = []
+    if state.get("summary"):
+        parts.append(f"EARLIER IN THIS CONVERSATION:\n{state['summary']}")
+    entities = state.get("entities") or {}
+    labels = {"product_ids": "product IDs", "order_ids": "order IDs", "payment_ids": "payment IDs"}
+    refs = [f"{labels[name]} {', '.join(values)}" for name, values in entities.items() if values]
+    if refs:
+        parts.append("REFERENCED EARLIER: " + "; ".join(refs))
+    return "\n".join(parts)
+
+
+class ConversationSummarizer:
+    """Folds old exchanges of a session into its summary"""
+
+    def __init__(self, store=None):
+        self.store = store or session_store
+        default_mode = "llm" if os.getenv("OPENAI_API_KEY") else "extractive"
+        self.mode = os.getenv("SASABOT_SUMMARY_MODE", default_mode).lower()
+        self._folding = set()
+        self._tasks = set()
+
+        # Metrics
+        self.folds = 0
+        self.llm_failures = 0
+
+    def _needs_fold(self, state: Dict[str, Any]) -> bool:
+        return len(state.get("conversation_history", [])) > KEEP_RECENT + FOLD_BATCH
+
+    async def _llm_summary(self, summary: str, exchanges: List[Dict[str, str]]) -> str:
+        transcript = "\n".join(
+            f"User: {e.get('user_message', '')}\nBot: {e.get('ai_response', '')[:600]}" for e in exchanges
+        )
+        prompt = SUMMARY_PROMPT.format(summary=summary or "(none)", exchanges=transcript)
+        started = time.perf_counter()
+        response = await llm_gateway.chat(
+            model=model_router.model(SMALL),
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.2,
+            max_tokens=200
+        )
+        model_router.record_response(SMALL, started, response)
+        return (response.choices[0].message.content or "").strip()[:SUMMARY_MAX_CHARS]
+
+    async def fold(self, session_id: str):
+        """Fold everything but the most recent exchanges into the session summary"""
+        state = self.store.get(session_id)
+        if not state or not self._needs_fold(state) or session_id in self._folding:
+            return
+        self._folding.add(session_id)
+        try:
+            old = state["conversation_history"][:-KEEP_RECENT]
+            summary = state.get("summary", "")
+
+            new_summary = None
+            if self.mode == "llm":
+                try:
+                    new_summary = await self._llm_summary(summary, old)
+                except Exception as e:
+                    self.llm_failures += 1
+                    print(f"⚠️ Summary model failed, using extractive summary: {e}")
+            if not new_summary:
+                new_summary = extractive_summary(summary, old)
+
+            # Applied to the stored session: it may have moved on while the model was working
+            folded = {(e.get("timestamp"), e.get("user_message")) for e in old}
+
+            def apply(current: Dict[str, Any]):
+                current["conversation_history"] = [
+                    e for e in current.get("conversation_history", [])
+                    if (e.get("timestamp"), e.get("user_message")) not in folded
+                ]
+                current["summary"] = new_summary
+                current["entities"] = merge_entities(current.get("entities", {}), extract_entities(old))
+
+            self.store.update(session_id, apply)
+            self.folds += 1
+        finally:
+            self._folding.discard(session_id)
+
+    def schedule(self, session_id: str):
+        """Fold in the background after a turn (inline when there is no running loop)"""
+        state = self.store.get(session_id)
+        if not state or not self._needs_fold(state):
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            asyncio.run(self.fold(session_id))
+            return
+        task = loop.create_task(self.fold(session_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Summarizer statistics"""
+        return {"mode": self.mode, "folds": self.folds, "llm_failures": self.llm_failures}
+
+
+# Global summarizer instance
+summarizer = ConversationSummarizer()
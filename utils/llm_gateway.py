@@ -0,0 +1,265 @@
+"""
+LLM Gateway
+One long-lived OpenAI client per event loop (with a pooled keep-alive HTTP
+connection, HTTP/2 when the h2 package is installed), bounded concurrency,
+request timeouts and exponential backoff with jitter on 429/5xx errors.
+
+Async code (Chainlit) awaits gateway.chat(...). Sync code (the Flask
+webhook) calls gateway.run(coro), which runs the coroutine on the
+gateway's background event loop so its connection pool survives between
+requests instead of being thrown away with a per-message loop.
+
+SASABOT_LLM_BACKEND=mock swaps in the offline stand-in from utils.mock_llm.
+"""
+
+import asyncio
+import concurrent.futures
+import importlib.util
+import os
+import random
+import threading
+from typing import Any, Callable, Dict, Optional
+
+import httpx
+import openai
+
+from utils.metrics import LLM_ERRORS, LLM_RETRIES, metrics
+from utils.tracing import tracer
+
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = ("APIConnectionError", "APITimeoutError")
+
+
+class StreamSlot:
+    """
+    A streaming response holding its concurrency slot until the stream is
+    read to the end, closed, or dropped
+    """
+
+    def __init__(self, stream, release: Callable[[], None]):
+        self._stream = stream
+        self._release: Optional[Callable[[], None]] = release
+
+    def _free(self):
+        release, self._release = self._release, None
+        if release is not None:
+            release()
+
+    async def __aiter__(self):
+        try:
+            async for chunk in self._stream:
+                yield chunk
+        finally:
+            self._free()
+
+    async def close(self):
+        try:
+            close = getattr(self._stream, "close", None)
+            if close is not None:
+                await close()
+        finally:
+            self._free()
+
+    aclose = close
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+    def __del__(self):
+        self._free()
+
+
+class LLMGateway:
+    """Shared, rate-limited access to the OpenAI chat completions API"""
+
+    def __init__(self):
+        self.api_key = os.getenv("OPENAI_API_KEY")
+        self.max_concurrency = int(os.getenv("SASABOT_LLM_MAX_CONCURRENCY", "8"))
+        self.max_retries = int(os.getenv("SASABOT_LLM_MAX_RETRIES", "4"))
+        self.timeout = float(os.getenv("SASABOT_LLM_TIMEOUT", "60"))
+        # Wall-clock bound for run(): a sync caller (a Flask worker) waits at most this long
+        self.run_timeout = float(os.getenv("SASABOT_LLM_RUN_TIMEOUT", str(self.timeout + 10)))
+        self.base_delay = 0.5
+        self.max_delay = 20.0
+        self.http2 = importlib.util.find_spec("h2") is not None
+
+        # Clients and semaphores are bound to the loop that created them
+        self._clients: Dict[int, Any] = {}
+        self._semaphores: Dict[int, asyncio.Semaphore] = {}
+        self._lock = threading.Lock()
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+        # Metrics
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.run_timeouts = 0
+        self.in_flight = 0
+
+    # =============================================================================
+    # CLIENTS
+    # =============================================================================
+
+    def _new_client(self):
+        http_client = httpx.AsyncClient(
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency * 2,
+                max_keepalive_connections=self.max_concurrency,
+                keepalive_expiry=120,
+            ),
+            timeout=httpx.Timeout(self.timeout, connect=10.0),
+        )
+        # Retries are handled here so backoff and metrics are in one place
+        return openai.AsyncOpenAI(
+            api_key=self.api_key, http_client=http_client, max_retries=0, timeout=self.timeout
+        )
+
+    def get_client(self):
+        """OpenAI client for the running event loop (created on first use)"""
+        loop_id = id(asyncio.get_running_loop())
+        with self._lock:
+            client = self._clients.get(loop_id)
+            if client is None:
+                client = self._clients[loop_id] = self._new_client()
+                self._semaphores[loop_id] = asyncio.Semaphore(self.max_concurrency)
+            return client
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        self.get_client()
+        return self._semaphores[id(asyncio.get_running_loop())]
+
+    # =============================================================================
+    # REQUESTS
+    # =============================================================================
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        status = getattr(error, "status_code", None)
+        if status in RETRYABLE_STATUS:
+            return True
+        return type(error).__name__ in RETRYABLE_ERRORS
+
+    def _retry_delay(self, attempt: int, error: Exception) -> float:
+        """Retry-After when the server sends one, else exponential backoff with full jitter"""
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_delay)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _slot_releaser(self, semaphore: asyncio.Semaphore) -> Callable[[], None]:
+        def release():
+            self.in_flight -= 1
+            semaphore.release()
+        return release
+
+    async def chat(self, **kwargs):
+        """
+        chat.completions.create with concurrency limit and retries
+        With stream=True the stream is returned once the request is accepted,
+        wrapped in a StreamSlot that keeps the concurrency slot until the
+        stream is fully read or closed
+        """
+        client = self.get_client()
+        semaphore = self._semaphore()
+        self.requests += 1
+
+        # Streams are accepted once headers arrive, so their span is time to first byte
+        with tracer.span("llm.chat", model=kwargs.get("model"), stream=bool(kwargs.get("stream"))) as span:
+            for attempt in range(self.max_retries + 1):
+                await semaphore.acquire()
+                self.in_flight += 1
+                release = self._slot_releaser(semaphore)
+                try:
+                    span.set_attribute("attempts", attempt + 1)
+                    response = await client.chat.completions.create(**kwargs)
+                except BaseException as e:
+                    release()
+                    if not isinstance(e, Exception):
+                        raise
+                    if attempt >= self.max_retries or not self._is_retryable(e):
+                        self.failures += 1
+                        LLM_ERRORS.inc(model=kwargs.get("model"), error=type(e).__name__)
+                        raise
+                    error_name, delay = type(e).__name__, self._retry_delay(attempt, e)
+                else:
+                    if kwargs.get("stream"):
+                        return StreamSlot(response, release)
+                    release()
+                    return response
+
+                self.retries += 1
+                LLM_RETRIES.inc(model=kwargs.get("model"))
+                print(f"🔁 LLM request failed ({error_name}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    # =============================================================================
+    # BACKGROUND LOOP (for sync callers)
+    # =============================================================================
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or not self._thread.is_alive():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name="llm-gateway-loop", daemon=True
+                )
+                self._thread.start()
+            return self._loop
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """
+        Run a coroutine on the gateway loop from synchronous code and wait for it
+        On timeout the coroutine is cancelled (freeing its concurrency slot) and TimeoutError is raised
+        """
+        future = asyncio.run_coroutine_threadsafe(tracer.bind(coro), self._ensure_loop())
+        try:
+            return future.result(timeout or self.run_timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            self.run_timeouts += 1
+            print(f"⏱️ LLM work cancelled after {timeout or self.run_timeout:.0f}s")
+            raise
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Request, retry and concurrency metrics"""
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "run_timeouts": self.run_timeouts,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "clients": len(self._clients),
+            "http2": self.http2,
+        }
+
+
+def create_llm_gateway():
+    """LLM backend selected by SASABOT_LLM_BACKEND (openai, or mock for offline runs)"""
+    if os.getenv("SASABOT_LLM_BACKEND", "openai").lower() == "mock":
+        from utils.mock_llm import MockLLM
+        print("🧪 Using the mock LLM backend (no OpenAI requests)")
+        return MockLLM()
+    return LLMGateway()
+
+
+# Global LLM gateway instance
+llm_gateway = create_llm_gateway()
+
+metrics.callback(
+    "sasabot_llm_in_flight", "LLM requests currently in flight", lambda: {(): llm_gateway.in_flight}
+)
@@ -0,0 +1,284 @@
+"""
+Metrics
+In-process counters, gauges and histograms rendered in the Prometheus text
+exposition format (version 0.0.4), without a client library dependency.
+
+The WhatsApp service serves them at /metrics on its Flask app; the Chainlit
+app starts a small side server (SASABOT_METRICS_PORT, default 9100, 0 to
+disable) since Chainlit owns its own HTTP routes.
+
+All series are declared at the bottom of this module so the full list is in
+one place; the instrumented modules import the ones they update. Values that
+already live in other components (cache hit counts, sessions, in-flight LLM
+requests) are read at scrape time through callbacks.
+"""
+
+import bisect
+import math
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, Optional, Sequence, Tuple
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+# =============================================================================
+# METRIC TYPES
+# =============================================================================
+
+class _Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    @abstractmethod
+    def samples(self) -> Iterator[str]:
+        """Exposition lines of every series of this metric"""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonic total, per label set"""
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    """Value that goes up and down, per label set"""
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Bucketed observations (cumulative buckets, sum and count), per label set"""
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, **labels) -> "_Timer":
+        """Context manager observing the elapsed seconds"""
+        return _Timer(self, labels)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = [(key, (list(s[0]), s[1], s[2])) for key, s in self._series.items()]
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.label_names, key)} {count}"
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class CallbackMetric(_Metric):
+    """Series read from another component at scrape time: fn() -> {label values: value}"""
+
+    def __init__(self, name: str, help_text: str, kind: str, fn: Callable[[], Dict[LabelValues, float]],
+                 labels: Sequence[str] = ()):
+        super().__init__(name, help_text, labels)
+        self.kind = kind
+        self.fn = fn
+
+    def samples(self) -> Iterator[str]:
+        try:
+            values = self.fn()
+        except Exception as e:
+            print(f"⚠️ Metric {self.name} could not be collected: {e}")
+            return
+        for key, value in values.items():
+            yield f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+
+
+# =============================================================================
+# REGISTRY
+# =============================================================================
+
+class MetricsRegistry:
+    """Named metrics of this process and their text exposition"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None and not isinstance(metric, CallbackMetric):
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labels))
+
+    def gauge(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def callback(self, name: str, help_text: str, fn: Callable[[], Dict[LabelValues, float]],
+                 labels: Sequence[str] = (), kind: str = "gauge"):
+        """Register (or replace) a series computed at scrape time"""
+        self._register(CallbackMetric(name, help_text, kind, fn, labels))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+    def serve(self, port: Optional[int] = None, host: str = "0.0.0.0") -> Optional[int]:
+        """Serve /metrics on a background thread (once per process); returns the port"""
+        port = int(os.getenv("SASABOT_METRICS_PORT", "9100")) if port is None else port
+        if not port or self._server is not None:
+            return None
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer((host, port), Handler)
+        except OSError as e:
+            print(f"⚠️ Metrics server not started on port {port}: {e}")
+            return None
+        threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True).start()
+        print(f"📈 Metrics available at http://{host}:{port}/metrics")
+        return port
+
+
+# Global metrics registry
+metrics = MetricsRegistry()
+
+
+# =============================================================================
+# SASABOT METRICS
+# =============================================================================
+
+LLM_REQUEST_SECONDS = metrics.histogram(
+    "sasabot_llm_request_seconds", "LLM completion latency (full response, streams included)", ["model"]
+)
+LLM_TOKENS = metrics.counter("sasabot_llm_tokens_total", "LLM tokens by model and kind", ["model", "kind"])
+LLM_ERRORS = metrics.counter("sasabot_llm_errors_total", "LLM requests that failed after retries", ["model", "error"])
+LLM_RETRIES = metrics.counter("sasabot_llm_retries_total", "LLM request retries", ["model"])
+
+TOOL_SECONDS = metrics.histogram("sasabot_tool_seconds", "Tool handler duration", ["tool"])
+TOOL_CALLS = metrics.counter("sasabot_tool_calls_total", "Tool calls by outcome (ok, failed, invalid, error, or speculative for prefetches)", ["tool", "outcome"])
+
+DB_SECONDS = metrics.histogram("sasabot_db_seconds", "JSON database read/write duration", ["op", "collection"])
+DB_BYTES = metrics.counter("sasabot_db_bytes_total", "JSON database bytes read/written", ["op", "collection"])
+
+WEBHOOK_IN_PROGRESS = metrics.gauge(
+    "sasabot_webhook_messages_in_progress", "WhatsApp messages received and not yet answered"
+)
+WEBHOOK_IN_PROGRESS.set(0)
+WHATSAPP_SEND_SECONDS = metrics.histogram(
+    "sasabot_whatsapp_send_seconds", "WhatsApp Graph API send latency", ["status"]
+)
+
+VOICE_RESPONSE_SECONDS = metrics.histogram(
+    "sasabot_voice_response_seconds", "Voice mode: end of the user's speech to the first audio of the reply"
+)
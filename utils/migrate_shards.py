@@ -0,0 +1,109 @@
+"""
+Shard Migration Tool
+Splits data/products.json and data/orders.json into per-business shards
+(data/<business_id>/products.json, data/<business_id>/orders.json) and back.
+
+Usage:
+    python -m utils.migrate_shards            # split flat files into shards
+    python -m utils.migrate_shards --merge    # merge shards back into flat files
+    python -m utils.migrate_shards --data-dir path/to/data
+"""
+
+import argparse
+import shutil
+from datetime import datetime
+from typing import Dict
+
+from utils.simple_db import (
+    JSONDatabase, SHARDED_COLLECTIONS, SHARD_MANIFEST, UNASSIGNED_SHARD
+)
+
+
+def migrate_to_shards(database: JSONDatabase) -> Dict[str, int]:
+    """
+    Split the flat collections into business shards
+    The flat files are moved to backups/ so they can't be read by mistake
+    """
+    if database.is_sharded():
+        print("ℹ️ Data is already sharded, nothing to do")
+        return {}
+
+    counts = {}
+    groups = {}
+    for collection in SHARDED_COLLECTIONS:
+        records = database.load_json(collection)
+        counts[collection] = len(records)
+        for record in records:
+            shard_id = record.get('business_id') or UNASSIGNED_SHARD
+            groups.setdefault(shard_id, {c: [] for c in SHARDED_COLLECTIONS})[collection].append(record)
+
+    # Every known business gets a shard, even before its first product
+    for business_id in database.get_businesses():
+        groups.setdefault(business_id, {c: [] for c in SHARDED_COLLECTIONS})
+
+    # Write shard files before the manifest so a crash leaves the flat layout active
+    for shard_id, collections in groups.items():
+        for collection, records in collections.items():
+            filename = database._shard_filename(collection, shard_id)
+            database._get_file_path(filename).parent.mkdir(exist_ok=True)
+            database.save_json(filename, records, create_backup=False)
+
+    database.save_json(SHARD_MANIFEST, {
+        "version": 1,
+        "businesses": sorted(groups),
+        "migrated_at": datetime.now().isoformat()
+    }, create_backup=False)
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    for collection in SHARDED_COLLECTIONS:
+        flat_file = database._get_file_path(collection)
+        if flat_file.exists():
+            shutil.move(str(flat_file), str(database.backup_dir / f"{collection}_pre_shard_{timestamp}.json"))
+
+    database._shard_index = {}
+    print(f"✅ Split {counts} into {len(groups)} business shards")
+    return counts
+
+
+def merge_shards(database: JSONDatabase) -> Dict[str, int]:
+    """Merge business shards back into flat products.json / orders.json"""
+    if not database.is_sharded():
+        print("ℹ️ Data is not sharded, nothing to do")
+        return {}
+
+    counts = {}
+    merged = {collection: database._load_all_shards(collection) for collection in SHARDED_COLLECTIONS}
+    shard_ids = database._shard_ids()
+
+    # Remove the manifest first so the flat files become the source of truth
+    database._get_file_path(SHARD_MANIFEST).unlink()
+    for collection, records in merged.items():
+        database.save_json(collection, records, create_backup=False)
+        counts[collection] = len(records)
+
+    for shard_id in shard_ids:
+        for collection in SHARDED_COLLECTIONS:
+            shard_file = database._get_file_path(database._shard_filename(collection, shard_id))
+            if shard_file.exists():
+                shard_file.unlink()
+        shard_dir = database.data_dir / shard_id
+        if shard_dir.exists() and not any(shard_dir.iterdir()):
+            shard_dir.rmdir()
+
+    database._shard_index = {}
+    print(f"✅ Merged {len(shard_ids)} shards back into flat files: {counts}")
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split or merge per-business data shards")
+    parser.add_argument("--data-dir", default="data", help="Data directory (default: data)")
+    parser.add_argument("--merge", action="store_true", help="Merge shards back into flat files")
+    args = parser.parse_args()
+
+    database = JSONDatabase(args.data_dir)
+    print(f"💾 Backup before migration: {database.create_full_backup()}")
+    if args.merge:
+        merge_shards(database)
+    else:
+        migrate_to_shards(database)
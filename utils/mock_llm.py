@@ -0,0 +1,197 @@
+"""
+Mock LLM
+Offline stand-in for the LLM gateway: answers chat completions with scripted
+replies and tool calls after a configurable delay, so the non-LLM part of the
+pipeline can be measured and exercised without OpenAI.
+
+Enable with SASABOT_LLM_BACKEND=mock. Replies come from, in order:
+- queued script entries (MockLLM.script(...) or a JSON list in SASABOT_MOCK_LLM_SCRIPT)
+- keyword rules that pick one of the offered tools for the last user message
+- a fixed text reply
+
+A script entry is {"content": "..."} or {"tool_calls": [{"name": ..., "arguments": {...}}]},
+or a callable taking the request kwargs and returning one of those.
+
+Latency: SASABOT_MOCK_LLM_LATENCY_MS per request (time to first token) plus
+SASABOT_MOCK_LLM_TOKEN_MS per completion token, with ±SASABOT_MOCK_LLM_JITTER.
+"""
+
+import asyncio
+import json
+import os
+import random
+import re
+from collections import deque
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from utils.prompt_budget import count_tokens, message_tokens
+from utils.tracing import tracer
+
+
+ScriptEntry = Union[Dict[str, Any], Callable[[Dict[str, Any]], Dict[str, Any]]]
+
+# (pattern on the user message, tool, arguments from the match); first offered tool wins
+TOOL_RULES = [
+    (re.compile(r"\b(ORD\d+)\b", re.IGNORECASE), "get_order_status",
+     lambda m, text: {"order_id": m.group(1).upper()}),
+    (re.compile(r"\b(PAY\d+)\b", re.IGNORECASE), "check_payment_status",
+     lambda m, text: {"payment_id": m.group(1).upper()}),
+    (re.compile(r"low stock|running out|restock", re.IGNORECASE), "get_low_stock_products",
+     lambda m, text: {}),
+    (re.compile(r"\b(sales|analytics|revenue|report)\b", re.IGNORECASE), "get_sales_analytics",
+     lambda m, text: {"period": "weekly"}),
+    (re.compile(r"\b(my|show|list) (products|inventory|stock)\b", re.IGNORECASE), "show_products",
+     lambda m, text: {}),
+    (re.compile(r"\b(catalog|browse|what do you (sell|have))\b", re.IGNORECASE), "browse_products",
+     lambda m, text: {}),
+    (re.compile(r"\b(price|bei|how much|looking for|do you have|search|find|buy|una|iko)\b", re.IGNORECASE),
+     "search_products", lambda m, text: {"query": text[:100]}),
+]
+
+DEFAULT_REPLY = "Karibu! I can help you find products, check orders and manage payments. What do you need?"
+
+
+def _tool_names(tools: Optional[List[Dict]]) -> set:
+    return {tool["function"]["name"] for tool in tools or []}
+
+
+def plan_reply(messages: List[Dict[str, Any]], tools: Optional[List[Dict]] = None) -> Dict[str, Any]:
+    """
+    Rule-based reply for a request: a tool call when the last user message
+    matches an offered tool, a short summary after tool results, else text
+    """
+    last = messages[-1] if messages else {}
+    if last.get("role") == "tool":
+        results = [m.get("content") or "" for m in messages if m.get("role") == "tool"]
+        return {"content": "Here is what I found:\n" + "\n".join(r[:200] for r in results[-3:])}
+
+    text = last.get("content") or ""
+    offered = _tool_names(tools)
+    for pattern, tool_name, arguments in TOOL_RULES:
+        match = pattern.search(text)
+        if match and tool_name in offered:
+            return {"tool_calls": [{"name": tool_name, "arguments": arguments(match, text)}]}
+    return {"content": DEFAULT_REPLY}
+
+
+class MockLLM:
+    """Drop-in for LLMGateway (chat / run / get_stats) that never leaves the process"""
+
+    def __init__(self, latency_ms: Optional[float] = None, token_ms: Optional[float] = None,
+                 jitter: Optional[float] = None, seed: Optional[int] = None):
+        self.latency_ms = latency_ms if latency_ms is not None else float(os.getenv("SASABOT_MOCK_LLM_LATENCY_MS", "0"))
+        self.token_ms = token_ms if token_ms is not None else float(os.getenv("SASABOT_MOCK_LLM_TOKEN_MS", "0"))
+        self.jitter = jitter if jitter is not None else float(os.getenv("SASABOT_MOCK_LLM_JITTER", "0.1"))
+        self._random = random.Random(seed)
+        self._script: deque = deque()
+
+        script_path = os.getenv("SASABOT_MOCK_LLM_SCRIPT")
+        if script_path:
+            with open(script_path, "r", encoding="utf-8") as f:
+                self.script(*json.load(f))
+
+        # Metrics
+        self.requests = 0
+        self.scripted = 0
+        self.tool_call_replies = 0
+        self.in_flight = 0
+        self.calls: deque = deque(maxlen=100)
+
+    def script(self, *entries: ScriptEntry):
+        """Queue replies to return, in order, before falling back to the rules"""
+        self._script.extend(entries)
+
+    def _next_reply(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        if self._script:
+            self.scripted += 1
+            entry = self._script.popleft()
+            return entry(kwargs) if callable(entry) else entry
+        return plan_reply(kwargs.get("messages", []), kwargs.get("tools"))
+
+    def _delay(self, milliseconds: float) -> float:
+        if milliseconds <= 0:
+            return 0.0
+        spread = milliseconds * self.jitter
+        return max(0.0, milliseconds + self._random.uniform(-spread, spread)) / 1000
+
+    # =============================================================================
+    # RESPONSE OBJECTS (shaped like the openai client's)
+    # =============================================================================
+
+    @staticmethod
+    def _tool_calls(reply: Dict[str, Any]) -> List[SimpleNamespace]:
+        return [
+            SimpleNamespace(
+                id=f"call_mock_{i}",
+                type="function",
+                function=SimpleNamespace(name=call["name"], arguments=json.dumps(call.get("arguments", {})))
+            )
+            for i, call in enumerate(reply.get("tool_calls") or [])
+        ]
+
+    def _completion_tokens(self, reply: Dict[str, Any], tool_calls: List[SimpleNamespace]) -> int:
+        return count_tokens(reply.get("content")) + sum(
+            count_tokens(call.function.name) + count_tokens(call.function.arguments) for call in tool_calls
+        )
+
+    async def _stream(self, reply: Dict[str, Any], tool_calls: List[SimpleNamespace]):
+        content = reply.get("content") or ""
+        words = re.findall(r"\S+\s*", content)
+        for word in words:
+            await asyncio.sleep(self._delay(self.token_ms))
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word, tool_calls=None))])
+        for index, call in enumerate(tool_calls):
+            delta = SimpleNamespace(index=index, id=call.id, function=call.function)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=None, tool_calls=[delta]))])
+
+    # =============================================================================
+    # GATEWAY INTERFACE
+    # =============================================================================
+
+    @tracer.traced("llm.chat")
+    async def chat(self, **kwargs):
+        """chat.completions.create stand-in (supports stream=True)"""
+        self.requests += 1
+        self.in_flight += 1
+        tracer.annotate(model=kwargs.get("model"), stream=bool(kwargs.get("stream")), backend="mock")
+        try:
+            reply = self._next_reply(kwargs)
+            tool_calls = self._tool_calls(reply)
+            if tool_calls:
+                self.tool_call_replies += 1
+            self.calls.append({"model": kwargs.get("model"), "tools": len(kwargs.get("tools") or []),
+                               "tool_calls": [c.function.name for c in tool_calls]})
+
+            await asyncio.sleep(self._delay(self.latency_ms))
+            if kwargs.get("stream"):
+                return self._stream(reply, tool_calls)
+
+            completion_tokens = self._completion_tokens(reply, tool_calls)
+            await asyncio.sleep(self._delay(self.token_ms * completion_tokens))
+            message = SimpleNamespace(role="assistant", content=reply.get("content"), tool_calls=tool_calls or None)
+            return SimpleNamespace(
+                choices=[SimpleNamespace(message=message, finish_reason="tool_calls" if tool_calls else "stop")],
+                usage=SimpleNamespace(
+                    prompt_tokens=sum(message_tokens(m) for m in kwargs.get("messages", [])),
+                    completion_tokens=completion_tokens,
+                ),
+            )
+        finally:
+            self.in_flight -= 1
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """Run a coroutine from synchronous code (no connections to keep, so a fresh loop is fine)"""
+        return asyncio.run(asyncio.wait_for(coro, timeout))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Request metrics"""
+        return {
+            "backend": "mock",
+            "requests": self.requests,
+            "scripted": self.scripted,
+            "tool_call_replies": self.tool_call_replies,
+            "in_flight": self.in_flight,
+            "latency_ms": self.latency_ms,
+            "token_ms": self.token_ms,
+        }
@@ -0,0 +1,153 @@
+"""
+Model Router
+Picks the model for each LLM call from the detected intent, prompt size and
+tool involvement: greetings, lookups and verbalizing tool output go to a small
+model, while product/order changes, analytics and long prompts go to a large one.
+
+Tiers are configured with environment variables:
+    SASABOT_MODEL_SMALL   (default gpt-4o-mini)
+    SASABOT_MODEL_LARGE   (default gpt-4)
+    SASABOT_MODEL_ROUTING=false   use the large tier for everything
+"""
+
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.metrics import LLM_REQUEST_SECONDS, LLM_TOKENS
+
+
+SMALL = "small"
+LARGE = "large"
+
+# USD per 1M tokens (input, output); unknown models are counted as free
+MODEL_PRICES = {
+    "gpt-4": (30.0, 60.0),
+    "gpt-4-turbo": (10.0, 30.0),
+    "gpt-4o": (2.5, 10.0),
+    "gpt-4o-mini": (0.15, 0.6),
+    "gpt-3.5-turbo": (0.5, 1.5),
+}
+
+# Intents (from parse_user_intent) whose tool arguments or reasoning need the large model
+LARGE_INTENTS = {
+    "add_product", "update_product", "delete_product", "generate_report",
+    "buy_product", "add_to_cart",
+}
+
+# Tools whose results need real narration, not just re-wording
+LARGE_FOLLOW_UP_TOOLS = {"get_enhanced_business_stats", "get_business_stats", "get_sales_analytics"}
+
+SMALL_MAX_PROMPT_TOKENS = int(os.getenv("SASABOT_MODEL_SMALL_MAX_PROMPT_TOKENS", "6000"))
+SMALL_MAX_GENERAL_WORDS = 25
+
+
+class ModelRouter:
+    """Chooses a model tier per call and accounts latency/cost per tier"""
+
+    def __init__(self):
+        self.tiers = {
+            SMALL: os.getenv("SASABOT_MODEL_SMALL", "gpt-4o-mini"),
+            LARGE: os.getenv("SASABOT_MODEL_LARGE", "gpt-4"),
+        }
+        self.enabled = os.getenv("SASABOT_MODEL_ROUTING", "true").lower() != "false"
+        self.stats: Dict[str, Dict[str, float]] = {
+            tier: {"calls": 0, "latency_ms": 0.0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0}
+            for tier in self.tiers
+        }
+        self.escalations = 0
+
+    def model(self, tier: str) -> str:
+        """Model name for a tier"""
+        return self.tiers[tier]
+
+    def choose(self, purpose: str, intent: Optional[str] = None, message: str = "",
+               prompt_tokens: int = 0, tool_names: Optional[List[str]] = None,
+               tool_results: Optional[List[Any]] = None) -> str:
+        """
+        Tier for one call
+        purpose: "turn" (may call tools), "follow_up" (verbalize tool results) or "chat" (no tools)
+        """
+        if not self.enabled or prompt_tokens > SMALL_MAX_PROMPT_TOKENS:
+            return LARGE
+
+        if purpose == "follow_up":
+            if set(tool_names or []) & LARGE_FOLLOW_UP_TOOLS:
+                return LARGE
+            # Disambiguating a product that wasn't found means reasoning over the catalog
+            if any(isinstance(r, dict) and r.get("error_type") == "product_not_found" for r in tool_results or []):
+                return LARGE
+            return SMALL
+
+        if intent in LARGE_INTENTS:
+            return LARGE
+        if intent in (None, "general_conversation") and len(message.split()) > SMALL_MAX_GENERAL_WORDS:
+            return LARGE
+        return SMALL
+
+    @staticmethod
+    def invalid_tool_calls(tool_calls, tools: List[Dict],
+                           check: Callable[[str, Optional[str]], List[str]]) -> List[str]:
+        """
+        Problems with the tool calls a model produced: functions not offered
+        this turn, or arguments check(name, raw_arguments) rejects
+        check is the dispatcher's validator (ToolDispatcher.check), so a call
+        escalates exactly when dispatch would reject it
+        """
+        offered = {tool["function"]["name"] for tool in tools}
+        problems = []
+        for call in tool_calls or []:
+            name = call.function.name
+            if name not in offered:
+                problems.append(f"unknown function {name}")
+                continue
+            problems.extend(f"{name}: {problem}" for problem in check(name, call.function.arguments))
+        return problems
+
+    def record(self, tier: str, started: float, prompt_tokens: int = 0, completion_tokens: int = 0):
+        """Account one finished call (started is a time.perf_counter() value)"""
+        stats = self.stats[tier]
+        input_price, output_price = MODEL_PRICES.get(self.tiers[tier], (0.0, 0.0))
+        stats["calls"] += 1
+        stats["latency_ms"] += (time.perf_counter() - started) * 1000
+        stats["prompt_tokens"] += prompt_tokens
+        stats["completion_tokens"] += completion_tokens
+        stats["cost_usd"] += (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+        model = self.tiers[tier]
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, model=model)
+        LLM_TOKENS.inc(prompt_tokens, model=model, kind="prompt")
+        LLM_TOKENS.inc(completion_tokens, model=model, kind="completion")
+
+    def record_response(self, tier: str, started: float, response, estimated_prompt_tokens: int = 0):
+        """Account a non-streaming response, using its reported usage when present"""
+        usage = getattr(response, "usage", None)
+        self.record(
+            tier, started,
+            prompt_tokens=getattr(usage, "prompt_tokens", None) or estimated_prompt_tokens,
+            completion_tokens=getattr(usage, "completion_tokens", None) or 0,
+        )
+
+    def escalate(self, reason: str):
+        """Note a small-model result that had to be redone on the large tier"""
+        self.escalations += 1
+        print(f"⬆️ Escalating to {self.tiers[LARGE]}: {reason}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-tier call counts, average latency, tokens and cost"""
+        tiers = {}
+        for tier, stats in self.stats.items():
+            calls = stats["calls"]
+            tiers[tier] = {
+                "model": self.tiers[tier],
+                "calls": int(calls),
+                "avg_latency_ms": round(stats["latency_ms"] / calls, 1) if calls else 0.0,
+                "prompt_tokens": int(stats["prompt_tokens"]),
+                "completion_tokens": int(stats["completion_tokens"]),
+                "cost_usd": round(stats["cost_usd"], 4),
+            }
+        return {"tiers": tiers, "escalations": self.escalations}
+
+
+# Global model router instance
+model_router = ModelRouter()
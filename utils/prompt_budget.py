@@ -0,0 +1,240 @@
+"""
+Prompt Budget
+Measures every part of an LLM prompt in tokens and compacts the parts that
+grow with usage (conversation history, tool results, catalog context) so
+prompt size follows the question instead of the catalog.
+
+Uses tiktoken when installed, otherwise a ~4 characters per token estimate.
+"""
+
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+# Budgets in tokens (override with SASABOT_PROMPT_BUDGET_* env vars)
+HISTORY_BUDGET = int(os.getenv("SASABOT_PROMPT_BUDGET_HISTORY", "900"))
+TOOL_RESULT_BUDGET = int(os.getenv("SASABOT_PROMPT_BUDGET_TOOL_RESULT", "700"))
+HISTORY_MESSAGE_BUDGET = 200
+MAX_HISTORY_EXCHANGES = 5
+MAX_CONTEXT_PRODUCTS = int(os.getenv("SASABOT_PROMPT_MAX_PRODUCTS", "5"))
+MAX_STRING_CHARS = 400
+
+# Fields the model needs to talk about a product
+PRODUCT_FIELDS = ("id", "name", "brand", "price", "stock", "category", "warranty")
+
+# Keys that duplicate information already present in the same result
+REDUNDANT_KEYS = {"formatted_products", "quick_reference", "display", "created_at", "updated_at"}
+
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+# =============================================================================
+# TOKEN COUNTING
+# =============================================================================
+
+_encoding = None
+
+
+def count_tokens(text: Optional[str]) -> int:
+    """Token count for a piece of text"""
+    global _encoding
+    if not text:
+        return 0
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def message_tokens(message: Dict[str, Any]) -> int:
+    """Token count for one chat message, including tool calls"""
+    tokens = MESSAGE_OVERHEAD_TOKENS + count_tokens(message.get("content"))
+    for call in message.get("tool_calls") or []:
+        function = call.get("function", {})
+        tokens += count_tokens(function.get("name")) + count_tokens(function.get("arguments"))
+    return tokens
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text down to roughly max_tokens, marking the cut"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    if tiktoken is not None:
+        return _encoding.decode(_encoding.encode(text)[:max_tokens]) + " …"
+    return text[:max_tokens * 4] + " …"
+
+
+# =============================================================================
+# COMPACTION
+# =============================================================================
+
+def _words(text: str) -> set:
+    return set(re.findall(r"[a-z0-9]+", str(text).lower()))
+
+
+def rank_products(products: List[Dict], query: str = "", k: int = MAX_CONTEXT_PRODUCTS) -> List[Dict]:
+    """Top-k products most relevant to the query (catalog order when there is no query)"""
+    if not query:
+        return products[:k]
+
+    query_words = _words(query)
+    query_text = query.lower()
+
+    def score(product: Dict) -> float:
+        text = f"{product.get('brand', '')} {product.get('name', '')} {product.get('category', '')}"
+        overlap = len(query_words & _words(text))
+        # Partial matches ("iphone14" vs "iPhone 13") still count for something
+        partial = sum(1 for word in _words(product.get('name', '')) if len(word) > 2 and word in query_text)
+        return overlap * 2 + partial
+
+    ranked = sorted(enumerate(products), key=lambda item: (-score(item[1]), item[0]))
+    return [product for _, product in ranked[:k]]
+
+
+def compact_product(product: Dict) -> Dict:
+    """Only the product fields the model needs"""
+    return {key: product[key] for key in PRODUCT_FIELDS if product.get(key) not in (None, "")}
+
+
+def _looks_like_product(value: Any) -> bool:
+    return isinstance(value, dict) and "id" in value and "name" in value and "price" in value
+
+
+def compact_value(value: Any, query: str = "", k: int = MAX_CONTEXT_PRODUCTS) -> Any:
+    """Recursively drop empty/redundant fields, cap product lists and long strings"""
+    if isinstance(value, dict):
+        if _looks_like_product(value):
+            return compact_product(value)
+        compacted = {}
+        for key, item in value.items():
+            if key in REDUNDANT_KEYS or item in (None, "", [], {}):
+                continue
+            compacted[key] = compact_value(item, query, k)
+        return compacted
+
+    if isinstance(value, list):
+        if value and all(_looks_like_product(item) for item in value):
+            top = [compact_product(p) for p in rank_products(value, query, k)]
+            if len(value) > len(top):
+                top.append({"more_products": len(value) - len(top)})
+            return top
+        return [compact_value(item, query, k) for item in value[:max(k * 2, 10)]]
+
+    if isinstance(value, str) and len(value) > MAX_STRING_CHARS:
+        return value[:MAX_STRING_CHARS] + " …"
+
+    return value
+
+
+def compact_tool_result(result: Any, query: str = "", max_tokens: int = TOOL_RESULT_BUDGET) -> str:
+    """
+    Serialize a tool result for the follow-up prompt
+    Dicts are compacted and dumped without indentation; text results are truncated
+    """
+    if isinstance(result, str):
+        return truncate_to_tokens(result, max_tokens)
+
+    if isinstance(result, dict):
+        context = result.get("context") or {}
+        query = query or context.get("user_input", "")
+
+    payload = json.dumps(compact_value(result, query), default=str, separators=(",", ":"), ensure_ascii=False)
+    return truncate_to_tokens(payload, max_tokens)
+
+
+def catalog_context(products: List[Dict], query: str = "", k: int = MAX_CONTEXT_PRODUCTS) -> str:
+    """One compact line per relevant product for a system prompt"""
+    lines = []
+    for product in rank_products(products, query, k):
+        line = f"- ID {product.get('id')}: {product.get('name', '')}"
+        if product.get('brand'):
+            line += f" ({product['brand']})"
+        line += f", KSh {product.get('price', 0):,}, {product.get('stock', 0)} in stock"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def trim_history(exchanges: List[Dict], budget: int = HISTORY_BUDGET,
+                 max_exchanges: int = MAX_HISTORY_EXCHANGES) -> List[Dict[str, str]]:
+    """
+    Most recent exchanges that fit the budget, as user/assistant messages
+    Long replies (product listings, reports) are truncated first
+    """
+    messages: List[Dict[str, str]] = []
+    used = 0
+    for exchange in reversed(exchanges[-max_exchanges:]):
+        user = truncate_to_tokens(exchange.get("user_message", ""), HISTORY_MESSAGE_BUDGET)
+        assistant = truncate_to_tokens(exchange.get("ai_response", "") or "", HISTORY_MESSAGE_BUDGET)
+        cost = count_tokens(user) + count_tokens(assistant) + 2 * MESSAGE_OVERHEAD_TOKENS
+        if used + cost > budget:
+            break
+        used += cost
+        messages[:0] = [{"role": "user", "content": user}, {"role": "assistant", "content": assistant}]
+    return messages
+
+
+# =============================================================================
+# PER-TURN ACCOUNTING
+# =============================================================================
+
+class PromptBudget:
+    """Logs the token breakdown of every prompt and keeps running totals"""
+
+    def __init__(self):
+        self.verbose = os.getenv("SASABOT_LOG_PROMPT_TOKENS", "true").lower() != "false"
+        self.calls = 0
+        self.total_tokens = 0
+        self.max_tokens = 0
+        self.by_label: Dict[str, int] = {}
+
+    def measure(self, messages: List[Dict[str, Any]], tools: Optional[List[Dict]] = None,
+                tool_tokens: Optional[int] = None) -> Dict[str, int]:
+        """Token breakdown of a prompt by message role (plus tool schemas, pre-measured when given)"""
+        breakdown: Dict[str, int] = {}
+        for message in messages:
+            role = message.get("role", "unknown")
+            breakdown[role] = breakdown.get(role, 0) + message_tokens(message)
+        if tool_tokens is None and tools:
+            tool_tokens = count_tokens(json.dumps(tools, separators=(",", ":")))
+        if tool_tokens:
+            breakdown["tool_schemas"] = tool_tokens
+        breakdown["total"] = sum(breakdown.values())
+        return breakdown
+
+    def log(self, label: str, messages: List[Dict[str, Any]], tools: Optional[List[Dict]] = None,
+            tool_tokens: Optional[int] = None) -> Dict[str, int]:
+        """Measure a prompt about to be sent and record it"""
+        breakdown = self.measure(messages, tools, tool_tokens)
+        total = breakdown["total"]
+
+        self.calls += 1
+        self.total_tokens += total
+        self.max_tokens = max(self.max_tokens, total)
+        self.by_label[label] = self.by_label.get(label, 0) + total
+
+        if self.verbose:
+            parts = ", ".join(f"{role}={tokens}" for role, tokens in breakdown.items() if role != "total")
+            print(f"🧮 Prompt [{label}]: {total} tokens ({parts})")
+        return breakdown
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Running prompt size statistics"""
+        return {
+            "calls": self.calls,
+            "avg_tokens": round(self.total_tokens / self.calls, 1) if self.calls else 0.0,
+            "max_tokens": self.max_tokens,
+            "tokens_by_label": dict(self.by_label),
+            "estimator": "tiktoken" if tiktoken is not None else "chars/4",
+        }
+
+
+# Global prompt budget instance
+prompt_budget = PromptBudget()
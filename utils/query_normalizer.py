@@ -0,0 +1,209 @@
+"""
+Query Normalizer
+Maps Swahili/Sheng shopping phrases to English before intent parsing and search
+so keyword checks match mixed-language messages like "Hii mug ni bei gani?"
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, List
+
+
+# Emails, then numbers with their separators, sign and unit ("1,500", "2.5",
+# "1.5l", "20k", "+254712345678") as single tokens, then words, then punctuation
+TOKEN_PATTERN = re.compile(
+    r"[a-z0-9._%+-]+@[a-z0-9-]+(?:\.[a-z0-9-]+)+"
+    r"|\+?\d+(?:[.,]\d+)*[a-z]*"
+    r"|[a-z0-9']+"
+    r"|[^\sa-z0-9']"
+)
+
+# Phrase lexicon (Swahili/Sheng -> English). Multi-word entries win over
+# single words, so "bei gani" becomes "how much" rather than "price which".
+# Single words that are also English or brand words ("moto", "ya", "na", "ni",
+# "dope") only appear inside phrases, so "moto g" or "ya sure" pass unchanged.
+LEXICON: Dict[str, str] = {
+    # Prices
+    "ni bei gani": "how much",
+    "bei gani": "how much",
+    "ni how much": "how much",
+    "pesa ngapi": "how much",
+    "ni ngapi": "how much",
+    "bei rahisi": "cheap",
+    "bei ghali": "expensive",
+    "punguza bei": "discount",
+    "bei": "price",
+    "ngapi": "how many",
+
+    # Hot/cold, water
+    "maji ya moto": "hot water",
+    "maji baridi": "cold water",
+    "maji": "water",
+    "ya moto": "hot",
+    "baridi": "cold",
+    "inakam": "keeps",
+    "inakaa": "keeps",
+    "inaweza kuweka": "can keep",
+    "kuweka": "keep",
+    "ni true": "is it true",
+
+    # Wanting, looking, selling
+    "nataka kununua": "i want to buy",
+    "nataka kuagiza": "i want to order",
+    "nataka": "i want",
+    "natafuta": "looking for",
+    "tafuta": "search",
+    "unauza": "do you sell",
+    "mnauza": "do you sell",
+    "uko na": "do you have",
+    "mko na": "do you have",
+    "aina gani": "what types",
+    "za aina gani": "what types",
+    "nunua": "buy",
+    "kununua": "buy",
+    "agiza": "order",
+    "oda yangu": "my order",
+    "order yangu": "my order",
+    "oda": "order",
+    "iko wapi": "where is",
+
+    # Products
+    "chupa": "bottle",
+    "kikombe": "mug",
+    "vikombe": "mugs",
+    "simu": "phone",
+    "bidhaa": "products",
+    "onyesha": "show",
+    "nionyeshe": "show me",
+
+    # Descriptions
+    "ya form": "nice",
+    "ya dope": "nice",
+    "nzuri": "nice",
+    "ya zawadi": "as a gift",
+    "zawadi": "gift",
+
+    # Personalization
+    "chora jina": "engrave name",
+    "kuniwekea jina": "customize with name",
+    "jina": "name",
+
+    # Help and greetings
+    "uneza saidia": "can you help",
+    "unaweza saidia": "can you help",
+    "nisaidie": "help me",
+    "mnaweza": "can you",
+    "unaweza": "can you",
+    "uneza": "can you",
+    "saidia": "help",
+    "niaje": "hi",
+    "aje": "hi",
+    "mambo": "hi",
+    "habari": "hello",
+    "asante": "thanks",
+
+    # Payments
+    "kulipa": "pay",
+    "lipa": "pay",
+    "malipo": "payment",
+
+    # Vendor phrases
+    "ripoti": "report",
+    "mauzo": "sales",
+    "ongeza": "add",
+    "futa": "delete",
+    "badilisha": "change",
+
+    # Function words
+    "hii": "this",
+    "hizi": "these",
+    "yangu": "my",
+    "kwa": "for",
+    "za": "of",
+}
+
+_END = "__end__"
+
+
+def _build_trie(lexicon: Dict[str, str]) -> Dict:
+    """Compile the phrase lexicon into a token trie"""
+    trie: Dict = {}
+    for phrase, replacement in lexicon.items():
+        node = trie
+        for token in phrase.split():
+            node = node.setdefault(token, {})
+        node[_END] = replacement
+    return trie
+
+
+def stem(token: str) -> str:
+    """
+    Light plural stemmer ("bottles" -> "bottle")
+    Only strips a trailing 's' so the stem stays a prefix of the original word,
+    which keeps substring matching against product names working
+    """
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is", "'s")):
+        return token[:-1]
+    return token
+
+
+class QueryNormalizer:
+    """Longest-match phrase translation over a precompiled token trie"""
+
+    def __init__(self, lexicon: Dict[str, str] = None):
+        self.lexicon = dict(lexicon or LEXICON)
+        self._trie = _build_trie(self.lexicon)
+        self.normalize = lru_cache(maxsize=4096)(self._normalize)
+
+    def add_phrases(self, phrases: Dict[str, str]):
+        """Extend the lexicon at runtime (recompiles the trie)"""
+        self.lexicon.update({k.lower(): v for k, v in phrases.items()})
+        self._trie = _build_trie(self.lexicon)
+        self.normalize.cache_clear()
+
+    def _translate(self, tokens: List[str]) -> List[str]:
+        output = []
+        i = 0
+        while i < len(tokens):
+            node = self._trie
+            match, match_end = None, i
+            j = i
+            while j < len(tokens) and tokens[j] in node:
+                node = node[tokens[j]]
+                j += 1
+                if _END in node:
+                    match, match_end = node[_END], j
+            if match is not None:
+                output.append(match)
+                i = match_end
+            else:
+                output.append(tokens[i])
+                i += 1
+        return output
+
+    def _normalize(self, text: str, stem_words: bool = False) -> str:
+        """
+        Normalize a message to lowercase English keywords
+        Punctuation is kept so downstream parsers still see sentence shape
+        """
+        if not text:
+            return ""
+
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        words = self._translate(tokens)
+        if stem_words:
+            words = [" ".join(stem(w) for w in word.split()) for word in words]
+
+        normalized = " ".join(words)
+        # Re-attach punctuation to the preceding word and rejoin "wi-fi", "1/2"
+        normalized = re.sub(r" ([?.!,;:])", r"\1", normalized)
+        return re.sub(r" ([-/]) ", r"\1", normalized).strip()
+
+
+# Global normalizer instance
+normalizer = QueryNormalizer()
+
+
+def normalize_query(text: str, stem_words: bool = False) -> str:
+    """Normalize a user message or search query (cached)"""
+    return normalizer.normalize(text, stem_words)
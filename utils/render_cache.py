@@ -0,0 +1,200 @@
+"""
+Rendered Product Card Cache
+Caches per-product display fragments so listings are built by joining strings
+instead of re-formatting every product on every request
+"""
+
+import hashlib
+import json
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Dict, Optional
+
+from utils.metrics import metrics
+
+
+CHANNELS = ("chainlit", "whatsapp")
+
+
+# =============================================================================
+# CARD TEMPLATES (chainlit markdown)
+# =============================================================================
+
+def _render_display(product: Dict) -> str:
+    """Standardized one-line product display with prominent ID"""
+    try:
+        name = product.get('name', 'Unknown Product')
+        price = product.get('price', 0)
+        stock = product.get('stock', 0)
+        product_id = product.get('id', 'N/A')
+        brand = product.get('brand', '')
+        category = product.get('category', '')
+
+        display = f"🆔 **ID: {product_id}**"
+
+        if brand:
+            display += f" | 🏷️ {brand} {name}"
+        else:
+            display += f" | 📱 {name}"
+
+        display += f" | 💰 KSh {price:,}"
+        display += f" | 📦 {stock} in stock"
+
+        if category:
+            display += f" | 📂 {category}"
+
+        return display
+    except Exception:
+        return f"🆔 **ID: {product.get('id', 'Unknown')}** | {product.get('name', 'Unknown Product')}"
+
+
+def _render_browse(product: Dict) -> str:
+    """Product card used by browse_products"""
+    name = product.get('name', 'Unknown Product')
+    price = product.get('price', 0)
+    stock = product.get('stock', 0)
+    brand = product.get('brand', '')
+    warranty = product.get('warranty', '')
+
+    card = f"   🔹 **{name}**"
+    if brand:
+        card += f" ({brand})"
+    card += f"\n      💰 KSh {price:,}"
+    card += f" | 📦 {stock} in stock"
+    if warranty:
+        card += f" | 🛡️ {warranty} warranty"
+    card += f"\n      🆔 Product ID: {product.get('id', 'N/A')}\n"
+
+    # Add description if available, truncating long ones
+    description = product.get('description', '')
+    if description:
+        if len(description) > 80:
+            description = description[:77] + "..."
+        card += f"      📝 {description}\n"
+
+    return card + "\n"
+
+
+def _render_search(product: Dict) -> str:
+    """Product card used by search_products"""
+    name = product.get('name', 'Unknown Product')
+    price = product.get('price', 0)
+    stock = product.get('stock', 0)
+    category = product.get('category', 'Other')
+    brand = product.get('brand', '')
+
+    card = f"   🔹 **{name}**"
+    if brand:
+        card += f" ({brand})"
+    card += f"\n      💰 KSh {price:,} | 📂 {category} | 📦 {stock} available"
+    card += f"\n      🆔 Product ID: {product.get('id', 'N/A')}\n"
+
+    description = product.get('description', '')
+    if description and len(description) <= 100:
+        card += f"      📝 {description}\n"
+
+    return card + "\n"
+
+
+def _render_quick_reference(product: Dict) -> str:
+    """One line of the vendor quick reference"""
+    return f"• ID: {product.get('id')} = {product.get('name', 'Unknown')}\n"
+
+
+TEMPLATES: Dict[str, Callable[[Dict], str]] = {
+    "display": _render_display,
+    "browse": _render_browse,
+    "search": _render_search,
+    "quick_reference": _render_quick_reference,
+}
+
+
+def _to_channel(text: str, channel: str) -> str:
+    """Adapt chainlit markdown to the output channel"""
+    if channel == "whatsapp":
+        return text.replace('**', '')
+    return text
+
+
+# =============================================================================
+# CACHE
+# =============================================================================
+
+class RenderCache:
+    """
+    LRU cache of rendered product fragments
+    Keyed by (product id, updated_at, channel, template); products without an
+    updated_at are keyed by a fingerprint of their contents instead
+    """
+
+    def __init__(self, max_entries: int = 5000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, str]" = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _version(product: Dict) -> str:
+        updated_at = product.get('updated_at')
+        if updated_at:
+            return str(updated_at)
+        payload = json.dumps(product, sort_keys=True, default=str)
+        return hashlib.md5(payload.encode('utf-8')).hexdigest()
+
+    def render(self, product: Dict, template: str = "display", channel: str = "chainlit") -> str:
+        """Get a product fragment, rendering it on a cache miss"""
+        key = (str(product.get('id')), self._version(product), channel, template)
+
+        with self._lock:
+            fragment = self._entries.get(key)
+            if fragment is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return fragment
+
+        fragment = _to_channel(TEMPLATES[template](product), channel)
+
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = fragment
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return fragment
+
+    def render_many(self, products, template: str, channel: str = "chainlit") -> str:
+        """Join cached fragments for a listing"""
+        return "".join(self.render(p, template, channel) for p in products)
+
+    def invalidate(self, product_id: Optional[str] = None):
+        """Drop fragments for one product (or everything)"""
+        with self._lock:
+            if product_id is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if k[0] == str(product_id)]:
+                del self._entries[key]
+
+    def get_stats(self) -> Dict:
+        """Cache statistics"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+# Global render cache instance
+render_cache = RenderCache()
+
+metrics.callback(
+    "sasabot_render_cache_lookups_total", "Rendered product text cache lookups by result",
+    lambda: {("hit",): render_cache.hits, ("miss",): render_cache.misses},
+    labels=["result"], kind="counter"
+)
+metrics.callback(
+    "sasabot_render_cache_hit_ratio", "Share of render cache lookups answered from the cache",
+    lambda: {(): render_cache.get_stats()["hit_rate"]}
+)
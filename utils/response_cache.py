@@ -0,0 +1,185 @@
+"""
+Response Cache
+Answers repeated customer questions ("do you deliver?", "bei gani?") without
+calling the LLM. Two tiers:
+- exact: the normalized message matches a cached question
+- similar: the message embedding is close enough to a cached question
+
+Entries are scoped by role + business and stamped with that business's
+catalog version, so a product change invalidates every cached answer for it.
+"""
+
+import os
+import re
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from utils.metrics import metrics
+from utils.query_normalizer import normalize_query
+from utils.semantic_index import HashedTfidfEmbedder
+from utils.simple_db import db
+
+
+CACHEABLE_ROLES = ("customer", "unknown")
+
+# Messages about a specific order/payment/phone, or that lean on the previous
+# turn ("yes", "that one"), have answers that belong to one conversation only
+PERSONAL_PATTERN = re.compile(r"\b(ORD|PAY)\d+\b|\+?\d{9,}|@", re.IGNORECASE)
+CONTEXTUAL_PATTERN = re.compile(
+    r"\b(it|that|this|those|them|yes|no|ok|okay|sawa|ndio|hapana|the first|the second|same)\b",
+    re.IGNORECASE,
+)
+MAX_CACHEABLE_WORDS = 15
+
+
+def normalize_message(message: str) -> str:
+    """Cache key form of a message: Swahili/Sheng mapped, punctuation and case dropped"""
+    text = normalize_query(message.strip().lower())
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+class ResponseCache:
+    """TTL + LRU cache of LLM replies with an exact and a similarity tier"""
+
+    def __init__(self, max_entries: int = None, ttl_seconds: int = None, similarity: float = None):
+        self.enabled = os.getenv("SASABOT_RESPONSE_CACHE", "true").lower() != "false"
+        self.max_entries = max_entries or int(os.getenv("SASABOT_RESPONSE_CACHE_SIZE", "500"))
+        self.ttl_seconds = ttl_seconds or int(os.getenv("SASABOT_RESPONSE_CACHE_TTL", "3600"))
+        self.similarity = similarity or float(os.getenv("SASABOT_RESPONSE_CACHE_SIMILARITY", "0.9"))
+        self.embedder = HashedTfidfEmbedder()
+
+        # (role, business_id, catalog_version, normalized) -> (response, expires_at, unit vector)
+        self._entries: "OrderedDict[Tuple, Tuple[str, float, np.ndarray]]" = OrderedDict()
+        self._lock = Lock()
+
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _vector(self, text: str) -> np.ndarray:
+        vector = self.embedder.embed([text])[0]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    @staticmethod
+    def is_cacheable(message: str, role: str) -> bool:
+        """Only generic, self-contained customer questions are shared between users"""
+        if role not in CACHEABLE_ROLES:
+            return False
+        if not message.strip() or len(message.split()) > MAX_CACHEABLE_WORDS:
+            return False
+        return not PERSONAL_PATTERN.search(message) and not CONTEXTUAL_PATTERN.search(message)
+
+    def _scope(self, role: str, business_id: Optional[str]) -> Tuple[str, str, str]:
+        business_id = business_id or ""
+        return role, business_id, db.get_catalog_version(business_id or None)
+
+    def get(self, message: str, role: str, business_id: Optional[str]) -> Optional[str]:
+        """Cached reply for a message, or None"""
+        if not self.enabled or not self.is_cacheable(message, role):
+            return None
+
+        scope = self._scope(role, business_id)
+        normalized = normalize_message(message)
+        now = time.time()
+
+        with self._lock:
+            self._evict_stale(scope, now)
+
+            entry = self._entries.get(scope + (normalized,))
+            if entry is not None:
+                self._entries.move_to_end(scope + (normalized,))
+                self.exact_hits += 1
+                return entry[0]
+
+        vector = self._vector(normalized)
+        with self._lock:
+            best_key, best_score = None, self.similarity
+            for key, (_, _, cached_vector) in self._entries.items():
+                if key[:3] != scope:
+                    continue
+                score = float(np.dot(vector, cached_vector))
+                if score >= best_score:
+                    best_key, best_score = key, score
+
+            if best_key is not None:
+                self._entries.move_to_end(best_key)
+                self.similar_hits += 1
+                return self._entries[best_key][0]
+
+            self.misses += 1
+        return None
+
+    def put(self, message: str, role: str, business_id: Optional[str], response: str):
+        """Cache a reply (ignored for personal/contextual messages and error replies)"""
+        if not self.enabled or not response or response.startswith("❌"):
+            return
+        if not self.is_cacheable(message, role):
+            return
+
+        scope = self._scope(role, business_id)
+        normalized = normalize_message(message)
+        entry = (response, time.time() + self.ttl_seconds, self._vector(normalized))
+
+        with self._lock:
+            self._entries[scope + (normalized,)] = entry
+            self._entries.move_to_end(scope + (normalized,))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _evict_stale(self, scope: Tuple[str, str, str], now: float):
+        """Drop expired entries and entries from older catalog versions of this business"""
+        role, business_id, version = scope
+        stale = [
+            key for key, (_, expires_at, _) in self._entries.items()
+            if expires_at <= now or (key[1] == business_id and key[2] != version)
+        ]
+        for key in stale:
+            del self._entries[key]
+        self.invalidations += len(stale)
+
+    def invalidate(self, business_id: Optional[str] = None):
+        """Drop cached replies for one business (or everything)"""
+        with self._lock:
+            if business_id is None:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+                return
+            keys = [key for key in self._entries if key[1] == business_id]
+            for key in keys:
+                del self._entries[key]
+            self.invalidations += len(keys)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Cache statistics"""
+        hits = self.exact_hits + self.similar_hits
+        total = hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / total, 3) if total else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+# Global response cache instance
+response_cache = ResponseCache()
+
+metrics.callback(
+    "sasabot_response_cache_lookups_total", "Response cache lookups by result",
+    lambda: {("exact_hit",): response_cache.exact_hits, ("similar_hit",): response_cache.similar_hits,
+             ("miss",): response_cache.misses},
+    labels=["result"], kind="counter"
+)
+metrics.callback(
+    "sasabot_response_cache_hit_ratio", "Share of response cache lookups answered from the cache",
+    lambda: {(): response_cache.get_stats()["hit_rate"]}
+)
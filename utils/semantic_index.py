@@ -0,0 +1,383 @@
+"""
+Semantic Product Index
+Local, CPU-only embedding index for meaning-based product search.
+Vectors are cached on disk and only re-embedded when a product changes.
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from utils import simple_db
+from utils.catalog_enrichment import iter_detail_records
+
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Words that carry no product meaning and only add noise to the vectors
+STOP_WORDS = {
+    "a", "an", "the", "and", "or", "for", "to", "of", "in", "on", "with", "is",
+    "it", "do", "you", "your", "i", "me", "my", "can", "have", "has", "this",
+    "that", "something", "some", "any", "please", "are", "be", "all", "get",
+}
+
+
+# =============================================================================
+# EMBEDDERS
+# =============================================================================
+
+class HashedTfidfEmbedder:
+    """
+    Hashed TF-IDF embedder
+    Words, word bigrams and in-word character trigrams are hashed into a
+    fixed number of buckets, so no vocabulary or model download is needed
+    """
+
+    uses_idf = True
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+        self.name = f"hashed-tfidf-{dim}"
+
+    def _features(self, text: str) -> Dict[str, float]:
+        """Extract weighted sparse features from text"""
+        words = [w for w in TOKEN_PATTERN.findall(text.lower()) if w not in STOP_WORDS]
+        features: Dict[str, float] = {}
+
+        for word in words:
+            features[f"w:{word}"] = features.get(f"w:{word}", 0.0) + 1.0
+            # Character trigrams let "thermo", "thermos" and "thermocup" meet
+            padded = f"#{word}#"
+            for i in range(len(padded) - 2):
+                gram = f"c:{padded[i:i + 3]}"
+                features[gram] = features.get(gram, 0.0) + 0.3
+
+        for first, second in zip(words, words[1:]):
+            key = f"b:{first}_{second}"
+            features[key] = features.get(key, 0.0) + 1.0
+
+        return features
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into raw (un-normalized, un-weighted) TF vectors"""
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, count in self._features(text).items():
+                hashed = zlib.crc32(feature.encode("utf-8"))
+                bucket = hashed % self.dim
+                sign = 1.0 if (hashed >> 31) & 1 else -1.0
+                matrix[row, bucket] += sign * (1.0 + math.log(count)) if count >= 1 else sign * count
+        return matrix
+
+
+class SentenceTransformerEmbedder:
+    """Local sentence-transformers model, used when configured and installed"""
+
+    uses_idf = False
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.name = f"st-{model_name.replace('/', '_')}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into normalized dense vectors"""
+        vectors = self.model.encode(texts, normalize_embeddings=True, show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+def create_default_embedder():
+    """
+    Pick the embedder for this process
+    Set SASABOT_EMBEDDING_MODEL (e.g. 'all-MiniLM-L6-v2') to use a local
+    sentence-transformers model; otherwise fall back to hashed TF-IDF
+    """
+    model_name = os.getenv("SASABOT_EMBEDDING_MODEL")
+    if model_name:
+        try:
+            return SentenceTransformerEmbedder(model_name)
+        except Exception as e:
+            print(f"⚠️ Could not load embedding model '{model_name}', using hashed TF-IDF: {e}")
+    return HashedTfidfEmbedder()
+
+
+# =============================================================================
+# DOCUMENT SOURCES
+# =============================================================================
+
+def load_detail_records(path: Path) -> List[Dict]:
+    """Load products_details records (JSON lines or a single JSON array)"""
+    return list(iter_detail_records(path))
+
+
+def product_search_text(product: Dict) -> str:
+    """Text that represents a catalog product for embedding"""
+    parts = [
+        product.get('name', ''),
+        product.get('brand', ''),
+        product.get('category', ''),
+        product.get('description', ''),
+    ]
+    return " ".join(str(p) for p in parts if p)
+
+
+def detail_search_text(record: Dict) -> str:
+    """Text that represents a products_details record for embedding"""
+    parts = [record.get('name', ''), record.get('color', ''), record.get('description', '')]
+    return " ".join(str(p) for p in parts if p)
+
+
+def _text_signature(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+# =============================================================================
+# INDEX
+# =============================================================================
+
+class SemanticProductIndex:
+    """
+    Brute-force cosine index over catalog products and detail records
+    Embeddings are stored in data/embeddings/ and refreshed incrementally
+    """
+
+    def __init__(self, data_dir: Optional[str] = None, embedder=None):
+        self._data_dir = Path(data_dir) if data_dir else None
+        self.embedder = embedder or create_default_embedder()
+
+        self.doc_ids: List[str] = []
+        self.raw_vectors = np.zeros((0, getattr(self.embedder, "dim", 0)), dtype=np.float32)
+        self.signatures: Dict[str, str] = {}
+        self.metadata: Dict[str, Dict] = {}
+
+        self._weighted: Optional[np.ndarray] = None
+        self._idf: Optional[np.ndarray] = None
+        self._loaded = False
+        self._details_mtime = None
+        self._detail_documents: Dict[str, Dict] = {}
+
+        # Refreshes swap doc_ids/raw_vectors/metadata together under the lock;
+        # searches take a consistent snapshot of them under it
+        self._lock = threading.RLock()
+        self._indexed_version = None
+
+    @property
+    def data_dir(self) -> Path:
+        return self._data_dir or simple_db.get_db().data_dir
+
+    @property
+    def cache_path(self) -> Path:
+        return self.data_dir / "embeddings" / f"{self.embedder.name}.npz"
+
+    # -------------------------------------------------------------------------
+    # Cache persistence
+    # -------------------------------------------------------------------------
+
+    def _load_cache(self):
+        """Load vectors from disk if a cache exists for this embedder"""
+        self._loaded = True
+        if not self.cache_path.exists():
+            return
+        try:
+            cached = np.load(self.cache_path, allow_pickle=False)
+            self.doc_ids = [str(d) for d in cached["doc_ids"]]
+            self.raw_vectors = cached["vectors"].astype(np.float32)
+            self.signatures = json.loads(str(cached["signatures"]))
+            self._weighted = None
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable embedding cache {self.cache_path}: {e}")
+            self.doc_ids, self.signatures = [], {}
+
+    def _save_cache(self):
+        """Write vectors to disk (atomic replace)"""
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.cache_path.with_suffix(".tmp.npz")
+            np.savez(
+                temp_path,
+                doc_ids=np.array(self.doc_ids, dtype=str),
+                vectors=self.raw_vectors,
+                signatures=np.array(json.dumps(self.signatures)),
+            )
+            temp_path.replace(self.cache_path)
+        except Exception as e:
+            print(f"⚠️ Could not save embedding cache: {e}")
+
+    # -------------------------------------------------------------------------
+    # Incremental refresh
+    # -------------------------------------------------------------------------
+
+    def _detail_docs(self) -> Dict[str, Dict]:
+        """Detail records keyed by doc id, re-read only when the file changes"""
+        path = self.data_dir / "products_details.jsonl"
+        mtime = path.stat().st_mtime if path.exists() else None
+        if mtime != self._details_mtime:
+            self._details_mtime = mtime
+            self._detail_documents = {}
+            for i, record in enumerate(load_detail_records(path)):
+                key = record.get('image') or record.get('name') or str(i)
+                doc_id = f"detail:{Path(str(key)).stem}"
+                text = detail_search_text(record)
+                self._detail_documents[doc_id] = {
+                    "text": text,
+                    "signature": _text_signature(text),
+                    "meta": {"source": "details", "record": record},
+                }
+        return self._detail_documents
+
+    def _collect_documents(self, products: Optional[List[Dict]] = None) -> Dict[str, Dict]:
+        """Gather every document that should be in the index"""
+        if products is None:
+            products = simple_db.get_db().get_products()
+
+        documents = {}
+        for product in products:
+            text = product_search_text(product)
+            doc_id = f"product:{product.get('id')}"
+            documents[doc_id] = {
+                "text": text,
+                "signature": f"{product.get('updated_at', '')}:{_text_signature(text)}",
+                "meta": {"source": "products", "product": product},
+            }
+        documents.update(self._detail_docs())
+        return documents
+
+    def _catalog_version(self):
+        """Stamp of everything the index is built from (catalog files and detail records)"""
+        path = self.data_dir / "products_details.jsonl"
+        details_mtime = path.stat().st_mtime if path.exists() else None
+        return simple_db.get_db().get_catalog_version(), details_mtime
+
+    def refresh(self, products: Optional[List[Dict]] = None) -> Dict[str, int]:
+        """
+        Bring the index in line with the current catalog
+        Only new or changed documents are embedded; removed ones are dropped
+        """
+        with self._lock:
+            return self._refresh(products)
+
+    def _refresh(self, products: Optional[List[Dict]]) -> Dict[str, int]:
+        if not self._loaded:
+            self._load_cache()
+
+        documents = self._collect_documents(products)
+        self.metadata = {doc_id: doc["meta"] for doc_id, doc in documents.items()}
+
+        keep_rows = [
+            i for i, doc_id in enumerate(self.doc_ids)
+            if doc_id in documents and self.signatures.get(doc_id) == documents[doc_id]["signature"]
+        ]
+        kept_ids = {self.doc_ids[i] for i in keep_rows}
+        changed = [doc_id for doc_id in documents if doc_id not in kept_ids]
+        removed = len(self.doc_ids) - len(keep_rows)
+
+        if not changed and not removed:
+            return {"embedded": 0, "removed": 0, "total": len(self.doc_ids)}
+
+        vectors = self.raw_vectors[keep_rows] if keep_rows else None
+        doc_ids = [self.doc_ids[i] for i in keep_rows]
+
+        if changed:
+            new_vectors = self.embedder.embed([documents[d]["text"] for d in changed])
+            vectors = new_vectors if vectors is None else np.vstack([vectors, new_vectors])
+            doc_ids.extend(changed)
+
+        self.doc_ids = doc_ids
+        self.raw_vectors = vectors if vectors is not None else self.raw_vectors[:0]
+        self.signatures = {doc_id: documents[doc_id]["signature"] for doc_id in doc_ids}
+        self._weighted = None
+        self._save_cache()
+
+        return {"embedded": len(changed), "removed": removed, "total": len(self.doc_ids)}
+
+    def _weighted_matrix(self) -> np.ndarray:
+        """Row-normalized (IDF-weighted) document matrix, rebuilt after changes"""
+        if self._weighted is None:
+            matrix = self.raw_vectors
+            if self.embedder.uses_idf and len(matrix):
+                doc_freq = np.count_nonzero(matrix, axis=0)
+                self._idf = (np.log((1 + len(matrix)) / (1 + doc_freq)) + 1.0).astype(np.float32)
+                matrix = matrix * self._idf
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            self._weighted = matrix / norms
+        return self._weighted
+
+    # -------------------------------------------------------------------------
+    # Search
+    # -------------------------------------------------------------------------
+
+    def search(self, query: str, top_k: int = 10, min_score: float = 0.06,
+               source: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Rank documents by cosine similarity to the query
+        The index is refreshed first only when the catalog version has changed
+        Returns dicts with doc_id, score, source and the product/record
+        """
+        if not query or not query.strip():
+            return []
+
+        with self._lock:
+            # Read before the catalog is loaded, so a write during the refresh triggers another
+            version = self._catalog_version()
+            if version != self._indexed_version:
+                self._refresh(None)
+                self._indexed_version = version
+            doc_ids, metadata = self.doc_ids, self.metadata
+            matrix, idf = self._weighted_matrix(), self._idf
+        if not doc_ids:
+            return []
+
+        query_vector = self.embedder.embed([query])[0]
+        if self.embedder.uses_idf and idf is not None:
+            query_vector = query_vector * idf
+        norm = np.linalg.norm(query_vector)
+        if norm == 0:
+            return []
+
+        scores = matrix @ (query_vector / norm)
+        order = np.argsort(-scores)
+
+        hits = []
+        for row in order:
+            score = float(scores[row])
+            if score < min_score:
+                break
+            doc_id = doc_ids[row]
+            meta = metadata.get(doc_id, {})
+            if source and meta.get("source") != source:
+                continue
+            hits.append({"doc_id": doc_id, "score": round(score, 4), **meta})
+            if len(hits) >= top_k:
+                break
+        return hits
+
+
+# =============================================================================
+# GLOBAL INDEX INSTANCE
+# =============================================================================
+
+semantic_index = None
+
+
+def get_semantic_index() -> SemanticProductIndex:
+    """Get the process-wide semantic index (created on first use)"""
+    global semantic_index
+    if semantic_index is None:
+        semantic_index = SemanticProductIndex()
+    return semantic_index
+
+
+if __name__ == "__main__":
+    # Precompute embeddings: python -m utils.semantic_index
+    stats = get_semantic_index().refresh()
+    print(f"✅ Semantic index ready: {stats}")
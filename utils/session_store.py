@@ -0,0 +1,297 @@
+"""
+Session Store
+Per-session conversation state (history, counters, flags) for the Chainlit
+and WhatsApp channels, with bounded memory:
+- MemorySessionStore: LRU + idle TTL eviction, for a single process
+- SQLiteSessionStore: persistent (data/sessions.db), survives restarts and
+  keeps only the sessions in use in memory
+
+Select with SASABOT_SESSION_STORE=memory|sqlite (default memory).
+Histories are compacted on write: at most MAX_EXCHANGES exchanges per
+session, each message truncated to MAX_MESSAGE_CHARS.
+"""
+
+import json
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from threading import Lock, RLock
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from utils.metrics import metrics
+
+
+MAX_EXCHANGES = 10
+MAX_MESSAGE_CHARS = 1200
+SWEEP_INTERVAL_SECONDS = 60
+
+
+def compact_exchange(user_message: str, ai_response: str) -> Dict[str, str]:
+    """One history entry, with long messages (listings, reports) truncated"""
+    def clip(text: Optional[str]) -> str:
+        text = text or ""
+        return text if len(text) <= MAX_MESSAGE_CHARS else text[:MAX_MESSAGE_CHARS] + " …"
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "user_message": clip(user_message),
+        "ai_response": clip(ai_response),
+    }
+
+
+class SessionStore(ABC):
+    """Interface shared by the session store backends"""
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._last_sweep = time.time()
+        self._update_lock = RLock()
+        self.evictions = 0
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """State of a session (None if unknown or expired)"""
+
+    @abstractmethod
+    def save(self, session_id: str, state: Dict[str, Any]):
+        """Store the state of a session"""
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        """Remove a session"""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Number of sessions held"""
+
+    @abstractmethod
+    def items(self, limit: int = 100, prefix: str = "") -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Most recently used sessions first (only ids starting with prefix, e.g. "whatsapp:")"""
+
+    @abstractmethod
+    def count_by_channel(self) -> Dict[str, int]:
+        """Sessions per channel, the session id prefix before ':' (e.g. {"whatsapp": 3, "chainlit": 5})"""
+
+    @abstractmethod
+    def sweep(self) -> int:
+        """Evict idle sessions; returns how many were removed"""
+
+    def _maybe_sweep(self):
+        if time.time() - self._last_sweep >= SWEEP_INTERVAL_SECONDS:
+            self._last_sweep = time.time()
+            self.sweep()
+
+    def update(self, session_id: str, change: Callable[[Dict[str, Any]], None]) -> Dict[str, Any]:
+        """
+        Read-modify-write a session: change(state) edits the stored state in place
+        Updates of the same store are serialized, so concurrent writers (a turn
+        and the background summarizer) don't overwrite each other's fields
+        """
+        with self._update_lock:
+            state = self.get(session_id) or {}
+            change(state)
+            self.save(session_id, state)
+            return state
+
+    def append_exchange(self, session_id: str, user_message: str, ai_response: str,
+                        max_exchanges: int = MAX_EXCHANGES, fields: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Add an exchange to a session's history and save the session
+        fields are the session values this turn changed (e.g. message_count); they
+        are merged into the stored session, which is re-read rather than replaced
+        by the caller's copy, so a summary folded in the meantime is kept
+        """
+        def change(state: Dict[str, Any]):
+            state.update(fields or {})
+            history = state.get("conversation_history", [])
+            history.append(compact_exchange(user_message, ai_response))
+            state["conversation_history"] = history[-max_exchanges:]
+
+        return self.update(session_id, change)
+
+    def get_history(self, session_id: str):
+        """Conversation history of a session (empty if unknown)"""
+        return (self.get(session_id) or {}).get("conversation_history", [])
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Store statistics"""
+        return {
+            "backend": type(self).__name__,
+            "sessions": self.count(),
+            "evictions": self.evictions,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+class MemorySessionStore(SessionStore):
+    """In-process store bounded by max_sessions (LRU) and idle TTL"""
+
+    def __init__(self, max_sessions: int = 10000, ttl_seconds: int = 86400):
+        super().__init__(ttl_seconds)
+        self.max_sessions = max_sessions
+        # session_id -> (state, last_access)
+        self._sessions: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        self._maybe_sweep()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            state, last_access = entry
+            if time.time() - last_access > self.ttl_seconds:
+                del self._sessions[session_id]
+                self.evictions += 1
+                return None
+            # A read keeps the session alive too; order and timestamps stay in step for sweep()
+            self._sessions[session_id] = (state, time.time())
+            self._sessions.move_to_end(session_id)
+            return state
+
+    def save(self, session_id: str, state: Dict[str, Any]):
+        with self._lock:
+            self._sessions[session_id] = (state, time.time())
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def count(self) -> int:
+        return len(self._sessions)
+
+    def items(self, limit: int = 100, prefix: str = "") -> Iterator[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            recent = [(k, v) for k, v in reversed(self._sessions.items()) if k.startswith(prefix)][:limit]
+        for session_id, (state, _) in recent:
+            yield session_id, state
+
+    def count_by_channel(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        with self._lock:
+            for session_id in self._sessions:
+                channel = session_id.split(":", 1)[0]
+                counts[channel] = counts.get(channel, 0) + 1
+        return counts
+
+    def sweep(self) -> int:
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            # Oldest first, so stop at the first session still in use
+            expired = []
+            for session_id, (_, last_access) in self._sessions.items():
+                if last_access > cutoff:
+                    break
+                expired.append(session_id)
+            for session_id in expired:
+                del self._sessions[session_id]
+        self.evictions += len(expired)
+        return len(expired)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Persistent store in a SQLite file; idle sessions are deleted after the TTL"""
+
+    def __init__(self, path: str = "data/sessions.db", ttl_seconds: int = 30 * 86400):
+        super().__init__(ttl_seconds)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY,"
+            " state TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions(updated_at)")
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        self._maybe_sweep()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state, updated_at FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl_seconds:
+            return None
+        try:
+            return json.loads(row[0])
+        except json.JSONDecodeError:
+            print(f"⚠️ Corrupt session state for {session_id}, starting fresh")
+            return None
+
+    def save(self, session_id: str, state: Dict[str, Any]):
+        payload = json.dumps(state, default=str, separators=(",", ":"), ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sessions (session_id, state, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+                (session_id, payload, time.time()),
+            )
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def items(self, limit: int = 100, prefix: str = "") -> Iterator[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT session_id, state FROM sessions WHERE substr(session_id, 1, ?) = ? "
+                "ORDER BY updated_at DESC LIMIT ?", (len(prefix), prefix, limit)
+            ).fetchall()
+        for session_id, state in rows:
+            yield session_id, json.loads(state)
+
+    def count_by_channel(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT CASE WHEN instr(session_id, ':') > 0"
+                " THEN substr(session_id, 1, instr(session_id, ':') - 1) ELSE session_id END AS channel,"
+                " COUNT(*) FROM sessions GROUP BY channel"
+            ).fetchall()
+        return dict(rows)
+
+    def sweep(self) -> int:
+        with self._lock:
+            removed = self._conn.execute(
+                "DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.ttl_seconds,)
+            ).rowcount
+        self.evictions += removed
+        return removed
+
+
+def create_session_store() -> SessionStore:
+    """Session store selected by SASABOT_SESSION_STORE"""
+    backend = os.getenv("SASABOT_SESSION_STORE", "memory").lower()
+    if backend == "sqlite":
+        return SQLiteSessionStore(
+            os.getenv("SASABOT_SESSION_DB", "data/sessions.db"),
+            ttl_seconds=int(os.getenv("SASABOT_SESSION_TTL", str(30 * 86400))),
+        )
+    return MemorySessionStore(
+        max_sessions=int(os.getenv("SASABOT_SESSION_MAX", "10000")),
+        ttl_seconds=int(os.getenv("SASABOT_SESSION_TTL", "86400")),
+    )
+
+
+# Global session store instance
+session_store = create_session_store()
+
+metrics.callback(
+    "sasabot_sessions", "Conversation sessions held by the session store",
+    lambda: {(type(session_store).__name__,): session_store.count()}, labels=["backend"]
+)
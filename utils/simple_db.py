@@ -5,17 +5,52 @@ Handles all JSON file operations for the Sasabot demo
 
 import json
 import os
+import re
 import shutil
+import time
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 from pathlib import Path
 
+from utils.render_cache import render_cache
+from utils.metrics import DB_BYTES, DB_SECONDS
+from utils.tracing import tracer
+from utils.single_flight import ThreadSingleFlight
+
+# Collections stored per business under data/<business_id>/ once migrated
+SHARDED_COLLECTIONS = ('products', 'orders')
+SHARD_MANIFEST = 'shards'
+SHARD_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]+$')
+UNASSIGNED_SHARD = '_unassigned'
+
+def _detached_copy(data: Any) -> Any:
+    """Copy of loaded data down to the records, enough to keep in-place record edits private"""
+    def copy_value(value):
+        if isinstance(value, dict):
+            return dict(value)
+        if isinstance(value, list):
+            return list(value)
+        return value
+    
+    if isinstance(data, dict):
+        return {key: copy_value(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [copy_value(value) for value in data]
+    return data
+
 class JSONDatabase:
     """Simple JSON file database for demo purposes"""
     
     def __init__(self, data_dir: str = "data"):
         self.data_dir = Path(data_dir)
         self.backup_dir = Path(data_dir) / "backups"
+        self._shard_index = {}
+        # Per collection: shard ID -> (mtime, size) of the shard file when it was indexed
+        self._shard_stamps: Dict[str, Dict[str, Optional[tuple]]] = {}
+        # Concurrent loads of the same file share one read; saves bump the
+        # file's generation so later loads never join a read of older data
+        self._loads = ThreadSingleFlight("db_load")
+        self._generations: Dict[str, int] = {}
         self._ensure_directories()
     
     def _ensure_directories(self):
@@ -29,6 +64,7 @@ class JSONDatabase:
             filename += '.json'
         return self.data_dir / filename
     
+    @tracer.traced("db.backup", arguments=("filename",))
     def _create_backup(self, filename: str) -> bool:
         """Create a timestamped backup of a file before modifying it"""
         try:
@@ -37,7 +73,8 @@ class JSONDatabase:
                 return True  # No file to backup
             
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_name = f"{filename.replace('.json', '')}_{timestamp}.json"
+            # Shard files ("<business_id>/products") are flattened into one backup folder
+            backup_name = f"{filename.replace('.json', '').replace('/', '__')}_{timestamp}.json"
             backup_path = self.backup_dir / backup_name
             
             shutil.copy2(file_path, backup_path)
@@ -46,8 +83,23 @@ class JSONDatabase:
             print(f"Warning: Could not create backup for {filename}: {e}")
             return False
     
+    @staticmethod
+    def _record_io(op: str, filename: str, size: int, started: float):
+        """Metrics for one file read/write (shards are aggregated per collection)"""
+        collection = filename.replace('.json', '').split('/')[-1]
+        DB_SECONDS.observe(time.perf_counter() - started, op=op, collection=collection)
+        DB_BYTES.inc(size, op=op, collection=collection)
+    
+    @tracer.traced("db.load_json", arguments=("filename",))
     def load_json(self, filename: str) -> Any:
-        """Load data from a JSON file"""
+        """Load data from a JSON file (concurrent loads of one file share a single read)"""
+        path = str(self._get_file_path(filename))
+        key = (path, self._generations.get(path, 0))
+        return self._loads.do(key, lambda: self._read_json(filename), share=_detached_copy)
+    
+    def _read_json(self, filename: str) -> Any:
+        """Read and parse a JSON file"""
+        started = time.perf_counter()
         try:
             file_path = self._get_file_path(filename)
             
@@ -57,6 +109,7 @@ class JSONDatabase:
             
             with open(file_path, 'r', encoding='utf-8') as f:
                 data = json.load(f)
+                self._record_io("read", filename, os.fstat(f.fileno()).st_size, started)
                 print(f"✅ Loaded {filename} successfully")
                 return data
                 
@@ -67,8 +120,10 @@ class JSONDatabase:
             print(f"❌ Error loading {filename}: {e}")
             return {} if filename in ['businesses', 'customers'] else []
     
+    @tracer.traced("db.save_json", arguments=("filename",))
     def save_json(self, filename: str, data: Any, create_backup: bool = True) -> bool:
         """Save data to a JSON file"""
+        started = time.perf_counter()
         try:
             # Create backup before saving
             if create_backup:
@@ -81,9 +136,12 @@ class JSONDatabase:
             
             with open(temp_path, 'w', encoding='utf-8') as f:
                 json.dump(data, f, indent=2, ensure_ascii=False)
+                size = f.tell()
             
             # Replace original file with temp file
             temp_path.replace(file_path)
+            self._generations[str(file_path)] = self._generations.get(str(file_path), 0) + 1
+            self._record_io("write", filename, size, started)
             
             print(f"✅ Saved {filename} successfully")
             return True
@@ -96,6 +154,132 @@ class JSONDatabase:
                 temp_path.unlink()
             return False
     
+    # =============================================================================
+    # SHARD ROUTING
+    # =============================================================================
+    
+    def is_sharded(self) -> bool:
+        """True once products/orders have been split into per-business shards"""
+        return self._get_file_path(SHARD_MANIFEST).exists()
+    
+    def _shard_ids(self) -> List[str]:
+        """Business IDs that have a shard directory"""
+        manifest = self.load_json(SHARD_MANIFEST) or {}
+        return manifest.get('businesses', [])
+    
+    def _shard_filename(self, collection: str, business_id: Optional[str]) -> str:
+        """Relative filename of a business shard, e.g. 'mama_jane_electronics/products'"""
+        shard_id = business_id or UNASSIGNED_SHARD
+        if not SHARD_ID_PATTERN.match(shard_id):
+            raise ValueError(f"Invalid business ID for shard: {shard_id!r}")
+        return f"{shard_id}/{collection}"
+    
+    def _load_shard(self, collection: str, business_id: Optional[str]) -> List[Dict]:
+        """Load one business shard (empty list if the shard has no file yet)"""
+        filename = self._shard_filename(collection, business_id)
+        if not self._get_file_path(filename).exists():
+            return []
+        return self.load_json(filename)
+    
+    def _save_shard(self, collection: str, business_id: Optional[str], records: List[Dict]) -> bool:
+        """Save one business shard, registering new shards in the manifest"""
+        filename = self._shard_filename(collection, business_id)
+        self._get_file_path(filename).parent.mkdir(exist_ok=True)
+        
+        shard_id = business_id or UNASSIGNED_SHARD
+        manifest = self.load_json(SHARD_MANIFEST) or {}
+        if shard_id not in manifest.get('businesses', []):
+            manifest.setdefault('businesses', []).append(shard_id)
+            self.save_json(SHARD_MANIFEST, manifest, create_backup=False)
+        
+        if not self.save_json(filename, records):
+            return False
+        
+        # Keep the ID -> business index in step with the shard
+        index = self._shard_index.get(collection)
+        if index is not None:
+            for key in [k for k, v in index.items() if v == shard_id]:
+                del index[key]
+            for record in records:
+                index[self._record_id(collection, record)] = shard_id
+            self._shard_stamps.setdefault(collection, {})[shard_id] = self._file_stamp(filename)
+        return True
+    
+    def _load_all_shards(self, collection: str) -> List[Dict]:
+        """Fan out over every business shard and merge the results"""
+        records = []
+        for shard_id in self._shard_ids():
+            records.extend(self._load_shard(collection, shard_id))
+        return records
+    
+    @staticmethod
+    def _record_id(collection: str, record: Dict) -> str:
+        return str(record.get('id', ''))
+    
+    def _file_stamp(self, filename: str) -> Optional[tuple]:
+        """(mtime, size) of a data file, None if it doesn't exist"""
+        try:
+            stat = self._get_file_path(filename).stat()
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+    
+    def _locate_shard(self, collection: str, record_id: str) -> Optional[str]:
+        """
+        Find which business shard holds a record
+        The index is built once by fan-out, then kept current on writes;
+        a miss re-reads only the shards changed since they were indexed (e.g.
+        by another process), so an ID that doesn't exist costs a stat per shard
+        """
+        index = self._shard_index.get(collection)
+        if index is None or str(record_id) not in index:
+            index = self._refresh_shard_index(collection)
+        return index.get(str(record_id))
+    
+    def _refresh_shard_index(self, collection: str) -> Dict[str, str]:
+        """Bring the ID -> business index up to date with the shard files"""
+        if collection not in self._shard_index:
+            self._shard_stamps.pop(collection, None)
+        index = self._shard_index.setdefault(collection, {})
+        stamps = self._shard_stamps.setdefault(collection, {})
+        
+        current = {
+            shard_id: self._file_stamp(self._shard_filename(collection, shard_id))
+            for shard_id in self._shard_ids()
+        }
+        for shard_id in list(stamps):
+            if shard_id not in current:
+                for key in [k for k, v in index.items() if v == shard_id]:
+                    del index[key]
+                del stamps[shard_id]
+        for shard_id, stamp in current.items():
+            if shard_id in stamps and stamps[shard_id] == stamp:
+                continue
+            # Stamped before reading, so a write during the read is picked up next time
+            stamps[shard_id] = stamp
+            for key in [k for k, v in index.items() if v == shard_id]:
+                del index[key]
+            for record in self._load_shard(collection, shard_id):
+                index[self._record_id(collection, record)] = shard_id
+        return index
+    
+    def _all_record_ids(self, collection: str) -> List[str]:
+        """IDs across all shards (used to allocate new IDs)"""
+        if collection not in self._shard_index:
+            self._refresh_shard_index(collection)
+        return list(self._shard_index[collection].keys())
+    
+    def _save_grouped(self, collection: str, records: List[Dict]) -> bool:
+        """Split a full collection by business and write each shard"""
+        groups = {shard_id: [] for shard_id in self._shard_ids()}
+        for record in records:
+            groups.setdefault(record.get('business_id') or UNASSIGNED_SHARD, []).append(record)
+        
+        success = True
+        for shard_id, shard_records in groups.items():
+            success = self._save_shard(collection, shard_id, shard_records) and success
+        return success
+    
     # =============================================================================
     # BUSINESSES
     # =============================================================================
@@ -118,21 +302,31 @@ class JSONDatabase:
     # =============================================================================
     
     def get_products(self) -> List[Dict]:
-        """Load products from JSON file"""
+        """Load products from JSON file (merged across shards when sharded)"""
+        if self.is_sharded():
+            return self._load_all_shards('products')
         return self.load_json('products')
     
     def save_products(self, products: List[Dict]) -> bool:
-        """Save products to JSON file"""
+        """Save products to JSON file (split back into shards when sharded)"""
+        if self.is_sharded():
+            return self._save_grouped('products', products)
         return self.save_json('products', products)
     
     def get_products_by_business(self, business_id: str) -> List[Dict]:
         """Get all products for a specific business"""
+        if self.is_sharded():
+            return self._load_shard('products', business_id)
         products = self.get_products()
         return [p for p in products if p.get('business_id') == business_id]
     
     def get_product_by_id(self, product_id: str) -> Optional[Dict]:
         """Find a product by ID"""
-        products = self.get_products()
+        if self.is_sharded():
+            shard_id = self._locate_shard('products', product_id)
+            products = self._load_shard('products', shard_id) if shard_id else []
+        else:
+            products = self.get_products()
         for product in products:
             if product.get('id') == product_id:
                 return product
@@ -140,11 +334,17 @@ class JSONDatabase:
     
     def add_product(self, product: Dict) -> bool:
         """Add a new product"""
-        products = self.get_products()
+        sharded = self.is_sharded()
+        if sharded:
+            products = self._load_shard('products', product.get('business_id'))
+            all_ids = self._all_record_ids('products')
+        else:
+            products = self.get_products()
+            all_ids = [p.get('id', '0') for p in products]
         
         # Generate new ID if not provided
         if 'id' not in product:
-            existing_ids = [int(p.get('id', 0)) for p in products if p.get('id', '0').isdigit()]
+            existing_ids = [int(pid) for pid in all_ids if pid.isdigit()]
             new_id = max(existing_ids, default=0) + 1
             product['id'] = str(new_id)
         
@@ -153,17 +353,25 @@ class JSONDatabase:
         product['updated_at'] = datetime.now().isoformat()
         
         products.append(product)
+        if sharded:
+            return self._save_shard('products', product.get('business_id'), products)
         return self.save_products(products)
     
     def update_product(self, product_id: str, updates: Dict) -> bool:
         """Update an existing product"""
-        products = self.get_products()
+        shard_id = self._locate_shard('products', product_id) if self.is_sharded() else None
+        if shard_id:
+            products = self._load_shard('products', shard_id)
+        else:
+            products = self.get_products()
         
         for i, product in enumerate(products):
             if product.get('id') == product_id:
                 # Update fields
                 products[i].update(updates)
                 products[i]['updated_at'] = datetime.now().isoformat()
+                if shard_id:
+                    return self._save_shard('products', shard_id, products)
                 return self.save_products(products)
         
         print(f"❌ Product with ID {product_id} not found")
@@ -171,12 +379,18 @@ class JSONDatabase:
     
     def delete_product(self, product_id: str) -> bool:
         """Delete a product by ID"""
-        products = self.get_products()
+        shard_id = self._locate_shard('products', product_id) if self.is_sharded() else None
+        if shard_id:
+            products = self._load_shard('products', shard_id)
+        else:
+            products = self.get_products()
         original_length = len(products)
         
         products = [p for p in products if p.get('id') != product_id]
         
         if len(products) < original_length:
+            if shard_id:
+                return self._save_shard('products', shard_id, products)
             return self.save_products(products)
         else:
             print(f"❌ Product with ID {product_id} not found")
@@ -184,10 +398,10 @@ class JSONDatabase:
     
     def find_product_by_name(self, name: str, business_id: str = None) -> Optional[Dict]:
         """Find a product by name (partial match)"""
-        products = self.get_products()
-        
         if business_id:
-            products = [p for p in products if p.get('business_id') == business_id]
+            products = self.get_products_by_business(business_id)
+        else:
+            products = self.get_products()
         
         name_lower = name.lower()
         for product in products:
@@ -195,27 +409,54 @@ class JSONDatabase:
                 return product
         return None
     
+    def get_catalog_version(self, business_id: Optional[str] = None) -> str:
+        """
+        Version stamp of a business's product catalog (file mtime + size)
+        Changes whenever the products file (or the business's shard) is rewritten,
+        including by another process; without a business it covers every shard
+        """
+        try:
+            if self.is_sharded() and business_id:
+                file_path = self._get_file_path(self._shard_filename('products', business_id))
+            elif self.is_sharded():
+                return ",".join(self.get_catalog_version(shard_id) for shard_id in self._shard_ids())
+            else:
+                file_path = self._get_file_path('products')
+            stat = file_path.stat()
+        except (OSError, ValueError):
+            return "0"
+        return f"{stat.st_mtime_ns}:{stat.st_size}"
+    
     # =============================================================================
     # ORDERS
     # =============================================================================
     
     def get_orders(self) -> List[Dict]:
-        """Load orders from JSON file"""
+        """Load orders from JSON file (merged across shards when sharded)"""
+        if self.is_sharded():
+            return self._load_all_shards('orders')
         return self.load_json('orders')
     
     def save_orders(self, orders: List[Dict]) -> bool:
-        """Save orders to JSON file"""
+        """Save orders to JSON file (split back into shards when sharded)"""
+        if self.is_sharded():
+            return self._save_grouped('orders', orders)
         return self.save_json('orders', orders)
     
     def add_order(self, order: Dict) -> bool:
         """Add a new order"""
-        orders = self.get_orders()
+        sharded = self.is_sharded()
+        if sharded:
+            orders = self._load_shard('orders', order.get('business_id'))
+            all_ids = self._all_record_ids('orders')
+        else:
+            orders = self.get_orders()
+            all_ids = [o.get('id', '') for o in orders]
         
         # Generate new ID if not provided
         if 'id' not in order:
             existing_numbers = []
-            for o in orders:
-                order_id = o.get('id', '')
+            for order_id in all_ids:
                 if order_id.startswith('ORD'):
                     try:
                         num = int(order_id[3:])
@@ -231,24 +472,40 @@ class JSONDatabase:
         order['updated_at'] = datetime.now().isoformat()
         
         orders.append(order)
+        if sharded:
+            return self._save_shard('orders', order.get('business_id'), orders)
         return self.save_orders(orders)
     
     def get_orders_by_business(self, business_id: str) -> List[Dict]:
         """Get all orders for a specific business"""
+        if self.is_sharded():
+            return self._load_shard('orders', business_id)
         orders = self.get_orders()
         return [o for o in orders if o.get('business_id') == business_id]
     
     def get_order_by_id(self, order_id: str) -> Optional[Dict]:
         """Find an order by ID"""
-        orders = self.get_orders()
+        orders, _ = self._orders_containing(order_id)
         for order in orders:
             if order.get('id') == order_id:
                 return order
         return None
     
+    def _orders_containing(self, order_id: str):
+        """Load just the orders shard holding order_id (or all orders when not sharded)"""
+        if self.is_sharded():
+            shard_id = self._locate_shard('orders', order_id)
+            return (self._load_shard('orders', shard_id) if shard_id else []), shard_id
+        return self.get_orders(), None
+    
+    def _save_orders_for(self, shard_id: Optional[str], orders: List[Dict]) -> bool:
+        if shard_id:
+            return self._save_shard('orders', shard_id, orders)
+        return self.save_orders(orders)
+    
     def update_order_status(self, order_id: str, status: str) -> bool:
         """Update order status"""
-        orders = self.get_orders()
+        orders, shard_id = self._orders_containing(order_id)
         
         for i, order in enumerate(orders):
             if order.get('id') == order_id:
@@ -263,7 +520,7 @@ class JSONDatabase:
                 elif status == 'delivered':
                     orders[i]['delivered_at'] = datetime.now().isoformat()
                 
-                return self.save_orders(orders)
+                return self._save_orders_for(shard_id, orders)
         
         print(f"❌ Order with ID {order_id} not found")
         return False
@@ -320,9 +577,18 @@ class JSONDatabase:
         except Exception as e:
             return {'error': str(e)}
     
+    def get_load_stats(self) -> Dict[str, Any]:
+        """How many loads shared another caller's in-flight read"""
+        return self._loads.get_stats()
+    
     def validate_data_files(self) -> Dict[str, bool]:
         """Check if all required data files exist and are valid"""
         files_to_check = ['businesses.json', 'products.json', 'orders.json', 'customers.json']
+        if self.is_sharded():
+            files_to_check = ['businesses.json', 'customers.json', 'shards.json']
+            for shard_id in self._shard_ids():
+                files_to_check += [f"{self._shard_filename(c, shard_id)}.json" for c in SHARDED_COLLECTIONS
+                                   if self._get_file_path(self._shard_filename(c, shard_id)).exists()]
         results = {}
         
         for filename in files_to_check:
@@ -342,10 +608,15 @@ class JSONDatabase:
             backup_folder.mkdir(exist_ok=True)
             
             files_to_backup = ['businesses.json', 'products.json', 'orders.json', 'customers.json']
+            if self.is_sharded():
+                files_to_backup.append('shards.json')
+                files_to_backup += [f"{shard_id}/{c}.json" for shard_id in self._shard_ids()
+                                    for c in SHARDED_COLLECTIONS]
             
             for filename in files_to_backup:
                 source = self.data_dir / filename
                 if source.exists():
+                    (backup_folder / filename).parent.mkdir(exist_ok=True)
                     shutil.copy2(source, backup_folder / filename)
             
             return str(backup_folder)
@@ -434,32 +705,9 @@ class JSONDatabase:
                 "error": str(e)
             }
 
-    def format_product_display(self, product: Dict) -> str:
-        """Standardized product display format with prominent ID"""
-        try:
-            name = product.get('name', 'Unknown Product')
-            price = product.get('price', 0)
-            stock = product.get('stock', 0)
-            product_id = product.get('id', 'N/A')
-            brand = product.get('brand', '')
-            category = product.get('category', '')
-            
-            display = f"🆔 **ID: {product_id}**"
-            
-            if brand:
-                display += f" | 🏷️ {brand} {name}"
-            else:
-                display += f" | 📱 {name}"
-                
-            display += f" | 💰 KSh {price:,}"
-            display += f" | 📦 {stock} in stock"
-            
-            if category:
-                display += f" | 📂 {category}"
-                
-            return display
-        except Exception:
-            return f"🆔 **ID: {product.get('id', 'Unknown')}** | {product.get('name', 'Unknown Product')}"
+    def format_product_display(self, product: Dict, channel: str = "chainlit") -> str:
+        """Standardized product display format with prominent ID (cached per product version)"""
+        return render_cache.render(product, "display", channel)
 
     def get_product_quick_reference(self, business_id: str) -> str:
         """Generate quick reference guide for product operations"""
@@ -473,8 +721,7 @@ class JSONDatabase:
             reference += "To delete: 'delete product [ID]' or 'delete [product name]'\n\n"
             reference += "**Available Product IDs:**\n"
             
-            for product in products[:10]:  # Show first 10
-                reference += f"• ID: {product.get('id')} = {product.get('name', 'Unknown')}\n"
+            reference += render_cache.render_many(products[:10], "quick_reference")  # Show first 10
                 
             if len(products) > 10:
                 reference += f"... and {len(products) - 10} more products\n"
@@ -571,7 +818,7 @@ class JSONDatabase:
     
     def update_order_payment_status(self, order_id: str, payment_status: str, payment_id: str = None) -> bool:
         """Update order payment status"""
-        orders = self.get_orders()
+        orders, shard_id = self._orders_containing(order_id)
         
         for i, order in enumerate(orders):
             if order.get('id') == order_id:
@@ -584,7 +831,7 @@ class JSONDatabase:
                 if payment_status == 'completed':
                     orders[i]['payment_completed_at'] = datetime.now().isoformat()
                 
-                return self.save_orders(orders)
+                return self._save_orders_for(shard_id, orders)
         
         print(f"❌ Order with ID {order_id} not found")
         return False
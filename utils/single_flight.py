@@ -0,0 +1,149 @@
+"""
+Single-Flight Request Coalescing
+Concurrent identical calls share one in-flight computation: the first caller
+for a key runs it, callers arriving while it is running wait for and receive
+the same result (or exception). Nothing is cached once the call finishes.
+
+Two variants:
+- SingleFlight:       async, for tool handlers on the event loop
+- ThreadSingleFlight: blocking, for work done in worker threads (DB loads)
+
+Disable with SASABOT_SINGLE_FLIGHT=false.
+"""
+
+import asyncio
+import json
+import os
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from utils.metrics import metrics
+
+
+COALESCED_CALLS = metrics.counter(
+    "sasabot_single_flight_total", "Coalescable calls by outcome (executed or shared)", ["group", "outcome"]
+)
+
+
+def flight_key(name: str, arguments: Dict[str, Any]) -> str:
+    """Canonical key for a call: argument order and unset (None) arguments don't matter"""
+    present = {key: value for key, value in arguments.items() if value is not None}
+    return f"{name}:{json.dumps(present, sort_keys=True, default=str)}"
+
+
+class _FlightStats:
+    def __init__(self, group: str):
+        self.group = group
+        self.enabled = os.getenv("SASABOT_SINGLE_FLIGHT", "true").lower() != "false"
+
+        # Metrics
+        self.executed = 0
+        self.shared = 0
+
+    def _count(self, outcome: str):
+        if outcome == "shared":
+            self.shared += 1
+        else:
+            self.executed += 1
+        COALESCED_CALLS.inc(group=self.group, outcome=outcome)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Executed vs shared calls"""
+        total = self.executed + self.shared
+        return {
+            "enabled": self.enabled,
+            "executed": self.executed,
+            "shared": self.shared,
+            "share_rate": round(self.shared / total, 3) if total else 0.0,
+            "in_flight": len(self._calls),
+        }
+
+
+class SingleFlight(_FlightStats):
+    """Async single-flight: await do(key, fn) runs fn() once per key at a time"""
+
+    def __init__(self, group: str):
+        super().__init__(group)
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.enabled:
+            return await fn()
+
+        task = self._calls.get(key)
+        if task is None:
+            # The work runs as its own task so a caller being cancelled
+            # (e.g. an unused speculation) doesn't fail the callers sharing it
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+            self._count("executed")
+        else:
+            self._count("shared")
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here so it isn't reported when every caller was cancelled
+
+
+class _Call:
+    __slots__ = ("done", "waiters", "results", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.waiters = 0
+        self.results: list = []
+        self.error: Optional[BaseException] = None
+
+
+class ThreadSingleFlight(_FlightStats):
+    """
+    Blocking single-flight for code running in threads
+    Callers that joined a running call each get share(result) rather than the
+    leader's object; the copies are made before the leader returns, so mutable
+    data can be handed out without anyone seeing another caller's edits
+    """
+
+    def __init__(self, group: str):
+        super().__init__(group)
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any], share: Callable[[Any], Any] = lambda result: result) -> Any:
+        if not self.enabled:
+            return fn()
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+        self._count("executed" if leader else "shared")
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.results.pop()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # No one can join after this, so the waiter count is final
+            with self._lock:
+                del self._calls[key]
+            if call.error is None:
+                try:
+                    call.results = [share(result) for _ in range(call.waiters)]
+                except Exception as e:
+                    call.error = e
+            call.done.set()
+        return result
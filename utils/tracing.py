@@ -0,0 +1,303 @@
+"""
+Tracing
+Lightweight per-turn latency spans (assistant turn, tool calls, DB reads and
+writes, outbound HTTP) so a slow turn can be broken down by stage.
+
+Spans nest through a context variable, so they follow asyncio tasks and need
+no tracer argument passing. Finished spans are kept in memory for the stats
+summary and written to a JSONL file whose fields follow the OpenTelemetry
+(OTLP JSON) span layout: traceId, spanId, parentSpanId, name,
+startTimeUnixNano, endTimeUnixNano, attributes, status.
+
+Enable with SASABOT_TRACING=true (file: SASABOT_TRACE_FILE, default
+data/traces.jsonl). When disabled every span is a shared no-op object.
+
+Summary of the slowest stages:
+    python -m utils.tracing                       # data/traces.jsonl
+    python -m utils.tracing --file traces.jsonl --top 15
+"""
+
+import argparse
+import asyncio
+import atexit
+import functools
+import inspect
+import json
+import os
+import secrets
+import time
+from collections import deque
+from contextvars import ContextVar
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+EXPORT_BATCH = 50
+RECENT_SPANS = 5000
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("sasabot_current_span", default=None)
+
+
+# =============================================================================
+# SPANS
+# =============================================================================
+
+class Span:
+    """One timed stage; use as a context manager (works inside async code too)"""
+
+    __slots__ = ("tracer", "name", "attributes", "trace_id", "span_id", "parent_id",
+                 "start_ns", "end_ns", "error", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self.end_ns = 0
+
+    def __enter__(self) -> "Span":
+        parent = _current_span.get()
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.parent_id = parent.span_id if parent else None
+        self.span_id = secrets.token_hex(8)
+        self._token = _current_span.set(self)
+        self.start_ns = time.time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._token)
+        self.tracer._finish(self)
+        return False
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        """OTLP JSON span fields (attributes kept as a flat mapping)"""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "attributes": self.attributes,
+            "status": {"code": "ERROR", "message": self.error} if self.error else {"code": "OK"},
+        }
+
+
+class _NoopSpan:
+    """Shared stand-in returned while tracing is disabled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+# =============================================================================
+# EXPORT
+# =============================================================================
+
+class JSONLExporter:
+    """Appends finished spans to a JSONL file in batches (flushed at the end of each trace)"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._buffer: List[str] = []
+        self._lock = Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str, separators=(",", ":"), ensure_ascii=False)
+        with self._lock:
+            self._buffer.append(line)
+            if span.parent_id is None or len(self._buffer) >= EXPORT_BATCH:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._buffer:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(self._buffer) + "\n")
+        except OSError as e:
+            print(f"⚠️ Could not write traces to {self.path}: {e}")
+        self._buffer.clear()
+
+
+class Tracer:
+    """Creates spans and hands finished ones to the exporter"""
+
+    def __init__(self, enabled: Optional[bool] = None, exporter: Optional[JSONLExporter] = None):
+        if enabled is None:
+            enabled = os.getenv("SASABOT_TRACING", "false").lower() == "true"
+        self.enabled = enabled
+        self.exporter = exporter or JSONLExporter(os.getenv("SASABOT_TRACE_FILE", "data/traces.jsonl"))
+        self.recent: deque = deque(maxlen=RECENT_SPANS)
+        if enabled:
+            atexit.register(self.exporter.flush)
+
+    def span(self, name: str, **attributes):
+        """Context manager timing a stage (a no-op while tracing is disabled)"""
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, attributes)
+
+    def annotate(self, **attributes):
+        """Add attributes to the innermost open span"""
+        span = _current_span.get()
+        if span is not None:
+            span.attributes.update(attributes)
+
+    def bind(self, coro):
+        """Run coro under the current span, for handing work to another thread's event loop"""
+        parent = _current_span.get()
+        if parent is None:
+            return coro
+
+        async def bound():
+            _current_span.set(parent)
+            return await coro
+        return bound()
+
+    def _finish(self, span: Span):
+        self.recent.append(span.to_dict())
+        self.exporter.export(span)
+
+    def traced(self, name: Optional[str] = None, arguments: Tuple[str, ...] = ()):
+        """
+        Decorator wrapping every call of a sync or async function in a span
+        The named arguments of each call are recorded as span attributes
+        """
+        def decorator(func):
+            span_name = name or func.__qualname__
+            signature = inspect.signature(func) if arguments else None
+
+            def attributes(args, kwargs) -> Dict[str, Any]:
+                if signature is None:
+                    return {}
+                bound = signature.bind_partial(*args, **kwargs).arguments
+                return {key: bound[key] for key in arguments if key in bound}
+
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    if not self.enabled:
+                        return await func(*args, **kwargs)
+                    with Span(self, span_name, attributes(args, kwargs)):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with Span(self, span_name, attributes(args, kwargs)):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def summary(self, top: int = 10) -> List[Dict[str, Any]]:
+        """Slowest stages among the spans recorded in this process"""
+        return summarize(self.recent, top)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Tracing settings and span count"""
+        return {"enabled": self.enabled, "file": str(self.exporter.path), "recent_spans": len(self.recent)}
+
+
+# =============================================================================
+# SUMMARY
+# =============================================================================
+
+def _percentile(ordered: List[float], pct: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+def summarize(spans: Iterable[Dict[str, Any]], top: int = 10) -> List[Dict[str, Any]]:
+    """Per span name: count, p50/p95/max and total milliseconds, slowest p95 first"""
+    durations: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    for span in spans:
+        name = span["name"]
+        durations.setdefault(name, []).append((span["endTimeUnixNano"] - span["startTimeUnixNano"]) / 1e6)
+        if span.get("status", {}).get("code") == "ERROR":
+            errors[name] = errors.get(name, 0) + 1
+
+    stages = []
+    for name, values in durations.items():
+        values.sort()
+        stages.append({
+            "name": name,
+            "count": len(values),
+            "p50_ms": round(_percentile(values, 50), 2),
+            "p95_ms": round(_percentile(values, 95), 2),
+            "max_ms": round(values[-1], 2),
+            "total_ms": round(sum(values), 2),
+            "errors": errors.get(name, 0),
+        })
+    stages.sort(key=lambda stage: stage["p95_ms"], reverse=True)
+    return stages[:top]
+
+
+def format_summary(stages: List[Dict[str, Any]]) -> str:
+    """Slowest-stages table for the console or chat"""
+    if not stages:
+        return "No spans recorded yet (set SASABOT_TRACING=true)"
+    lines = [f"{'stage':<40} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'errors':>6}"]
+    for stage in stages:
+        lines.append(f"{stage['name'][:40]:<40} {stage['count']:>6} {stage['p50_ms']:>9.2f} "
+                     f"{stage['p95_ms']:>9.2f} {stage['max_ms']:>9.2f} {stage['errors']:>6}")
+    return "\n".join(lines)
+
+
+def load_spans(path: str) -> List[Dict[str, Any]]:
+    """Spans from a JSONL trace file (unreadable lines are skipped)"""
+    spans = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                spans.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return spans
+
+
+# Global tracer instance
+tracer = Tracer()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print the slowest traced stages")
+    parser.add_argument("--file", default=os.getenv("SASABOT_TRACE_FILE", "data/traces.jsonl"))
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    if not Path(args.file).exists():
+        print(f"❌ Trace file not found: {args.file}")
+    else:
+        spans = load_spans(args.file)
+        print(f"🔎 {len(spans)} spans in {len(set(s['traceId'] for s in spans))} traces from {args.file}\n")
+        print(format_summary(summarize(spans, args.top)))